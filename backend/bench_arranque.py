@@ -0,0 +1,98 @@
+"""
+Benchmark de arranque en frío de los microservicios Django.
+
+Lanza cada servicio en un proceso nuevo con ``python -X importtime``, hace
+``django.setup()`` y carga las URLs (que importan todas las vistas), y reporta:
+
+- el tiempo de pared del arranque (mediana de varias repeticiones),
+- el tiempo total de importación y los módulos de primer nivel más caros,
+- si se importó algún módulo prohibido al arrancar (por defecto ``kafka``: el
+  producer debe crearse en el primer uso, no al importar).
+
+Sale con código 1 si algún servicio pasa de ``--max-ms`` o importa un módulo
+prohibido, así que sirve como guarda en CI:
+
+    python bench_arranque.py --max-ms 1500
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent
+
+SERVICIOS = {
+    "ms_usuarios": "ms_usuarios.settings",
+    "ms_negocios": "ms_negocios.settings",
+}
+
+ARRANQUE = "import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns"
+
+
+def medir(servicio, settings):
+    entorno = {**os.environ, "DJANGO_SETTINGS_MODULE": settings}
+    inicio = time.perf_counter()
+    proceso = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", ARRANQUE],
+        cwd=BACKEND / servicio,
+        env=entorno,
+        capture_output=True,
+        text=True,
+    )
+    pared_ms = (time.perf_counter() - inicio) * 1000
+    if proceso.returncode != 0:
+        raise RuntimeError(f"{servicio} no arrancó:\n{proceso.stderr[-2000:]}")
+
+    modulos = []
+    for linea in proceso.stderr.splitlines():
+        if not linea.startswith("import time:") or "self [us]" in linea:
+            continue
+        propio, acumulado, nombre = linea[len("import time:"):].split("|")
+        # La sangría del nombre indica el nivel de anidamiento
+        modulos.append((nombre[1:].rstrip(), int(propio), int(acumulado)))
+    return pared_ms, modulos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("servicios", nargs="*", default=list(SERVICIOS))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, help="Presupuesto de arranque (mediana) por servicio")
+    parser.add_argument("--prohibidos", nargs="*", default=["kafka"])
+    args = parser.parse_args()
+
+    fallos = []
+    for servicio in args.servicios:
+        tiempos, modulos = [], []
+        for _ in range(args.repeticiones):
+            pared_ms, modulos = medir(servicio, SERVICIOS[servicio])
+            tiempos.append(pared_ms)
+        mediana = statistics.median(tiempos)
+        importacion_ms = sum(propio for _, propio, _ in modulos) / 1000
+
+        print(f"\n== {servicio}")
+        print(f"arranque (mediana de {args.repeticiones}): {mediana:8.1f} ms")
+        print(f"importaciones:                 {importacion_ms:8.1f} ms ({len(modulos)} módulos)")
+        print("módulos de primer nivel más caros (acumulado):")
+        primer_nivel = [m for m in modulos if not m[0].startswith(" ")]
+        for nombre, _, acumulado in sorted(primer_nivel, key=lambda m: m[2], reverse=True)[:args.top]:
+            print(f"  {acumulado / 1000:8.1f} ms  {nombre.strip()}")
+
+        importados = {nombre.strip() for nombre, _, _ in modulos}
+        for prohibido in args.prohibidos:
+            if any(nombre == prohibido or nombre.startswith(prohibido + ".") for nombre in importados):
+                fallos.append(f"{servicio} importa '{prohibido}' al arrancar")
+        if args.max_ms is not None and mediana > args.max_ms:
+            fallos.append(f"{servicio} tarda {mediana:.1f} ms en arrancar (máximo {args.max_ms:.1f} ms)")
+
+    for fallo in fallos:
+        print(f"\nFALLO: {fallo}", file=sys.stderr)
+    sys.exit(1 if fallos else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+"""
+Código compartido por los microservicios Django de AcaClick.
+
+Se instala en cada servicio desde su ``requirements.txt`` (``-e ../comun``);
+aquí va lo que debe comportarse igual en todos, para no mantener copias.
+"""
@@ -0,0 +1,116 @@
+"""
+Compresión negociada de respuestas (brotli o gzip).
+
+Se elige la codificación según ``Accept-Encoding`` (con sus pesos ``q``) y solo
+se comprime por encima de ``COMPRESION["UMBRAL"]`` bytes: en respuestas chicas
+la cabecera gzip cuesta más de lo que ahorra. brotli se usa si el paquete está
+instalado. No se tocan respuestas en streaming, ya codificadas ni con tipos que
+ya vienen comprimidos (imágenes).
+
+Lo usan ms_negocios y ms_usuarios (``MIDDLEWARE``); cada servicio pone su
+``COMPRESION`` en settings.
+"""
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional
+    brotli = None
+
+
+TIPOS_COMPRIMIBLES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+
+
+def _aceptadas(cabecera):
+    """``{codificación: q}`` a partir de ``Accept-Encoding``"""
+    aceptadas = {}
+    for parte in cabecera.split(','):
+        nombre, _, parametros = parte.strip().partition(';')
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith('q='):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        if nombre:
+            aceptadas[nombre.strip().lower()] = q
+    return aceptadas
+
+
+def acepta(cabecera, codificacion):
+    """``True`` si ``Accept-Encoding`` admite ``codificacion``"""
+    aceptadas = _aceptadas(cabecera)
+    return aceptadas.get(codificacion, aceptadas.get('*', 0.0)) > 0
+
+
+def elegir_codificacion(cabecera):
+    aceptadas = _aceptadas(cabecera)
+    comodin = aceptadas.get('*', 0.0)
+    candidatas = ['br', 'gzip'] if brotli is not None else ['gzip']
+    # A igual peso se prefiere la primera (brotli comprime mejor el JSON)
+    mejor, mejor_q = None, 0.0
+    for codificacion in candidatas:
+        q = aceptadas.get(codificacion, comodin)
+        if q > mejor_q:
+            mejor, mejor_q = codificacion, q
+    return mejor
+
+
+def comprimir(contenido, codificacion):
+    config = settings.COMPRESION
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=config['NIVEL_BROTLI'])
+    return gzip.compress(contenido, compresslevel=config['NIVEL_GZIP'], mtime=0)
+
+
+class CompresionMiddleware:
+    # Bajo ASGI no obliga a Django a pasar las vistas async por un hilo
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.procesar(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.procesar(request, await self.get_response(request))
+
+    def procesar(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(TIPOS_COMPRIMIBLES):
+            return response
+
+        # La respuesta cambia según Accept-Encoding aunque no se comprima esta vez
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < settings.COMPRESION['UMBRAL']:
+            return response
+
+        codificacion = elegir_codificacion(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if codificacion is None:
+            return response
+
+        comprimido = comprimir(response.content, codificacion)
+        if len(comprimido) >= len(response.content):
+            return response
+
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+        # El cuerpo ya no es idéntico byte a byte: el ETag pasa a ser débil
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
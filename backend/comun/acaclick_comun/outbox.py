@@ -0,0 +1,104 @@
+"""
+Outbox transaccional para los eventos de Kafka.
+
+Cada servicio escribe sus eventos en su propia tabla (un modelo que hereda de
+``EventoOutboxBase``) dentro de la misma transacción que el cambio: si el
+cambio se revierte, el evento también, y la petición no espera al broker. El
+relay (``RelayOutboxCommand``, ``manage.py publicar_outbox``) publica los
+pendientes por lotes y en orden de ``id_evento`` y los marca como publicados
+al confirmarse el envío (entrega al menos una vez: el consumidor puede
+deduplicar con la cabecera ``id_evento``).
+"""
+from datetime import timedelta
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+
+class EventoOutboxBase(models.Model):
+    """
+    Columnas del outbox. El modelo concreto de cada servicio pone su
+    ``Meta`` (tabla e índice de pendientes) y puede aflojar ``payload``.
+    """
+
+    id_evento = models.BigAutoField(primary_key=True)
+    topic = models.CharField(max_length=200)
+    # Clave de partición: los eventos de una misma entidad llegan en orden
+    clave = models.CharField(max_length=200)
+    payload = models.JSONField()
+    creado_en = models.DateTimeField(auto_now_add=True)
+    publicado_en = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        abstract = True
+
+    def __str__(self):
+        return f"Evento {self.id_evento} ({self.topic})"
+
+
+class Outbox:
+    """
+    Operaciones sobre el outbox de ``modelo``. ``llave_relay`` es la llave del
+    advisory lock de Postgres con la que solo un relay publica a la vez; cada
+    servicio usa la suya.
+    """
+
+    def __init__(self, modelo, llave_relay):
+        self.modelo = modelo
+        self.llave_relay = llave_relay
+
+    def encolar(self, topic, clave, payload):
+        """Guarda el evento; llamarlo dentro de la transacción del cambio"""
+        return self.modelo.objects.create(topic=topic, clave=str(clave), payload=payload)
+
+    def encolar_muchos(self, topic, eventos):
+        """``eventos``: ``[(clave, payload)]``; un solo INSERT, en el orden recibido"""
+        return self.modelo.objects.bulk_create(
+            [self.modelo(topic=topic, clave=str(clave), payload=payload) for clave, payload in eventos]
+        )
+
+    def publicar_pendientes(self, producer, lote=500, timeout=30):
+        """
+        Publica hasta ``lote`` eventos pendientes. Devuelve cuántos publicó, o
+        ``None`` si otro relay tiene el turno. Si algún envío falla se lanza la
+        excepción y el lote completo queda pendiente para el siguiente intento.
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_xact_lock(%s)", [self.llave_relay])
+                if not cursor.fetchone()[0]:
+                    return None
+
+            eventos = list(
+                self.modelo.objects.filter(publicado_en__isnull=True).order_by("id_evento")[:lote]
+            )
+            if not eventos:
+                return 0
+
+            futuros = [
+                producer.send(
+                    evento.topic,
+                    key=evento.clave,
+                    value=evento.payload,
+                    headers=[("id_evento", str(evento.id_evento).encode())],
+                )
+                for evento in eventos
+            ]
+            producer.flush(timeout=timeout)
+            for futuro in futuros:
+                # Lanza el error del broker si el envío no se confirmó
+                futuro.get(timeout=timeout)
+
+            self.modelo.objects.filter(id_evento__in=[evento.id_evento for evento in eventos]).update(
+                publicado_en=timezone.now()
+            )
+            return len(eventos)
+
+    def purgar_publicados(self, dias, lote=5000):
+        """Borra hasta ``lote`` eventos publicados hace más de ``dias`` días"""
+        limite = timezone.now() - timedelta(days=dias)
+        viejos = (
+            self.modelo.objects.filter(publicado_en__lt=limite).order_by("id_evento").values("id_evento")[:lote]
+        )
+        borrados, _ = self.modelo.objects.filter(id_evento__in=viejos).delete()
+        return borrados
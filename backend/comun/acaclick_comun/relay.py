@@ -0,0 +1,68 @@
+"""Comando base del relay del outbox (``manage.py publicar_outbox``)"""
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class RelayOutboxCommand(BaseCommand):
+    """
+    Publica en Kafka los eventos pendientes por lotes, en orden, y los marca
+    como publicados. Con varios relays corriendo solo uno publica a la vez.
+
+    Cada servicio define ``outbox`` (un ``acaclick_comun.outbox.Outbox``) y
+    cómo crear y cerrar su producer.
+    """
+
+    outbox = None
+
+    def crear_producer(self):
+        raise NotImplementedError
+
+    def cerrar_producer(self, producer):
+        producer.close()
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--intervalo", type=float, default=1.0, help="Segundos de espera sin pendientes")
+        parser.add_argument("--retencion-dias", type=int, default=7, help="Días que se conservan los publicados")
+        parser.add_argument("--una-vez", action="store_true", help="Vaciar los pendientes y salir")
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+
+        producer = None
+        espera = options["intervalo"]
+        try:
+            while not self.detener:
+                try:
+                    # El producer se crea (y se conecta) en el primer uso
+                    if producer is None:
+                        producer = self.crear_producer()
+                    publicados = self.outbox.publicar_pendientes(producer, options["lote"])
+                except Exception as e:
+                    # Broker caído o lote fallido (sigue pendiente): reintentar con espera creciente
+                    self.stderr.write(f"[OUTBOX] Error publicando, se reintentará: {e}")
+                    time.sleep(espera)
+                    espera = min(espera * 2, 60)
+                    continue
+                espera = options["intervalo"]
+
+                if publicados:
+                    self.stdout.write(f"[OUTBOX] {publicados} eventos publicados")
+                # Lote lleno: probablemente quedan más, seguir sin esperar
+                if publicados == options["lote"]:
+                    continue
+
+                self.outbox.purgar_publicados(options["retencion_dias"])
+                if options["una_vez"]:
+                    break
+                time.sleep(options["intervalo"])
+        finally:
+            if producer is not None:
+                self.cerrar_producer(producer)
+
+    def _detener(self, signum, frame):
+        self.detener = True
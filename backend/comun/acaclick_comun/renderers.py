@@ -0,0 +1,40 @@
+"""
+Renderer y parser JSON basados en orjson.
+
+orjson serializa de forma nativa ``datetime``, ``date``, ``time``, ``UUID`` y
+las subclases de ``dict``/``list`` que devuelven los serializers de DRF; lo que
+no conoce (``Decimal``, cadenas perezosas de traducción, querysets...) pasa por
+el encoder de DRF, así que la salida es la misma que con ``JSONRenderer``.
+"""
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+_encoder = JSONEncoder()
+
+
+class ORJSONRenderer(BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        opciones = orjson.OPT_NON_STR_KEYS
+        # Igual que JSONRenderer: ``Accept: application/json; indent=2``
+        if accepted_media_type and 'indent' in accepted_media_type:
+            opciones |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_encoder.default, option=opciones)
+
+
+class ORJSONParser(BaseParser):
+    media_type = 'application/json'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as e:
+            raise ParseError(f'JSON parse error - {e}')
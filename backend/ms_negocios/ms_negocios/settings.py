@@ -2,8 +2,11 @@
 Django settings for ms_negocios project.
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -22,6 +25,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "rest_framework",
     "corsheaders",
     "negocios",
@@ -29,6 +33,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "acaclick_comun.compresion.CompresionMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -114,13 +119,98 @@ CORS_ALLOWED_ORIGINS = [
     "http://127.0.0.1:3000",
 ]
 CORS_ALLOW_ALL_ORIGINS = True
+# Peticiones condicionales (ETag / Last-Modified) desde el navegador
+CORS_ALLOW_HEADERS = (*default_headers, "if-match", "if-none-match", "if-modified-since")
+CORS_EXPOSE_HEADERS = ["ETag", "Last-Modified"]
+
+# Blobs (logos e imágenes de la tienda, direccionados por su hash)
+NEGOCIOS_BLOBS = {
+    "BACKEND": "negocios.blobs.AlmacenamientoLocal",
+    "OPCIONES": {"raiz": BASE_DIR / "blobs"},
+    "URL_BASE": "http://127.0.0.1:8002/api/negocios/blobs/",
+    "TAMANO_MAXIMO": 5 * 1024 * 1024,  # 5 MB por imagen
+}
+
+# Cache de lectura (detalle y listados por propietario). Para compartirla entre
+# workers: "negocios.cache.CacheDjango" con OPCIONES {"alias": "default"}
+NEGOCIOS_CACHE = {
+    "BACKEND": "negocios.cache.CacheLRU",
+    "OPCIONES": {"capacidad": 2048},
+    "TTL": 300,  # segundos
+}
+
+# Búsqueda de texto: presupuesto de latencia por consulta
+NEGOCIOS_BUSQUEDA = {
+    "TIMEOUT_MS": 500,
+}
+
+# Altas y actualizaciones masivas: ítems por petición y filas por transacción
+NEGOCIOS_MASIVO = {
+    "MAXIMO_ITEMS": 10000,
+    "LOTE": 500,
+}
+
+# Personalización de la tienda: tamaño máximo del documento (bytes del JSON)
+# y operaciones por JSON Patch (negocios/parches.py)
+NEGOCIOS_PERSONALIZACION = {
+    "TAMANO_MAXIMO": 64 * 1024,
+    "MAXIMO_OPERACIONES": 100,
+}
+
+# Kafka: eventos de ms_usuarios para la tabla local de propietarios
+# (negocios/propietarios.py) y los cambios de negocios que se publican
+# (negocios/eventos.py, topic compactado)
+NEGOCIOS_KAFKA = {
+    "BROKER": os.environ.get("KAFKA_BROKER_URL", "localhost:9092"),
+    "TOPIC_USUARIOS_CREADOS": "usuarios.creados",
+    "GRUPO_PROPIETARIOS": "ms_negocios.propietarios",
+    "TOPIC_CAMBIOS": "negocios.cambios",
+    "PARTICIONES_CAMBIOS": 6,
+    "REPLICAS_CAMBIOS": 1,
+}
 
 # REST Framework
+# Tokens de ms_usuarios, verificados aquí sin llamarlo (negocios/autenticacion.py).
+# CLAVE es la SIGNING_KEY de simplejwt en ms_usuarios (su SECRET_KEY por defecto)
+NEGOCIOS_JWT = {
+    "CLAVE": os.environ.get(
+        "JWT_CLAVE", "django-insecure-dupd7!+4+)@-emb&=k=&dbg4qms8aoj34bg2ht+c*^5%%((s3*"
+    ),
+    "ALGORITMO": "HS256",
+    "CLAIM_USUARIO": "user_id",
+    "TIPO_HEADER": "Bearer",
+    "MARGEN_SEGUNDOS": 0,   # tolerancia de reloj para exp
+    "CACHE_TOKENS": 4096,   # tokens ya validados en memoria (LRU, hasta que caducan)
+}
+
 REST_FRAMEWORK = {
+    "DEFAULT_AUTHENTICATION_CLASSES": [
+        "negocios.autenticacion.JWTLocalAuthentication",
+    ],
+    # Lecturas públicas; las escrituras piden IsAuthenticated en cada vista
     "DEFAULT_PERMISSION_CLASSES": [
-        "rest_framework.permissions.AllowAny",  # Por ahora permitir todo, luego usar JWT
+        "rest_framework.permissions.AllowAny",
     ],
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "negocios.paginacion.PaginacionKeyset",
     "PAGE_SIZE": 20,
+    "DEFAULT_RENDERER_CLASSES": [
+        "acaclick_comun.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "acaclick_comun.renderers.ORJSONParser",
+        "negocios.renderers.NDJSONParser",
+        "negocios.renderers.MergePatchParser",
+        "negocios.renderers.JSONPatchParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+
+# Compresión de respuestas (brotli si está instalado, si no gzip)
+COMPRESION = {
+    "UMBRAL": 1024,  # bytes; por debajo no vale la pena
+    "NIVEL_GZIP": 6,
+    "NIVEL_BROTLI": 5,
 }
 
@@ -0,0 +1,104 @@
+"""
+Autenticación con los JWT que emite ms_usuarios (simplejwt), verificados aquí.
+
+- La firma se comprueba localmente con la clave compartida
+  (``settings.NEGOCIOS_JWT["CLAVE"]``): no hay llamada a ms_usuarios por petición.
+- La configuración y la clave se leen una vez por proceso.
+- Los tokens ya validados se guardan en un LRU hasta que caducan, así que un
+  token repetido no vuelve a verificar la firma ni a decodificarse.
+- El usuario es ligero (``UsuarioToken``): solo el ``id_usuario`` del claim
+  ``user_id``, sin consultar ninguna tabla. Las vistas filtran por propietario
+  con ``Negocio.objects.del_propietario(request.user)``.
+"""
+import time
+from functools import lru_cache
+
+import jwt
+from django.conf import settings
+from rest_framework import authentication, exceptions
+
+from .cache import CacheLRU
+
+
+class UsuarioToken:
+    """Usuario autenticado por token; no existe en la base de ms_negocios"""
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, id_usuario, claims):
+        self.id_usuario = id_usuario
+        self.pk = id_usuario
+        self.claims = claims
+
+    def __str__(self):
+        return f'Usuario {self.id_usuario}'
+
+
+@lru_cache(maxsize=None)
+def _config():
+    config = settings.NEGOCIOS_JWT
+    return {
+        'clave': config['CLAVE'],
+        'algoritmos': [config.get('ALGORITMO', 'HS256')],
+        'claim_usuario': config.get('CLAIM_USUARIO', 'user_id'),
+        'tipo_header': config.get('TIPO_HEADER', 'Bearer'),
+        'margen': config.get('MARGEN_SEGUNDOS', 0),
+        'tokens': CacheLRU(config.get('CACHE_TOKENS', 4096)),
+    }
+
+
+def verificar(token):
+    """``UsuarioToken`` del token (del LRU si ya se validó) o ``AuthenticationFailed``"""
+    config = _config()
+    usuario = config['tokens'].get(token)
+    if usuario is not None:
+        return usuario
+
+    try:
+        claims = jwt.decode(
+            token,
+            config['clave'],
+            algorithms=config['algoritmos'],
+            leeway=config['margen'],
+            options={'require': ['exp']},
+        )
+    except jwt.ExpiredSignatureError:
+        raise exceptions.AuthenticationFailed('El token expiró', code='token_not_valid')
+    except jwt.InvalidTokenError:
+        raise exceptions.AuthenticationFailed('Token inválido', code='token_not_valid')
+
+    # El refresh también está firmado con la misma clave: solo se aceptan access
+    if claims.get('token_type', 'access') != 'access':
+        raise exceptions.AuthenticationFailed('Se esperaba un token de acceso', code='token_not_valid')
+    try:
+        id_usuario = int(claims[config['claim_usuario']])
+    except (KeyError, TypeError, ValueError):
+        raise exceptions.AuthenticationFailed('El token no identifica al usuario', code='token_not_valid')
+
+    usuario = UsuarioToken(id_usuario, claims)
+    # Vive en el LRU solo hasta que caduca
+    restante = claims['exp'] - time.time()
+    if restante > 0:
+        config['tokens'].set(token, usuario, restante)
+    return usuario
+
+
+class JWTLocalAuthentication(authentication.BaseAuthentication):
+    """``Authorization: Bearer <access>``; sin header la petición sigue como anónima"""
+
+    def authenticate(self, request):
+        partes = authentication.get_authorization_header(request).split()
+        if not partes or partes[0].decode('latin-1') != _config()['tipo_header']:
+            return None
+        if len(partes) != 2:
+            raise exceptions.AuthenticationFailed('Header Authorization mal formado', code='bad_authorization_header')
+        try:
+            token = partes[1].decode('ascii')
+        except UnicodeDecodeError:
+            raise exceptions.AuthenticationFailed('Token inválido', code='token_not_valid')
+        return verificar(token), token
+
+    def authenticate_header(self, request):
+        # Hace que DRF responda 401 (y no 403) cuando falta la autenticación
+        return f'{_config()["tipo_header"]} realm="api"'
@@ -0,0 +1,148 @@
+"""
+Almacén de blobs direccionado por contenido.
+
+El frontend manda los logos e imágenes como data URLs (``readAsDataURL``).
+Aquí se decodifican, se guardan una sola vez bajo su hash SHA-256 y en el
+modelo solo queda la URL corta con la que se sirven.
+
+El backend es intercambiable con ``settings.NEGOCIOS_BLOBS["BACKEND"]``.
+"""
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+# Solo imágenes rasterizadas: un SVG puede traer scripts y se serviría
+# desde nuestro propio dominio.
+TIPOS_PERMITIDOS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+TIPOS_POR_EXTENSION = {ext: tipo for tipo, ext in TIPOS_PERMITIDOS.items()}
+
+_DATA_URL_RE = re.compile(r"^data:(?P<tipo>[\w.+-]+/[\w.+-]+)(;[^,;]*)*;base64,", re.IGNORECASE)
+CLAVE_RE = re.compile(r"\A[0-9a-f]{64}\.(png|jpg|gif|webp)\Z")
+
+
+class BlobInvalido(ValueError):
+    """El valor parece una data URL pero no se puede guardar como blob."""
+
+
+class AlmacenamientoBlobs(ABC):
+    """Interfaz mínima que debe cumplir un backend de blobs."""
+
+    @abstractmethod
+    def existe(self, clave):
+        ...
+
+    @abstractmethod
+    def guardar(self, clave, contenido):
+        ...
+
+    @abstractmethod
+    def abrir(self, clave):
+        """Devuelve un archivo binario abierto o lanza ``FileNotFoundError``."""
+
+
+class AlmacenamientoLocal(AlmacenamientoBlobs):
+    """Guarda cada blob en disco, repartido en subdirectorios por hash."""
+
+    def __init__(self, raiz):
+        self.raiz = Path(raiz)
+
+    def ruta(self, clave):
+        return self.raiz / clave[:2] / clave[2:4] / clave
+
+    def existe(self, clave):
+        return self.ruta(clave).exists()
+
+    def guardar(self, clave, contenido):
+        destino = self.ruta(clave)
+        if destino.exists():
+            return
+        destino.parent.mkdir(parents=True, exist_ok=True)
+        # Escribir a un temporal y renombrar: nunca se sirve un archivo a medias
+        fd, temporal = tempfile.mkstemp(dir=destino.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as archivo:
+                archivo.write(contenido)
+            os.replace(temporal, destino)
+        except BaseException:
+            if os.path.exists(temporal):
+                os.unlink(temporal)
+            raise
+
+    def abrir(self, clave):
+        return open(self.ruta(clave), "rb")
+
+
+@lru_cache(maxsize=None)
+def obtener_almacenamiento():
+    config = settings.NEGOCIOS_BLOBS
+    clase = import_string(config["BACKEND"])
+    return clase(**config.get("OPCIONES", {}))
+
+
+def es_data_url(valor):
+    return isinstance(valor, str) and valor[:5].lower() == "data:"
+
+
+def decodificar_data_url(valor):
+    """Devuelve ``(contenido, tipo)`` de una data URL en base64."""
+    coincidencia = _DATA_URL_RE.match(valor)
+    if not coincidencia:
+        raise BlobInvalido("La imagen debe enviarse como data URL en base64")
+
+    tipo = coincidencia.group("tipo").lower()
+    if tipo not in TIPOS_PERMITIDOS:
+        raise BlobInvalido(f"Tipo de imagen no permitido: {tipo}")
+
+    datos = valor[coincidencia.end():]
+    maximo = settings.NEGOCIOS_BLOBS["TAMANO_MAXIMO"]
+    # Descartar antes de decodificar: base64 ocupa 4/3 del tamaño real
+    if len(datos) * 3 // 4 > maximo:
+        raise BlobInvalido(f"La imagen supera el tamaño máximo de {maximo} bytes")
+
+    try:
+        contenido = base64.b64decode(datos, validate=True)
+    except (binascii.Error, ValueError):
+        raise BlobInvalido("La imagen no es base64 válido")
+    if not contenido:
+        raise BlobInvalido("La imagen está vacía")
+    return contenido, tipo
+
+
+def url_blob(clave):
+    return settings.NEGOCIOS_BLOBS["URL_BASE"] + clave
+
+
+def guardar_blob(contenido, tipo):
+    """Guarda el contenido (si no existía ya) y devuelve su clave."""
+    clave = f"{hashlib.sha256(contenido).hexdigest()}.{TIPOS_PERMITIDOS[tipo]}"
+    obtener_almacenamiento().guardar(clave, contenido)
+    return clave
+
+
+def externalizar(valor):
+    """Si ``valor`` es una data URL la guarda como blob y devuelve su URL."""
+    if not es_data_url(valor):
+        return valor
+    return url_blob(guardar_blob(*decodificar_data_url(valor)))
+
+
+def externalizar_personalizacion(personalizacion):
+    """Sustituye las imágenes embebidas de la personalización por URLs."""
+    if not isinstance(personalizacion, dict):
+        return personalizacion
+    return {campo: externalizar(valor) for campo, valor in personalizacion.items()}
@@ -0,0 +1,175 @@
+"""
+Cache de lectura para el detalle de un negocio y los listados por propietario.
+
+- El backend es intercambiable (``settings.NEGOCIOS_CACHE["BACKEND"]``): por
+  defecto un LRU en memoria del proceso; ``CacheDjango`` usa la API de cache de
+  Django (Redis, Memcached...) para compartirlo entre workers.
+- Las claves llevan una versión por negocio y otra por propietario. Invalidar es
+  subir la versión: las entradas viejas dejan de leerse y caducan solas, y una
+  lectura lenta que termine después de la invalidación escribe en una versión
+  que ya nadie consulta.
+- Los fallos concurrentes sobre la misma clave se agrupan (single-flight): solo
+  uno consulta la base y el resto espera su resultado.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+
+class CacheLRU:
+    """LRU en memoria del proceso con caducidad por entrada."""
+
+    def __init__(self, capacidad=2048):
+        self.capacidad = capacidad
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None:
+                return None
+            valor, expira = entrada
+            if expira is not None and expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def set(self, clave, valor, ttl=None):
+        expira = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.capacidad:
+                self._datos.popitem(last=False)
+
+    def incr(self, clave):
+        with self._lock:
+            valor, expira = self._datos.get(clave, (_version_inicial(), None))
+            self._datos[clave] = (valor + 1, expira)
+            self._datos.move_to_end(clave)
+            return valor + 1
+
+
+class CacheDjango:
+    """Adaptador sobre ``django.core.cache`` (compartido entre procesos)."""
+
+    def __init__(self, alias='default'):
+        self.cache = caches[alias]
+
+    def get(self, clave):
+        return self.cache.get(clave)
+
+    def set(self, clave, valor, ttl=None):
+        self.cache.set(clave, valor, ttl)
+
+    def incr(self, clave):
+        self.cache.add(clave, _version_inicial(), None)
+        try:
+            return self.cache.incr(clave)
+        except ValueError:
+            # Desalojada entre el add y el incr
+            valor = _version_inicial()
+            self.cache.set(clave, valor, None)
+            return valor
+
+
+def _version_inicial():
+    # Si un contador se pierde (desalojo, reinicio) no debe volver a un valor
+    # usado antes y resucitar entradas viejas
+    return time.time_ns()
+
+
+@lru_cache(maxsize=None)
+def obtener_backend():
+    config = settings.NEGOCIOS_CACHE
+    return import_string(config['BACKEND'])(**config.get('OPCIONES', {}))
+
+
+class _Vuelo:
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error = None
+
+
+_vuelos = {}
+_vuelos_lock = threading.Lock()
+
+
+def _leer(clave, cargar):
+    backend = obtener_backend()
+    valor = backend.get(clave)
+    if valor is not None:
+        return valor
+
+    with _vuelos_lock:
+        vuelo = _vuelos.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _vuelos[clave] = _Vuelo()
+
+    if not lider:
+        vuelo.listo.wait()
+        if vuelo.error is not None:
+            raise vuelo.error
+        return vuelo.valor
+
+    try:
+        vuelo.valor = cargar()
+        backend.set(clave, vuelo.valor, settings.NEGOCIOS_CACHE['TTL'])
+        return vuelo.valor
+    except Exception as e:
+        vuelo.error = e
+        raise
+    finally:
+        with _vuelos_lock:
+            del _vuelos[clave]
+        vuelo.listo.set()
+
+
+def _version(nombre):
+    backend = obtener_backend()
+    version = backend.get(nombre)
+    if version is None:
+        version = backend.incr(nombre)
+    return version
+
+
+def _variante(campos, incluir=()):
+    variante = ','.join(campos) if campos else '*'
+    return f'{variante}+{",".join(incluir)}' if incluir else variante
+
+
+def leer_negocio(id_negocio, campos, cargar, incluir=()):
+    """Detalle de un negocio (con los campos pedidos y las relaciones incluidas)"""
+    version = _version(f'negocios:ver:negocio:{id_negocio}')
+    return _leer(f'negocios:negocio:{id_negocio}:{version}:{_variante(campos, incluir)}', cargar)
+
+
+def leer_lista_usuario(id_usuario, request, cargar):
+    """Una página del listado de negocios de un propietario"""
+    version = _version(f'negocios:ver:usuario:{id_usuario}')
+    # La URL completa distingue cursor, tamaño de página, campos y filtros
+    url = hashlib.sha1(request.build_absolute_uri().encode()).hexdigest()
+    return _leer(f'negocios:usuario:{id_usuario}:{version}:{url}', cargar)
+
+
+def invalidar(id_negocio=None, id_usuarios=()):
+    """Invalida el detalle del negocio y los listados de sus propietarios al confirmar la transacción"""
+    def subir_versiones():
+        backend = obtener_backend()
+        if id_negocio is not None:
+            backend.incr(f'negocios:ver:negocio:{id_negocio}')
+        for id_usuario in set(id_usuarios):
+            backend.incr(f'negocios:ver:usuario:{id_usuario}')
+
+    transaction.on_commit(subir_versiones)
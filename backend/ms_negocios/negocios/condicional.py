@@ -0,0 +1,111 @@
+"""
+Respuestas condicionales (ETag / Last-Modified) a partir de ``actualizado_en``.
+
+- Detalle: el validador es ``id_negocio`` + ``actualizado_en`` (más los campos
+  pedidos, porque cambian la representación).
+- Listados: el validador se calcula sobre la ventana de la página (máximo de
+  ``actualizado_en``, número de filas y suma de ids) con un agregado en SQL,
+  así que comprobarlo nunca trae filas a Python.
+- Con ``?incluir=propietario`` cuenta también el ``actualizado_en`` del
+  propietario: la respuesta cambia cuando llega o cambia su proyección.
+"""
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+from rest_framework.response import Response
+
+from .models import Negocio
+
+
+def etag_negocio(id_negocio, actualizado_en, campos=None, incluir=()):
+    etag = f'n{id_negocio}-{int(actualizado_en.timestamp() * 1_000_000)}'
+    if campos is not None:
+        etag += '-' + hashlib.sha1(','.join(campos).encode()).hexdigest()[:8]
+    if incluir:
+        etag += '-' + '.'.join(incluir)
+    return quote_etag(etag)
+
+
+def modificado(negocio):
+    """``actualizado_en`` del negocio o, si se incluyó y es posterior, el de su propietario"""
+    propietario = getattr(negocio, 'propietario_actualizado_en', None)
+    if propietario is not None and propietario > negocio.actualizado_en:
+        return propietario
+    return negocio.actualizado_en
+
+
+def _etag_lista(url, maximo, total, suma_ids):
+    huella = f'{url}|{maximo.isoformat() if maximo else ""}|{total}|{suma_ids or 0}'
+    return quote_etag('l' + hashlib.sha1(huella.encode()).hexdigest()[:32])
+
+
+def validadores_filas(request, filas):
+    """ETag y última modificación de una página ya leída"""
+    maximo = max((modificado(fila) for fila in filas), default=None)
+    suma_ids = sum(fila.id_negocio for fila in filas)
+    return _etag_lista(request.get_full_path(), maximo, len(filas), suma_ids), maximo
+
+
+def validadores_consulta(request, ventana, incluir=()):
+    """ETag y última modificación de una página, sin leer sus filas"""
+    agregados = {}
+    if 'propietario' in incluir:
+        agregados['maximo_propietario'] = Max('propietario__actualizado_en')
+    agregado = Negocio.objects.filter(id_negocio__in=ventana.values('id_negocio')).aggregate(
+        maximo=Max('actualizado_en'),
+        total=Count('id_negocio'),
+        suma_ids=Sum('id_negocio'),
+        **agregados,
+    )
+    maximo = max(filter(None, (agregado['maximo'], agregado.get('maximo_propietario'))), default=None)
+    return _etag_lista(request.get_full_path(), maximo, agregado['total'], agregado['suma_ids']), maximo
+
+
+def es_condicional(request):
+    return 'If-None-Match' in request.headers or 'If-Modified-Since' in request.headers
+
+
+def _segundos(ultima_modificacion):
+    # Last-Modified tiene resolución de segundos
+    return int(ultima_modificacion.timestamp()) if ultima_modificacion else None
+
+
+def no_modificado(request, etag, ultima_modificacion):
+    """Respuesta 304 si el cliente ya tiene esta versión; ``None`` si no"""
+    respuesta = get_conditional_response(request, etag=etag, last_modified=_segundos(ultima_modificacion))
+    if respuesta is not None:
+        return con_validadores(respuesta, etag, ultima_modificacion)
+    return None
+
+
+def responder(request, datos, etag, modificado):
+    """304 o ``Response`` con los datos, en ambos casos con sus validadores"""
+    respuesta = no_modificado(request, etag, modificado)
+    if respuesta is None:
+        respuesta = con_validadores(Response(datos), etag, modificado)
+    return respuesta
+
+
+def con_validadores(respuesta, etag, ultima_modificacion):
+    respuesta['ETag'] = etag
+    if ultima_modificacion is not None:
+        respuesta['Last-Modified'] = http_date(_segundos(ultima_modificacion))
+    # El cliente puede guardar la respuesta pero debe revalidarla cada vez
+    respuesta['Cache-Control'] = 'no-cache'
+    return respuesta
+
+
+def if_match_falla(request, etag):
+    """
+    ``True`` si la petición trae ``If-Match`` y no coincide con ``etag``.
+    Se ignora el prefijo ``W/`` que añade la compresión de respuestas.
+    """
+    cabecera = request.headers.get('If-Match')
+    if not cabecera:
+        return False
+    etags = parse_etags(cabecera)
+    if '*' in etags:
+        return False
+    return etag not in {valor.removeprefix('W/') for valor in etags}
@@ -0,0 +1,113 @@
+"""
+Escaparate: el documento público de cada tienda, armado de antemano.
+
+- El documento son los campos públicos del negocio más ``tienda``: la
+  ``PLANTILLA`` con la ``personalizacion`` encima y el nombre, logo y dirección
+  del negocio (la misma mezcla que hace ``PersonalizarTiendaPage.jsx``).
+- Se guarda ya serializado y ya comprimido con gzip (``Escaparate``), así que
+  ``GET /<id_negocio>/escaparate/`` solo lee una fila y la devuelve.
+- Se regenera en la transacción de cada cambio del negocio (actualizar,
+  personalizar, actualización masiva, ``migrar_blobs``) y se borra al eliminarlo. Un negocio que
+  aún no tiene documento (recién creado o de antes) se arma en la primera visita.
+- Cambiar la ``PLANTILLA`` exige subir ``VERSION_PLANTILLA`` y correr
+  ``manage.py reconstruir_escaparates --desactualizados``.
+"""
+import gzip
+import hashlib
+
+from acaclick_comun.renderers import ORJSONRenderer
+from django.utils import timezone
+
+from .models import Escaparate, Negocio
+from .serializers import NegocioSerializer
+
+VERSION_PLANTILLA = 1
+
+# Valores por defecto de la tienda (los mismos que PersonalizarTiendaPage.jsx)
+PLANTILLA = {
+    'storeName': 'Mi Tienda Online',
+    'storeLogo': None,
+    'storeSlogan': '',
+    'primaryColor': '#f97316',
+    'bgColor': '#ffffff',
+    'customColor': '#f97316',
+    'fontFamily': 'Inter',
+    'textSize': 'medium',
+    'heroTitle': 'Bienvenido a Nuestra Tienda',
+    'heroSubtitle': 'Descubre los mejores productos con calidad garantizada',
+    'heroBtn': 'Explorar Productos',
+    'featuredTitle': 'Producto Destacado',
+    'featuredDesc': (
+        'Descripción del producto destacado. Este producto es ideal para tu día a día con calidad premium.'
+    ),
+    'featuredImage': None,
+    'productImage1': None,
+    'productImage2': None,
+    'mapAddress': '',
+}
+
+# Campos del negocio que van al documento (sin propietario ni datos internos)
+CAMPOS_PUBLICOS = (
+    'id_negocio', 'nombre', 'tipo', 'descripcion', 'correo', 'telefono', 'direccion',
+    'latitud', 'longitud', 'horario_apertura', 'horario_cierre',
+    'sitio_web', 'facebook', 'instagram', 'twitter', 'logo_url',
+)
+
+_renderer = ORJSONRenderer()
+
+
+def documento(negocio):
+    personalizacion = negocio.personalizacion if isinstance(negocio.personalizacion, dict) else {}
+    tienda = {**PLANTILLA, **personalizacion}
+    # Los datos del negocio mandan sobre los de la personalización
+    tienda['storeName'] = negocio.nombre or tienda['storeName']
+    tienda['storeLogo'] = negocio.logo_url or tienda['storeLogo']
+    tienda['mapAddress'] = negocio.direccion or tienda['mapAddress']
+    return {**NegocioSerializer(negocio, campos=CAMPOS_PUBLICOS).data, 'tienda': tienda}
+
+
+def _armar(negocio, ahora):
+    cuerpo = _renderer.render(documento(negocio))
+    return Escaparate(
+        negocio_id=negocio.id_negocio,
+        cuerpo=cuerpo,
+        # Se comprime una vez por cambio, no por visita: el nivel máximo sale barato
+        cuerpo_gzip=gzip.compress(cuerpo, compresslevel=9, mtime=0),
+        huella=hashlib.sha1(cuerpo).hexdigest(),
+        version_plantilla=VERSION_PLANTILLA,
+        generado_en=ahora,
+    )
+
+
+def materializar(negocios):
+    """Arma y guarda (upsert, un solo INSERT) el escaparate de cada negocio activo"""
+    ahora = timezone.now()
+    escaparates = [_armar(negocio, ahora) for negocio in negocios if negocio.activo]
+    Escaparate.objects.bulk_create(
+        escaparates,
+        update_conflicts=True,
+        unique_fields=['negocio'],
+        update_fields=['cuerpo', 'cuerpo_gzip', 'huella', 'version_plantilla', 'generado_en'],
+    )
+    return escaparates
+
+
+def retirar(id_negocio):
+    Escaparate.objects.filter(negocio_id=id_negocio).delete()
+
+
+def leer(id_negocio, gzip_aceptado):
+    """
+    ``(cuerpo, huella, generado_en)`` del escaparate, en gzip si se acepta;
+    lo arma si todavía no existe. ``None`` si el negocio no existe o está inactivo.
+    """
+    columna = 'cuerpo_gzip' if gzip_aceptado else 'cuerpo'
+    fila = Escaparate.objects.filter(negocio_id=id_negocio, negocio__activo=True).values_list(columna, 'huella', 'generado_en').first()
+    if fila is not None:
+        return fila
+
+    negocio = Negocio.objects.defer('busqueda', 'horario_minutos').filter(id_negocio=id_negocio, activo=True).first()
+    if negocio is None:
+        return None
+    escaparate, = materializar([negocio])
+    return getattr(escaparate, columna), escaparate.huella, escaparate.generado_en
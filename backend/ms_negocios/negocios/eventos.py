@@ -0,0 +1,104 @@
+"""
+Eventos ``negocios.cambios`` (contrato en ``contracts/events/README.md``).
+
+- Cada alta, actualización o personalización encola el estado completo del
+  negocio con clave ``id_negocio``; la baja (o cualquier cambio de un negocio
+  inactivo) encola un tombstone (valor nulo).
+  Como el topic es compactado, el último mensaje de cada clave basta para
+  reconstruir todos los negocios activos leyendo el topic desde el inicio.
+- Se encola en el outbox (``outbox.py``) dentro de la transacción del cambio;
+  ``manage.py publicar_outbox`` los manda a Kafka por lotes.
+"""
+import json
+
+from django.conf import settings
+from django.utils import timezone
+
+from .outbox import encolar, encolar_muchos
+from .serializers import NegocioSerializer
+
+CREADO = 'negocio.creado'
+ACTUALIZADO = 'negocio.actualizado'
+
+# Orden garantizado por clave y sin duplicados en los reintentos del producer
+PRODUCER_CONFIG = {
+    'acks': 'all',
+    'enable_idempotence': True,
+    'max_in_flight_requests_per_connection': 1,
+    'retries': 5,
+    'compression_type': 'gzip',
+    'linger_ms': 20,
+    'max_block_ms': 5000,
+}
+
+
+def _topic():
+    return settings.NEGOCIOS_KAFKA['TOPIC_CAMBIOS']
+
+
+def _payload(tipo, datos):
+    return {
+        'tipo': tipo,
+        'id_negocio': datos['id_negocio'],
+        'negocio': datos,
+        'producido_en': timezone.now().isoformat(),
+    }
+
+
+def publicar_cambio(negocio, tipo=ACTUALIZADO, datos=None):
+    """
+    Encola el estado actual de ``negocio``; llamarlo dentro de la transacción
+    del cambio. ``datos``: su ``NegocioSerializer(...).data`` si ya se tiene.
+    """
+    if not negocio.activo:
+        publicar_baja(negocio.id_negocio)
+        return
+    if datos is None:
+        datos = NegocioSerializer(negocio).data
+    encolar(_topic(), negocio.id_negocio, _payload(tipo, dict(datos)))
+
+
+def publicar_cambios(negocios, tipo=ACTUALIZADO):
+    """Como ``publicar_cambio`` para muchos negocios, con un solo INSERT"""
+    datos = NegocioSerializer(negocios, many=True).data
+    encolar_muchos(_topic(), [
+        (item['id_negocio'], _payload(tipo, dict(item)) if item['activo'] else None) for item in datos
+    ])
+
+
+def publicar_baja(id_negocio):
+    """Tombstone: al compactar, Kafka descarta los mensajes anteriores del negocio"""
+    encolar(_topic(), id_negocio, None)
+
+
+def crear_producer(**opciones):
+    """Producer con la serialización de los eventos (JSON; ``None`` viaja como tombstone)"""
+    # Importado aquí: el arranque del servicio no carga kafka (bench_arranque.py)
+    from kafka import KafkaProducer
+
+    return KafkaProducer(
+        bootstrap_servers=settings.NEGOCIOS_KAFKA['BROKER'],
+        key_serializer=lambda k: k.encode('utf-8'),
+        value_serializer=lambda v: None if v is None else json.dumps(v).encode('utf-8'),
+        **opciones,
+    )
+
+
+def asegurar_topic():
+    """Crea ``negocios.cambios`` compactado si todavía no existe"""
+    from kafka.admin import KafkaAdminClient, NewTopic
+    from kafka.errors import TopicAlreadyExistsError
+
+    config = settings.NEGOCIOS_KAFKA
+    admin = KafkaAdminClient(bootstrap_servers=config['BROKER'])
+    try:
+        admin.create_topics([NewTopic(
+            config['TOPIC_CAMBIOS'],
+            num_partitions=config['PARTICIONES_CAMBIOS'],
+            replication_factor=config['REPLICAS_CAMBIOS'],
+            topic_configs={'cleanup.policy': 'compact'},
+        )])
+    except TopicAlreadyExistsError:
+        pass
+    finally:
+        admin.close()
@@ -0,0 +1,32 @@
+"""
+Filtros comunes a todos los listados de negocios.
+
+Se aplican sobre el queryset antes de paginar, así que se combinan entre sí y
+con el filtro propio de cada endpoint (búsqueda, cercanía, propietario...).
+"""
+from django.utils import timezone
+
+from .serializers import FiltrosListadoSerializer
+
+
+def minuto_del_dia(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def filtrar_listado(request, queryset):
+    """Aplica ``?tipo=``, ``?abierto_ahora=1`` y ``?abierto_a=HH:MM``"""
+    filtros = FiltrosListadoSerializer(data=request.query_params)
+    filtros.is_valid(raise_exception=True)
+    datos = filtros.validated_data
+
+    if 'tipo' in datos:
+        queryset = queryset.filter(tipo=datos['tipo'])
+
+    # Los horarios se guardan en la hora local del servicio (TIME_ZONE)
+    if datos.get('abierto_a') is not None:
+        minuto = minuto_del_dia(datos['abierto_a'])
+    elif datos.get('abierto_ahora'):
+        minuto = minuto_del_dia(timezone.localtime())
+    else:
+        return queryset
+    return queryset.filter(horario_minutos__contiene=minuto)
@@ -0,0 +1,136 @@
+"""
+Búsqueda geográfica ("cerca de mí") sin PostGIS.
+
+Cada negocio guarda el geohash de sus coordenadas en una columna indexada.
+Una consulta por radio:
+
+1. elige la precisión de geohash cuya celda mide al menos el radio,
+2. prefiltra con la celda del punto y sus 8 vecinas (``LIKE 'prefijo%'``
+   sobre el índice) y con la caja lat/lng que envuelve al círculo,
+3. calcula la distancia exacta con haversine en SQL solo sobre esos
+   candidatos, descarta los que quedan fuera y ordena por distancia.
+"""
+import math
+
+from django.db.models import FloatField, Q, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+
+RADIO_TIERRA_M = 6371008.8
+METROS_POR_GRADO = math.pi * RADIO_TIERRA_M / 180
+PRECISION_GEOHASH = 9  # celdas de ~5 m, de sobra para un negocio
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def codificar_geohash(lat, lng, precision=PRECISION_GEOHASH):
+    lat_rango = [-90.0, 90.0]
+    lng_rango = [-180.0, 180.0]
+    resultado = []
+    bits = 0
+    valor = 0
+    par = True  # los bits alternan longitud, latitud, longitud...
+    while len(resultado) < precision:
+        rango, coordenada = (lng_rango, lng) if par else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            resultado.append(_BASE32[valor])
+            bits = 0
+            valor = 0
+    return ''.join(resultado)
+
+
+def geohash_de(latitud, longitud):
+    """Geohash de un negocio, o ``None`` si no tiene coordenadas."""
+    if latitud is None or longitud is None:
+        return None
+    return codificar_geohash(float(latitud), float(longitud))
+
+
+def tamano_celda(precision):
+    """Alto y ancho en grados de una celda de geohash."""
+    bits = 5 * precision
+    bits_lng = (bits + 1) // 2
+    bits_lat = bits // 2
+    return 180.0 / 2 ** bits_lat, 360.0 / 2 ** bits_lng
+
+
+def precision_para_radio(radio_m, lat):
+    """Mayor precisión cuya celda mide, en ambos ejes, al menos ``radio_m``."""
+    cos_lat = max(math.cos(math.radians(lat)), 1e-6)
+    for precision in range(PRECISION_GEOHASH, 0, -1):
+        alto, ancho = tamano_celda(precision)
+        if min(alto * METROS_POR_GRADO, ancho * METROS_POR_GRADO * cos_lat) >= radio_m:
+            return precision
+    return 1
+
+
+def celdas_cercanas(lat, lng, radio_m):
+    """
+    La celda que contiene el punto más sus 8 vecinas. Si el círculo alcanza un
+    polo, todas las longitudes quedan cerca: se toman las filas completas.
+    """
+    precision = precision_para_radio(radio_m, lat)
+    alto, ancho = tamano_celda(precision)
+    if abs(lat) + radio_m / METROS_POR_GRADO >= 90.0:
+        longitudes = [-180.0 + (columna + 0.5) * ancho for columna in range(round(360.0 / ancho))]
+    else:
+        longitudes = [lng - ancho, lng, lng + ancho]
+    celdas = set()
+    for d_lat in (-alto, 0, alto):
+        vecina_lat = min(max(lat + d_lat, -90.0), 90.0)
+        for vecina_lng in longitudes:
+            vecina_lng = (vecina_lng + 180.0) % 360.0 - 180.0
+            celdas.add(codificar_geohash(vecina_lat, vecina_lng, precision))
+    return sorted(celdas)
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Distancia en metros entre dos puntos."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def distancia_sql(lat, lng):
+    """Expresión haversine (en metros) desde el punto hasta cada negocio."""
+    latitud = Cast('latitud', FloatField())
+    longitud = Cast('longitud', FloatField())
+    d_lat = Radians(latitud - Value(lat))
+    d_lng = Radians(longitud - Value(lng))
+    a = (
+        Power(Sin(d_lat / Value(2.0)), 2)
+        + Value(math.cos(math.radians(lat))) * Cos(Radians(latitud)) * Power(Sin(d_lng / Value(2.0)), 2)
+    )
+    return Value(2 * RADIO_TIERRA_M) * ASin(Sqrt(a))
+
+
+def filtrar_cercanos(queryset, lat, lng, radio_m):
+    """Negocios a menos de ``radio_m`` metros, anotados con ``distancia``."""
+    prefiltro = Q()
+    for celda in celdas_cercanas(lat, lng, radio_m):
+        prefiltro |= Q(geohash__startswith=celda)
+
+    d_lat = radio_m / METROS_POR_GRADO
+    queryset = queryset.filter(prefiltro).filter(
+        latitud__gte=max(lat - d_lat, -90.0),
+        latitud__lte=min(lat + d_lat, 90.0),
+    )
+    cos_lat = math.cos(math.radians(lat))
+    if cos_lat > 1e-6:
+        d_lng = d_lat / cos_lat
+        # Si la caja cruza el antimeridiano basta con el prefiltro de geohash
+        if lng - d_lng >= -180.0 and lng + d_lng <= 180.0:
+            queryset = queryset.filter(longitud__gte=lng - d_lng, longitud__lte=lng + d_lng)
+
+    return queryset.annotate(distancia=distancia_sql(lat, lng)).filter(distancia__lte=radio_m)
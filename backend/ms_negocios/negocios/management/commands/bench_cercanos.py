@@ -0,0 +1,107 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from negocios.geo import distancia_sql, filtrar_cercanos, geohash_de, haversine
+from negocios.models import Negocio
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara la búsqueda por cercanía (geohash + haversine) contra el recorrido "
+        "completo de la tabla. Siembra datos dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=200000)
+        parser.add_argument("--consultas", type=int, default=50)
+        parser.add_argument("--radio", type=float, default=2000, help="Metros")
+        parser.add_argument("--semilla", type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _ejecutar(self, options):
+        rnd = random.Random(options["semilla"])
+        radio = options["radio"]
+        # Zona metropolitana de Acapulco y alrededores (~100 km por lado)
+        centro_lat, centro_lng, extension = 16.86, -99.88, 0.5
+
+        self.stdout.write(f"Sembrando {options['filas']} negocios...")
+        lote = []
+        for i in range(options["filas"]):
+            lat = round(centro_lat + rnd.uniform(-extension, extension), 6)
+            lng = round(centro_lng + rnd.uniform(-extension, extension), 6)
+            lote.append(Negocio(
+                nombre=f"Bench {i}", tipo="otro", correo="bench@example.com", telefono="0",
+                direccion="-", id_usuario=0, latitud=lat, longitud=lng, geohash=geohash_de(lat, lng),
+            ))
+            if len(lote) == 5000:
+                Negocio.objects.bulk_create(lote)
+                lote = []
+        Negocio.objects.bulk_create(lote)
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE negocios")
+
+        puntos = [
+            (centro_lat + rnd.uniform(-extension, extension), centro_lng + rnd.uniform(-extension, extension))
+            for _ in range(options["consultas"])
+        ]
+        activos = Negocio.objects.filter(activo=True)
+
+        def indexada(lat, lng):
+            return list(
+                filtrar_cercanos(activos, lat, lng, radio)
+                .order_by("distancia", "id_negocio")
+                .values_list("id_negocio", flat=True)[:20]
+            )
+
+        def sql_completo(lat, lng):
+            return list(
+                activos.annotate(distancia=distancia_sql(lat, lng))
+                .filter(distancia__lte=radio)
+                .order_by("distancia", "id_negocio")
+                .values_list("id_negocio", flat=True)[:20]
+            )
+
+        def python_completo(lat, lng):
+            candidatos = []
+            for id_negocio, n_lat, n_lng in activos.exclude(latitud=None).values_list(
+                "id_negocio", "latitud", "longitud"
+            ).iterator(chunk_size=10000):
+                distancia = haversine(lat, lng, float(n_lat), float(n_lng))
+                if distancia <= radio:
+                    candidatos.append((distancia, id_negocio))
+            return [id_negocio for _, id_negocio in sorted(candidatos)[:20]]
+
+        resultados = {}
+        for nombre, funcion, consultas in (
+            ("geohash + haversine", indexada, puntos),
+            ("haversine SQL sin prefiltro", sql_completo, puntos),
+            ("haversine en Python", python_completo, puntos[:5]),
+        ):
+            inicio = time.perf_counter()
+            resultados[nombre] = [funcion(lat, lng) for lat, lng in consultas]
+            ms = (time.perf_counter() - inicio) * 1000 / len(consultas)
+            self.stdout.write(f"{nombre:<30} {ms:10.2f} ms/consulta")
+
+        base = resultados["haversine SQL sin prefiltro"]
+        coinciden = (
+            resultados["geohash + haversine"] == base
+            and resultados["haversine en Python"] == base[:len(resultados["haversine en Python"])]
+        )
+        if coinciden:
+            self.stdout.write(self.style.SUCCESS("Resultados idénticos en las tres estrategias"))
+        else:
+            self.stderr.write(self.style.ERROR("¡Los resultados de las estrategias no coinciden!"))
@@ -0,0 +1,74 @@
+import time
+
+import jwt
+import orjson
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from negocios.models import Negocio
+
+
+ID_USUARIO_BENCH = -1
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el alta de negocios uno por uno (POST /crear/) contra la carga masiva "
+        "(POST /masivo/crear/ con JSON y NDJSON) y la actualización masiva. Borra al "
+        "final los negocios creados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        filas = options["filas"]
+        # Token como los de ms_usuarios: el propietario de todo lo creado es el usuario del bench
+        token = jwt.encode(
+            {"token_type": "access", "user_id": str(ID_USUARIO_BENCH), "exp": int(time.time()) + 3600},
+            settings.NEGOCIOS_JWT["CLAVE"],
+            algorithm=settings.NEGOCIOS_JWT["ALGORITMO"],
+        )
+        cliente = Client(HTTP_HOST="localhost", HTTP_AUTHORIZATION=f"Bearer {token}")
+        items = [
+            {
+                "businessName": f"Franquicia {i}", "businessType": "restaurante",
+                "email": "franquicia@example.com", "phone": "7440000000",
+                "address": "Av. Costera Miguel Alemán 123, Acapulco",
+                "description": "Sucursal de la franquicia",
+                "location": {"lat": 16.86 + i * 1e-5, "lng": -99.88},
+            }
+            for i in range(filas)
+        ]
+
+        def uno_por_uno():
+            for item in items:
+                cliente.post(reverse("crear_negocio"), item, content_type="application/json")
+
+        def masivo_json():
+            cliente.post(reverse("crear_negocios_masivo"), items, content_type="application/json")
+
+        def masivo_ndjson():
+            cuerpo = b"\n".join(orjson.dumps(item) for item in items)
+            cliente.post(reverse("crear_negocios_masivo"), cuerpo, content_type="application/x-ndjson")
+
+        def actualizar_masivo():
+            ids = Negocio.objects.filter(id_usuario=ID_USUARIO_BENCH).values_list("id_negocio", flat=True)[:filas]
+            cambios = [{"id_negocio": id_negocio, "telefono": "7441111111"} for id_negocio in ids]
+            cliente.patch(reverse("actualizar_negocios_masivo"), cambios, content_type="application/json")
+
+        try:
+            for nombre, funcion in (
+                ("POST /crear/ uno por uno", uno_por_uno),
+                ("POST /masivo/crear/ JSON", masivo_json),
+                ("POST /masivo/crear/ NDJSON", masivo_ndjson),
+                ("PATCH /masivo/actualizar/", actualizar_masivo),
+            ):
+                inicio = time.perf_counter()
+                funcion()
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(f"{nombre:<30} {segundos:8.2f} s {filas / segundos:10.0f} negocios/s")
+        finally:
+            Negocio.objects.filter(id_usuario=ID_USUARIO_BENCH).delete()
@@ -0,0 +1,86 @@
+import time
+
+from acaclick_comun.compresion import brotli, comprimir
+from acaclick_comun.renderers import ORJSONRenderer
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from negocios.models import Negocio
+from negocios.serializers import NegocioSerializer
+
+
+class Rollback(Exception):
+    pass
+
+
+ID_USUARIO_BENCH = -1
+
+PERSONALIZACION = {
+    "colores": {"primario": "#0E7490", "secundario": "#F59E0B", "fondo": "#FFFFFF", "texto": "#111827"},
+    "tipografia": {"titulos": "Poppins", "cuerpo": "Inter", "tamano_base": 16},
+    "banner": {
+        "titulo": "Los mejores mariscos de la bahía",
+        "subtitulo": "Frescos todos los días, directo del muelle",
+        "imagen": "http://127.0.0.1:8002/api/negocios/blobs/" + "a" * 64 + ".webp",
+    },
+    "secciones": [
+        {"tipo": "productos", "titulo": f"Sección {i}", "visible": True, "orden": i, "columnas": 3}
+        for i in range(8)
+    ],
+    "redes": {"facebook": "https://facebook.com/acaclick", "instagram": "https://instagram.com/acaclick"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara el tiempo de serialización y los bytes enviados del listado de negocios "
+        "con JSONRenderer (json de la biblioteca estándar) y ORJSONRenderer, sin comprimir, "
+        "con gzip y con brotli. Siembra datos dentro de una transacción que se revierte."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--filas", type=int, nargs="+", default=[1000, 10000])
+        parser.add_argument("--repeticiones", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._ejecutar(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _ejecutar(self, options):
+        maximo = max(options["filas"])
+        self.stdout.write(f"Sembrando {maximo} negocios...")
+        Negocio.objects.bulk_create(
+            [
+                Negocio(
+                    nombre=f"Mariscos La Bahía {i}", tipo="restaurante", correo="bench@example.com",
+                    telefono="7440000000", direccion="Av. Costera Miguel Alemán 123, Acapulco",
+                    descripcion="Restaurante familiar con vista al mar y mariscos frescos. " * 4,
+                    id_usuario=ID_USUARIO_BENCH, latitud=16.86, longitud=-99.88, geohash="9ey6",
+                    personalizacion=PERSONALIZACION,
+                )
+                for i in range(maximo)
+            ],
+            batch_size=2000,
+        )
+
+        renderers = (("json (stdlib)", JSONRenderer()), ("orjson", ORJSONRenderer()))
+        for filas in options["filas"]:
+            negocios = Negocio.objects.filter(id_usuario=ID_USUARIO_BENCH).defer("busqueda", "horario_minutos")[:filas]
+            datos = NegocioSerializer(negocios, many=True).data
+            self.stdout.write(self.style.MIGRATE_HEADING(f"\n{filas} filas"))
+            self.stdout.write(f"{'renderer':<15}{'ms':>10}{'bytes':>12}{'gzip':>12}{'br':>12}")
+            for nombre, renderer in renderers:
+                inicio = time.perf_counter()
+                for _ in range(options["repeticiones"]):
+                    contenido = renderer.render(datos, "application/json")
+                ms = (time.perf_counter() - inicio) * 1000 / options["repeticiones"]
+                comprimido_br = len(comprimir(contenido, "br")) if brotli is not None else "-"
+                self.stdout.write(
+                    f"{nombre:<15}{ms:>10.2f}{len(contenido):>12}"
+                    f"{len(comprimir(contenido, 'gzip')):>12}{comprimido_br:>12}"
+                )
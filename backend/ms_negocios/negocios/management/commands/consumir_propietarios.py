@@ -0,0 +1,79 @@
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from negocios.propietarios import aplicar, leer
+
+
+class Command(BaseCommand):
+    help = (
+        "Mantiene la tabla local de propietarios a partir del topic 'usuarios.creados' de "
+        "ms_usuarios: lee por lotes, hace upsert de cada lote en una transacción y confirma "
+        "los offsets después. Se puede detener y volver a correr sin duplicar nada."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500, help="Mensajes por lote")
+        parser.add_argument("--una-vez", action="store_true", help="Salir cuando no queden mensajes")
+
+    def handle(self, *args, **options):
+        # Importado aquí: el arranque del servicio no carga kafka (bench_arranque.py)
+        from kafka import KafkaConsumer
+
+        config = settings.NEGOCIOS_KAFKA
+        consumer = KafkaConsumer(
+            config["TOPIC_USUARIOS_CREADOS"],
+            bootstrap_servers=config["BROKER"],
+            group_id=config["GRUPO_PROPIETARIOS"],
+            auto_offset_reset="earliest",
+            # Los offsets se confirman a mano, después de escribir el lote
+            enable_auto_commit=False,
+            max_poll_records=options["lote"],
+        )
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+
+        self.stdout.write(f"[PROPIETARIOS] Escuchando '{config['TOPIC_USUARIOS_CREADOS']}'...")
+        espera = 1.0
+        try:
+            while not self.detener:
+                lote = consumer.poll(timeout_ms=1000, max_records=options["lote"])
+                mensajes = [mensaje for particion in lote.values() for mensaje in particion]
+                if not mensajes:
+                    if options["una_vez"]:
+                        break
+                    continue
+
+                eventos = []
+                for mensaje in mensajes:
+                    evento = leer(mensaje.value)
+                    if evento is None:
+                        # Reintentarlo no lo va a arreglar: se registra y se sigue
+                        self.stderr.write(
+                            f"[PROPIETARIOS] Mensaje inválido en {mensaje.topic}/{mensaje.partition}"
+                            f"@{mensaje.offset}: {(mensaje.value or b'')[:200]!r}"
+                        )
+                    else:
+                        eventos.append(evento)
+
+                try:
+                    tocados = aplicar(eventos)
+                except Exception as e:
+                    # Base caída: volver a leer el mismo lote (sin confirmar) tras una espera creciente
+                    self.stderr.write(f"[PROPIETARIOS] Error aplicando el lote, se reintentará: {e}")
+                    for particion, particion_mensajes in lote.items():
+                        consumer.seek(particion, particion_mensajes[0].offset)
+                    time.sleep(espera)
+                    espera = min(espera * 2, 60)
+                    continue
+                espera = 1.0
+                consumer.commit()
+                self.stdout.write(f"[PROPIETARIOS] {len(mensajes)} mensajes, {tocados} propietarios actualizados")
+        finally:
+            consumer.close()
+
+    def _detener(self, signum, frame):
+        self.detener = True
@@ -0,0 +1,98 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from negocios import cache, escaparate, eventos
+from negocios.blobs import BlobInvalido, es_data_url, externalizar, externalizar_personalizacion
+from negocios.models import Negocio
+
+
+class Command(BaseCommand):
+    help = "Mueve los logos e imágenes en base64 de los negocios existentes al almacén de blobs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=200, help="Negocios por transacción")
+        parser.add_argument("--dry-run", action="store_true", help="Solo contar, sin escribir")
+
+    def handle(self, *args, **options):
+        lote = options["lote"]
+        dry_run = options["dry_run"]
+        ultimo_id = 0
+        revisados = migrados = fallidos = 0
+
+        while True:
+            # Paginación por clave primaria: cada lote cuesta lo mismo que el primero
+            negocios = list(
+                Negocio.objects.filter(id_negocio__gt=ultimo_id)
+                .order_by("id_negocio")
+                .only("id_negocio", "logo_url", "personalizacion")[:lote]
+            )
+            if not negocios:
+                break
+            ultimo_id = negocios[-1].id_negocio
+            revisados += len(negocios)
+
+            cambiados = []
+            for negocio in negocios:
+                if not self._tiene_base64(negocio):
+                    continue
+                if dry_run:
+                    migrados += 1
+                    continue
+                try:
+                    negocio.logo_url = externalizar(negocio.logo_url)
+                    negocio.personalizacion = externalizar_personalizacion(negocio.personalizacion)
+                except BlobInvalido as e:
+                    fallidos += 1
+                    self.stderr.write(f"Negocio {negocio.id_negocio}: {e}")
+                    continue
+                negocio.actualizado_en = timezone.now()
+                cambiados.append(negocio)
+
+            if cambiados:
+                with transaction.atomic():
+                    self._guardar(cambiados)
+                migrados += len(cambiados)
+
+            self.stdout.write(f"Revisados {revisados}, migrados {migrados}...")
+
+        accion = "Por migrar" if dry_run else "Migrados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{accion}: {migrados} de {revisados} negocios ({fallidos} con errores)"
+        ))
+
+    @staticmethod
+    def _guardar(cambiados):
+        """
+        Escribe el lote y, como las demás escrituras, regenera escaparates,
+        invalida la cache y encola los eventos ``negocios.cambios``
+        """
+        campos = ["logo_url", "personalizacion", "actualizado_en"]
+        # El escaparate necesita el negocio completo, no solo las columnas revisadas
+        completos = (
+            Negocio.objects.select_for_update()
+            .defer("busqueda", "horario_minutos")
+            .in_bulk([negocio.id_negocio for negocio in cambiados])
+        )
+        negocios = []
+        for negocio in cambiados:
+            completo = completos[negocio.id_negocio]
+            for campo in campos:
+                setattr(completo, campo, getattr(negocio, campo))
+            negocios.append(completo)
+        Negocio.objects.bulk_update(negocios, campos)
+        for negocio in negocios:
+            cache.invalidar(negocio.id_negocio)
+        cache.invalidar(id_usuarios={negocio.id_usuario for negocio in negocios})
+        eventos.publicar_cambios(negocios)
+        escaparate.materializar(negocios)
+        return negocios
+
+    @staticmethod
+    def _tiene_base64(negocio):
+        if es_data_url(negocio.logo_url):
+            return True
+        personalizacion = negocio.personalizacion
+        return isinstance(personalizacion, dict) and any(
+            es_data_url(valor) for valor in personalizacion.values()
+        )
@@ -0,0 +1,17 @@
+from acaclick_comun.relay import RelayOutboxCommand
+
+from negocios.eventos import PRODUCER_CONFIG, asegurar_topic, crear_producer
+from negocios.outbox import outbox
+
+
+class Command(RelayOutboxCommand):
+    help = (
+        "Relay del outbox: publica en Kafka (topic compactado negocios.cambios) los eventos "
+        "pendientes por lotes, en orden, y los marca como publicados. Con varios relays "
+        "corriendo solo uno publica a la vez."
+    )
+    outbox = outbox
+
+    def crear_producer(self):
+        asegurar_topic()
+        return crear_producer(**PRODUCER_CONFIG)
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from negocios import escaparate
+from negocios.models import Escaparate, Negocio
+
+
+class Command(BaseCommand):
+    help = (
+        "Vuelve a armar los escaparates (documento público de cada tienda) por lotes, "
+        "un INSERT por lote. Correrlo después de cambiar la plantilla de escaparate.py. "
+        "Con --desactualizados solo arma los que faltan o usan una plantilla anterior."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=500)
+        parser.add_argument("--desactualizados", action="store_true")
+
+    def handle(self, *args, **options):
+        negocios = Negocio.objects.filter(activo=True).defer("busqueda", "horario_minutos")
+        if options["desactualizados"]:
+            al_dia = Escaparate.objects.filter(version_plantilla=escaparate.VERSION_PLANTILLA)
+            negocios = negocios.exclude(id_negocio__in=al_dia.values("negocio_id"))
+
+        # Los de negocios dados de baja sobran
+        retirados, _ = Escaparate.objects.filter(negocio__activo=False).delete()
+
+        inicio = time.perf_counter()
+        total, ultimo = 0, 0
+        while True:
+            # Keyset por id: cada lote es una consulta por índice, sin OFFSET
+            lote = list(negocios.filter(id_negocio__gt=ultimo).order_by("id_negocio")[:options["lote"]])
+            if not lote:
+                break
+            with transaction.atomic():
+                escaparate.materializar(lote)
+            total += len(lote)
+            ultimo = lote[-1].id_negocio
+            self.stdout.write(f"{total} escaparates")
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {total} escaparates armados y {retirados} retirados en {segundos:.1f} s"
+        ))
@@ -0,0 +1,143 @@
+"""
+Alta y actualización masiva de negocios (franquicias, importaciones de socios).
+
+Cada ítem se valida con el mismo serializer que la ruta de uno en uno; los
+válidos se escriben con ``bulk_create``/``bulk_update`` en lotes de
+``NEGOCIOS_MASIVO["LOTE"]``, cada lote en su propia transacción. El resultado
+es una entrada por ítem, en el orden recibido, con el id o los errores.
+
+Todo se hace en nombre de ``usuario`` (el del token): los negocios creados son
+suyos y solo puede actualizar los propios; los ajenos cuentan como no encontrados.
+Los eventos ``negocios.cambios`` de cada lote se encolan con un solo INSERT.
+"""
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from . import cache, escaparate, eventos
+from .models import Negocio
+from .serializers import NegocioCreateSerializer, NegocioSerializer
+
+
+def _error(indice, errores):
+    return {'indice': indice, 'estado': 'error', 'errores': errores}
+
+
+def _validar(serializer, item, instancia=None):
+    """
+    Valida un ítem reutilizando la misma instancia del serializer: construir los
+    campos de un ModelSerializer cuesta más que validar, así que se hace una vez.
+    """
+    serializer.instance = instancia
+    try:
+        return serializer.run_validation(item), None
+    except ValidationError as e:
+        return None, as_serializer_error(e)
+
+
+def _lotes(items):
+    tamano = settings.NEGOCIOS_MASIVO['LOTE']
+    for inicio in range(0, len(items), tamano):
+        yield items[inicio:inicio + tamano]
+
+
+def crear(items, usuario):
+    """Valida y crea los negocios de ``usuario``; devuelve un resultado por ítem"""
+    resultados = [None] * len(items)
+    pendientes = []
+    serializer = NegocioCreateSerializer()
+    for indice, item in enumerate(items):
+        datos, errores = _validar(serializer, item)
+        if errores:
+            resultados[indice] = _error(indice, errores)
+            continue
+        negocio = serializer.construir({**datos, 'id_usuario': usuario.id_usuario})
+        # bulk_create no pasa por save()
+        negocio.actualizar_geohash()
+        pendientes.append((indice, negocio))
+
+    for lote in _lotes(pendientes):
+        try:
+            with transaction.atomic():
+                Negocio.objects.bulk_create([negocio for _, negocio in lote])
+                cache.invalidar(id_usuarios=[usuario.id_usuario])
+                eventos.publicar_cambios([negocio for _, negocio in lote], eventos.CREADO)
+        except DatabaseError as e:
+            for indice, _ in lote:
+                resultados[indice] = _error(indice, {'non_field_errors': [str(e)]})
+            continue
+        for indice, negocio in lote:
+            resultados[indice] = {'indice': indice, 'estado': 'creado', 'id_negocio': negocio.id_negocio}
+    return resultados
+
+
+def actualizar(items, usuario):
+    """Aplica actualizaciones parciales (cada ítem con su ``id_negocio``); un resultado por ítem"""
+    resultados = [None] * len(items)
+    pedidos = []
+    vistos = set()
+    for indice, item in enumerate(items):
+        try:
+            id_negocio = int(item['id_negocio'])
+        except (KeyError, TypeError, ValueError):
+            resultados[indice] = _error(indice, {'id_negocio': ['Se requiere un entero']})
+            continue
+        if id_negocio in vistos:
+            resultados[indice] = _error(indice, {'id_negocio': ['Repetido en la misma carga']})
+        else:
+            vistos.add(id_negocio)
+            pedidos.append((indice, id_negocio, item))
+
+    for lote in _lotes(pedidos):
+        try:
+            with transaction.atomic():
+                _actualizar_lote(lote, resultados, usuario)
+        except DatabaseError as e:
+            # El lote se revirtió: los que ya tenían errores de validación los conservan
+            for indice, _, _ in lote:
+                if resultados[indice] is None or resultados[indice]['estado'] != 'error':
+                    resultados[indice] = _error(indice, {'non_field_errors': [str(e)]})
+    return resultados
+
+
+def _actualizar_lote(lote, resultados, usuario):
+    # Bloquear las filas del lote para no pisar escrituras concurrentes
+    negocios = (
+        Negocio.objects.del_propietario(usuario)
+        .select_for_update()
+        .defer('busqueda', 'horario_minutos')
+        .in_bulk([id_negocio for _, id_negocio, _ in lote])
+    )
+    serializer = NegocioSerializer(partial=True)
+    ahora = timezone.now()
+    cambiados, campos = [], {'actualizado_en'}
+    for indice, id_negocio, item in lote:
+        negocio = negocios.get(id_negocio)
+        if negocio is None:
+            resultados[indice] = _error(indice, {'id_negocio': ['Negocio no encontrado']})
+            continue
+        datos, errores = _validar(serializer, item, negocio)
+        if errores:
+            resultados[indice] = _error(indice, errores)
+            continue
+
+        for campo, valor in datos.items():
+            setattr(negocio, campo, valor)
+            campos.add(campo)
+        if {'latitud', 'longitud'} & datos.keys():
+            negocio.actualizar_geohash()
+            campos.add('geohash')
+        # bulk_update no aplica auto_now
+        negocio.actualizado_en = ahora
+        cambiados.append(negocio)
+        resultados[indice] = {'indice': indice, 'estado': 'actualizado', 'id_negocio': id_negocio}
+
+    if cambiados:
+        Negocio.objects.bulk_update(cambiados, sorted(campos))
+        for negocio in cambiados:
+            cache.invalidar(negocio.id_negocio)
+        cache.invalidar(id_usuarios=[usuario.id_usuario])
+        eventos.publicar_cambios(cambiados)
+        escaparate.materializar(cambiados)
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:11
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('negocios', '0003_negocio_personalizacion'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='negocio',
+            options={'ordering': ['-creado_en', '-id_negocio']},
+        ),
+    ]
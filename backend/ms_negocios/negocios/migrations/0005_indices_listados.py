@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:12
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('negocios', '0004_negocio_ordering_desempate'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['-creado_en', '-id_negocio'], name='negocios_activos_creado_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['id_usuario', '-creado_en', '-id_negocio'], name='negocios_usuario_creado_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=models.Index(fields=['tenant_id'], name='negocios_tenant_idx'),
+        ),
+    ]
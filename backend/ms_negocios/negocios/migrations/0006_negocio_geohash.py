@@ -0,0 +1,77 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:14
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+# Copia congelada de ``negocios.geo.codificar_geohash`` (precisión 9) tal como
+# estaba al crear la columna: un cambio posterior en geo.py no debe alterar lo
+# que esta migración ya escribió en otras bases.
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def geohash_de(latitud, longitud, precision=9):
+    lat, lng = float(latitud), float(longitud)
+    lat_rango = [-90.0, 90.0]
+    lng_rango = [-180.0, 180.0]
+    resultado = []
+    bits = 0
+    valor = 0
+    par = True  # los bits alternan longitud, latitud, longitud...
+    while len(resultado) < precision:
+        rango, coordenada = (lng_rango, lng) if par else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if coordenada >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            resultado.append(_BASE32[valor])
+            bits = 0
+            valor = 0
+    return ''.join(resultado)
+
+
+def calcular_geohashes(apps, schema_editor):
+    Negocio = apps.get_model('negocios', 'Negocio')
+    pendientes = (
+        Negocio.objects.filter(latitud__isnull=False, longitud__isnull=False)
+        .order_by('id_negocio')
+        .only('id_negocio', 'latitud', 'longitud')
+    )
+    ultimo_id = 0
+    while True:
+        lote = list(pendientes.filter(id_negocio__gt=ultimo_id)[:1000])
+        if not lote:
+            break
+        for negocio in lote:
+            negocio.geohash = geohash_de(negocio.latitud, negocio.longitud)
+        Negocio.objects.bulk_update(lote, ['geohash'])
+        ultimo_id = lote[-1].id_negocio
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('negocios', '0005_indices_listados'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='negocio',
+            name='geohash',
+            field=models.CharField(blank=True, editable=False, max_length=12, null=True),
+        ),
+        migrations.RunPython(calcular_geohashes, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=models.Index(condition=models.Q(('activo', True)), fields=['geohash'], name='negocios_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('negocios', '0006_negocio_geohash'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='negocio',
+            name='busqueda',
+            field=models.GeneratedField(db_persist=True, expression=django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.CombinedSearchVector(django.contrib.postgres.search.SearchVector('nombre', config='spanish', weight='A'), '||', django.contrib.postgres.search.SearchVector('descripcion', config='spanish', weight='B'), django.contrib.postgres.search.SearchConfig('spanish')), '||', django.contrib.postgres.search.SearchVector('direccion', config='spanish', weight='C'), django.contrib.postgres.search.SearchConfig('spanish')), output_field=django.contrib.postgres.search.SearchVectorField()),
+        ),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('activo', True)), fields=['busqueda'], name='negocios_busqueda_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=django.contrib.postgres.indexes.GinIndex(condition=models.Q(('activo', True)), fields=['nombre'], name='negocios_nombre_trgm_idx', opclasses=['gin_trgm_ops']),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:18
+
+import django.contrib.postgres.indexes
+import django.db.models.expressions
+import django.db.models.functions.comparison
+import django.db.models.functions.datetime
+import negocios.models
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ir dentro de una transacción
+    atomic = False
+
+    dependencies = [
+        ('negocios', '0007_negocio_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='negocio',
+            name='horario_minutos',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(horario_apertura__lt=models.F('horario_cierre'), then=models.Func(models.Func(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractHour('horario_apertura'), '*', models.Value(60)), '+', django.db.models.functions.datetime.ExtractMinute('horario_apertura')), models.IntegerField()), django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractHour('horario_cierre'), '*', models.Value(60)), '+', django.db.models.functions.datetime.ExtractMinute('horario_cierre')), models.IntegerField()), function='int4range', output_field=models.Field()), function='int4multirange', output_field=negocios.models.RangoMinutosField())), models.When(horario_apertura__gt=models.F('horario_cierre'), then=models.Func(models.Func(django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractHour('horario_apertura'), '*', models.Value(60)), '+', django.db.models.functions.datetime.ExtractMinute('horario_apertura')), models.IntegerField()), models.Value(1440), function='int4range', output_field=models.Field()), models.Func(models.Value(0), django.db.models.functions.comparison.Cast(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.functions.datetime.ExtractHour('horario_cierre'), '*', models.Value(60)), '+', django.db.models.functions.datetime.ExtractMinute('horario_cierre')), models.IntegerField()), function='int4range', output_field=models.Field()), function='int4multirange', output_field=negocios.models.RangoMinutosField())), models.When(horario_apertura=models.F('horario_cierre'), then=models.Func(models.Func(models.Value(0), models.Value(1440), function='int4range', output_field=models.Field()), function='int4multirange', output_field=negocios.models.RangoMinutosField())), default=models.Value(None), output_field=negocios.models.RangoMinutosField()), output_field=negocios.models.RangoMinutosField()),
+        ),
+        AddIndexConcurrently(
+            model_name='negocio',
+            index=django.contrib.postgres.indexes.GistIndex(condition=models.Q(('activo', True)), fields=['horario_minutos'], name='negocios_horario_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('negocios', '0008_negocio_horario_minutos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Propietario',
+            fields=[
+                ('id_usuario', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('nombre', models.CharField(blank=True, max_length=100, null=True)),
+                ('apellido_paterno', models.CharField(blank=True, max_length=100, null=True)),
+                ('correo', models.EmailField(blank=True, max_length=255, null=True)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'propietarios',
+            },
+        ),
+        migrations.AddField(
+            model_name='negocio',
+            name='propietario',
+            field=models.ForeignObject(from_fields=['id_usuario'], null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='negocios.propietario', to_fields=['id_usuario']),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('negocios', '0009_propietario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id_evento', models.BigAutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=200)),
+                ('clave', models.CharField(max_length=200)),
+                ('payload', models.JSONField(blank=True, null=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('publicado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'outbox',
+                'indexes': [models.Index(condition=models.Q(('publicado_en__isnull', True)), fields=['id_evento'], name='outbox_pendientes_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('negocios', '0010_outbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Escaparate',
+            fields=[
+                ('negocio', models.OneToOneField(db_column='id_negocio', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='escaparate', serialize=False, to='negocios.negocio')),
+                ('cuerpo', models.BinaryField()),
+                ('cuerpo_gzip', models.BinaryField()),
+                ('huella', models.CharField(max_length=40)),
+                ('version_plantilla', models.PositiveIntegerField()),
+                ('generado_en', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'escaparates',
+            },
+        ),
+    ]
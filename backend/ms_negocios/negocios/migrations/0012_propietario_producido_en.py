@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 14:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('negocios', '0011_escaparate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propietario',
+            name='producido_en',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
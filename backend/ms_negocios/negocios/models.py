@@ -1,6 +1,78 @@
+from django.contrib.postgres.indexes import GinIndex, GistIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
+from django.db.models.functions import Cast, ExtractHour, ExtractMinute
 import uuid
 
+from acaclick_comun.outbox import EventoOutboxBase
+
+from .geo import geohash_de
+
+
+MINUTOS_DIA = 24 * 60
+
+
+class RangoMinutosField(models.Field):
+    """
+    Conjunto de minutos del día (``int4multirange``). Solo se usa para filtrar
+    con ``__contiene=<minuto>``; la API nunca lo lee.
+    """
+
+    def db_type(self, connection):
+        return 'int4multirange'
+
+
+@RangoMinutosField.register_lookup
+class Contiene(models.Lookup):
+    lookup_name = 'contiene'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} @> ({rhs})::integer', lhs_params + rhs_params
+
+    def get_db_prep_lookup(self, value, connection):
+        return ('%s', [value])
+
+
+def _minuto_del_dia(campo):
+    return Cast(ExtractHour(campo) * 60 + ExtractMinute(campo), models.IntegerField())
+
+
+def _tramos(*tramos):
+    rangos = [
+        models.Func(inicio, fin, function='int4range', output_field=models.Field())
+        for inicio, fin in tramos
+    ]
+    return models.Func(*rangos, function='int4multirange', output_field=RangoMinutosField())
+
+
+def _minutos_abierto():
+    """Expresión SQL con los minutos en que el negocio está abierto"""
+    apertura = _minuto_del_dia('horario_apertura')
+    cierre = _minuto_del_dia('horario_cierre')
+    inicio_dia = models.Value(0)
+    fin_dia = models.Value(MINUTOS_DIA)
+    return models.Case(
+        # Horario normal: 09:00-18:00
+        models.When(horario_apertura__lt=models.F('horario_cierre'), then=_tramos((apertura, cierre))),
+        # Cruza la medianoche: 20:00-02:00 son dos tramos
+        models.When(
+            horario_apertura__gt=models.F('horario_cierre'),
+            then=_tramos((apertura, fin_dia), (inicio_dia, cierre)),
+        ),
+        # Misma hora de apertura y cierre: abierto las 24 horas
+        models.When(horario_apertura=models.F('horario_cierre'), then=_tramos((inicio_dia, fin_dia))),
+        default=models.Value(None),
+        output_field=RangoMinutosField(),
+    )
+
+
+class NegocioQuerySet(models.QuerySet):
+    def del_propietario(self, usuario):
+        """Solo los negocios de ``usuario`` (el del token; ver ``autenticacion.py``)"""
+        return self.filter(id_usuario=usuario.id_usuario)
+
 
 class Negocio(models.Model):
     TIPO_CHOICES = [
@@ -23,10 +95,18 @@ class Negocio(models.Model):
     direccion = models.TextField()
     latitud = models.DecimalField(max_digits=10, decimal_places=8, blank=True, null=True)
     longitud = models.DecimalField(max_digits=11, decimal_places=8, blank=True, null=True)
+    # Geohash de (latitud, longitud) para el prefiltro de búsquedas por cercanía
+    geohash = models.CharField(max_length=12, blank=True, null=True, editable=False)
     
     # Horario
     horario_apertura = models.TimeField(blank=True, null=True)
     horario_cierre = models.TimeField(blank=True, null=True)
+    # Minutos del día (hora local del servicio) en que está abierto, para "abierto ahora"
+    horario_minutos = models.GeneratedField(
+        expression=_minutos_abierto(),
+        output_field=RangoMinutosField(),
+        db_persist=True,
+    )
     
     # Web y redes sociales
     sitio_web = models.CharField(max_length=500, blank=True, null=True)
@@ -40,17 +120,159 @@ class Negocio(models.Model):
     # Personalización de la tienda (JSON)
     personalizacion = models.JSONField(blank=True, null=True, default=dict)
     
+    # Documento de búsqueda de texto completo; Postgres lo recalcula en cada escritura de la fila
+    busqueda = models.GeneratedField(
+        expression=(
+            SearchVector('nombre', weight='A', config='spanish')
+            + SearchVector('descripcion', weight='B', config='spanish')
+            + SearchVector('direccion', weight='C', config='spanish')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
     # Metadata
     id_usuario = models.BigIntegerField()  # ID del usuario propietario (referencia a ms_usuarios)
+    # Sin columna ni FK en la base: solo el JOIN con la proyección local (``?incluir=propietario``)
+    propietario = models.ForeignObject(
+        'Propietario',
+        on_delete=models.DO_NOTHING,
+        from_fields=['id_usuario'],
+        to_fields=['id_usuario'],
+        null=True,
+        related_name='+',
+    )
     tenant_id = models.UUIDField(default=uuid.uuid4, editable=False)
     activo = models.BooleanField(default=True)
     creado_en = models.DateTimeField(auto_now_add=True)
     actualizado_en = models.DateTimeField(auto_now=True)
 
+    objects = NegocioQuerySet.as_manager()
+
     class Meta:
         db_table = 'negocios'
-        ordering = ['-creado_en']
+        ordering = ['-creado_en', '-id_negocio']
+        indexes = [
+            # Listado público: solo activos, en el orden del cursor de paginación
+            models.Index(
+                fields=['-creado_en', '-id_negocio'],
+                name='negocios_activos_creado_idx',
+                condition=models.Q(activo=True),
+            ),
+            # Negocios de un propietario, mismo orden
+            models.Index(
+                fields=['id_usuario', '-creado_en', '-id_negocio'],
+                name='negocios_usuario_creado_idx',
+                condition=models.Q(activo=True),
+            ),
+            models.Index(fields=['tenant_id'], name='negocios_tenant_idx'),
+            # Prefijos de geohash (LIKE 'abc%') para "cerca de mí"
+            models.Index(
+                fields=['geohash'],
+                name='negocios_geohash_idx',
+                opclasses=['varchar_pattern_ops'],
+                condition=models.Q(activo=True),
+            ),
+            # "Abierto a las HH:MM": horario_minutos @> minuto
+            GistIndex(fields=['horario_minutos'], name='negocios_horario_idx', condition=models.Q(activo=True)),
+            # Búsqueda de texto completo y por similitud (errores de dedo) en el nombre
+            GinIndex(fields=['busqueda'], name='negocios_busqueda_idx', condition=models.Q(activo=True)),
+            GinIndex(
+                fields=['nombre'],
+                name='negocios_nombre_trgm_idx',
+                opclasses=['gin_trgm_ops'],
+                condition=models.Q(activo=True),
+            ),
+        ]
 
     def __str__(self):
         return f"{self.nombre} ({self.tipo})"
 
+    def actualizar_geohash(self):
+        """Recalcula el geohash; ``bulk_create``/``bulk_update`` no pasan por ``save()``"""
+        self.geohash = geohash_de(self.latitud, self.longitud)
+
+    def save(self, *args, **kwargs):
+        # Mantener el geohash al día cuando cambian las coordenadas
+        if not {'latitud', 'longitud'} & self.get_deferred_fields():
+            self.actualizar_geohash()
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and {'latitud', 'longitud'} & set(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'geohash'}
+        super().save(*args, **kwargs)
+
+
+
+class Propietario(models.Model):
+    """
+    Copia local de los datos del usuario dueño, construida con los eventos
+    'usuarios.creados' de ms_usuarios (``manage.py consumir_propietarios``).
+    Puede faltar o ir atrasada: ms_usuarios sigue siendo la fuente de verdad.
+    """
+
+    id_usuario = models.BigIntegerField(primary_key=True)
+    nombre = models.CharField(max_length=100, blank=True, null=True)
+    apellido_paterno = models.CharField(max_length=100, blank=True, null=True)
+    # No se expone en la API de negocios (es pública)
+    correo = models.EmailField(max_length=255, blank=True, null=True)
+    # ``producido_en`` del último evento aplicado: uno más viejo ya no lo pisa
+    producido_en = models.DateTimeField(blank=True, null=True)
+    # Cambia solo cuando cambian los datos (forma parte de los validadores HTTP)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'propietarios'
+
+    def __str__(self):
+        return f"{self.nombre} {self.apellido_paterno} ({self.id_usuario})"
+
+
+class EventoOutbox(EventoOutboxBase):
+    """
+    Evento pendiente de publicar en Kafka (``negocios.cambios``). Se escribe en
+    la misma transacción que el cambio; el relay (``publicar_outbox``) lo envía
+    después. La clave es el id del negocio (partición y compactación).
+    """
+
+    # ``None`` es un tombstone: en el topic compactado borra la clave
+    payload = models.JSONField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'outbox'
+        indexes = [
+            # El relay solo recorre los pendientes, en orden de id
+            models.Index(
+                fields=['id_evento'],
+                name='outbox_pendientes_idx',
+                condition=models.Q(publicado_en__isnull=True),
+            ),
+        ]
+
+
+class Escaparate(models.Model):
+    """
+    Documento público de la tienda ya armado (``negocios/escaparate.py``):
+    los datos del negocio y su personalización sobre la plantilla, guardado
+    como JSON y como JSON gzip, listo para responder sin serializar nada.
+    """
+
+    negocio = models.OneToOneField(
+        Negocio,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='id_negocio',
+        related_name='escaparate',
+    )
+    cuerpo = models.BinaryField()
+    cuerpo_gzip = models.BinaryField()
+    # Huella del cuerpo: no cambia si al regenerarlo queda igual
+    huella = models.CharField(max_length=40)
+    # Versión de la plantilla con la que se armó (reconstruir_escaparates --desactualizados)
+    version_plantilla = models.PositiveIntegerField()
+    generado_en = models.DateTimeField()
+
+    class Meta:
+        db_table = 'escaparates'
+
+    def __str__(self):
+        return f"Escaparate de {self.negocio_id}"
@@ -0,0 +1,17 @@
+"""
+Outbox de ms_negocios (``acaclick_comun.outbox``, el mismo que ms_usuarios).
+
+Las vistas encolan en ``EventoOutbox`` dentro de la transacción del cambio y
+``manage.py publicar_outbox`` los manda a Kafka.
+"""
+from acaclick_comun.outbox import Outbox
+
+from .models import EventoOutbox
+
+# Llave del advisory lock del relay (ms_usuarios usa otra)
+outbox = Outbox(EventoOutbox, llave_relay=7302001)
+
+encolar = outbox.encolar
+encolar_muchos = outbox.encolar_muchos
+publicar_pendientes = outbox.publicar_pendientes
+purgar_publicados = outbox.purgar_publicados
@@ -0,0 +1,139 @@
+"""
+Paginación por keyset (cursor) para los listados de negocios.
+
+En vez de ``OFFSET``, cada página continúa a partir del último registro de la
+anterior sobre el orden ``-creado_en, -id_negocio``. Así la página N cuesta lo
+mismo que la primera y no se salta ni repite filas cuando se insertan negocios
+entre una petición y otra.
+"""
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class PaginacionKeyset(BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Cursor inválido'
+
+    # Campo de orden y desempate único
+    campo_orden = 'creado_en'
+    campo_desempate = 'id_negocio'
+    descendente = True
+
+    def ventana(self, queryset, request):
+        """
+        Consulta de la página pedida, con un registro extra para saber si hay
+        página siguiente sin hacer COUNT.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+
+        signo = '-' if self.descendente else ''
+        queryset = queryset.order_by(f'{signo}{self.campo_orden}', f'{signo}{self.campo_desempate}')
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            orden, desempate = cursor
+            hasta, despues = ('lte', 'lt') if self.descendente else ('gte', 'gt')
+            # El primer filtro acota el rango del índice; el Q resuelve los empates
+            queryset = queryset.filter(**{f'{self.campo_orden}__{hasta}': orden}).filter(
+                Q(**{f'{self.campo_orden}__{despues}': orden})
+                | Q(**{self.campo_orden: orden, f'{self.campo_desempate}__{despues}': desempate})
+            )
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.siguiente = None
+        # Todas las filas leídas (incluida la extra); sirven para calcular el ETag
+        self.filas = list(self.ventana(queryset, request))
+        resultados = self.filas[:self.page_size]
+        if len(self.filas) > self.page_size:
+            ultimo = resultados[-1]
+            self.siguiente = (
+                getattr(ultimo, self.campo_orden),
+                getattr(ultimo, self.campo_desempate),
+            )
+        return resultados
+
+    def get_page_size(self, request):
+        try:
+            solicitado = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if solicitado <= 0:
+            return self.page_size
+        return min(solicitado, self.max_page_size)
+
+    def get_next_link(self):
+        if self.siguiente is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(*self.siguiente))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def codificar_orden(self, valor):
+        return valor.isoformat()
+
+    def decodificar_orden(self, texto):
+        return datetime.fromisoformat(texto)
+
+    def encode_cursor(self, orden, desempate):
+        crudo = f'{self.codificar_orden(orden)}|{desempate}'.encode()
+        return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None
+        try:
+            crudo = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+            orden, desempate = crudo.split('|')
+            return self.decodificar_orden(orden), int(desempate)
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+
+class PaginacionCalculada(PaginacionKeyset):
+    """Keyset sobre un valor numérico anotado en la consulta."""
+
+    def codificar_orden(self, valor):
+        return repr(valor)
+
+    def decodificar_orden(self, texto):
+        return float(texto)
+
+
+class PaginacionDistancia(PaginacionCalculada):
+    """De menor a mayor distancia al punto buscado."""
+    campo_orden = 'distancia'
+    descendente = False
+
+
+class PaginacionRelevancia(PaginacionCalculada):
+    """De mayor a menor relevancia en la búsqueda de texto."""
+    campo_orden = 'relevancia'
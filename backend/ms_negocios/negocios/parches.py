@@ -0,0 +1,270 @@
+"""
+Cambios parciales de ``personalizacion`` aplicados en Postgres.
+
+``PATCH /<id_negocio>/personalizar/`` acepta un JSON Merge Patch (RFC 7396,
+``application/merge-patch+json``) o un JSON Patch (RFC 6902,
+``application/json-patch+json``). El parche se traduce a una cadena de pasos
+con ``||``, ``-``, ``#-``, ``jsonb_set`` y ``jsonb_insert`` y se aplica en una
+sola sentencia, sin traer el documento a Python:
+
+- el primer paso bloquea la fila del propietario (``FOR UPDATE``) y cada paso
+  es un CTE sobre el anterior; un ``test`` o una ruta inexistente dejan la
+  cadena vacía y no se escribe nada;
+- solo se escriben ``personalizacion`` y ``actualizado_en``, y solo si el
+  documento resultante no pasa de ``NEGOCIOS_PERSONALIZACION["TAMANO_MAXIMO"]``
+  bytes, medidos como el texto del jsonb guardado (``medir``, lo mismo que
+  comprueba el POST);
+- se devuelven únicamente las secciones (claves de primer nivel) tocadas.
+
+En JSON Patch un segmento numérico o ``-`` bajo un arreglo es una posición
+del arreglo (``add`` no admite una mayor que su largo); bajo un objeto, una clave.
+"""
+import re
+
+import orjson
+from django.conf import settings
+from django.db import DataError, connection, transaction
+from django.utils import timezone
+
+from .blobs import externalizar
+from .models import Negocio
+
+MERGE_PATCH = 'application/merge-patch+json'
+JSON_PATCH = 'application/json-patch+json'
+
+OPERACIONES = ('add', 'remove', 'replace', 'move', 'copy', 'test')
+INDICE_RE = re.compile(r'0|[1-9][0-9]*')
+
+
+class ParcheInvalido(Exception):
+    """El parche está mal formado (400)"""
+
+
+class ParcheNoAplicable(Exception):
+    """Falló un ``test`` o falta una ruta en el documento actual (409)"""
+
+
+class PersonalizacionDemasiadoGrande(Exception):
+    """El documento resultante pasa del tamaño máximo (413)"""
+
+
+def _externalizar(valor):
+    """Las imágenes embebidas (data URLs) pasan a blobs, a cualquier profundidad"""
+    if isinstance(valor, dict):
+        return {clave: _externalizar(v) for clave, v in valor.items()}
+    if isinstance(valor, list):
+        return [_externalizar(v) for v in valor]
+    return externalizar(valor)
+
+
+def _json(valor):
+    return orjson.dumps(valor).decode()
+
+
+# Tamaño de un documento contra ``TAMANO_MAXIMO``: su texto como jsonb
+TAMANO_SQL = 'octet_length({}::text)'
+
+
+def medir(personalizacion):
+    """Bytes de ``personalizacion`` tal como se mide al guardarla (ver ``TAMANO_SQL``)"""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT ' + TAMANO_SQL.format('%s::jsonb'), [_json(personalizacion)])
+        return cursor.fetchone()[0]
+
+
+def _ruta(puntero, nombre='path'):
+    """JSON Pointer (RFC 6901) -> lista de segmentos"""
+    if not isinstance(puntero, str) or (puntero and not puntero.startswith('/')):
+        raise ParcheInvalido(f'"{nombre}" debe ser un JSON Pointer ("" o "/a/b")')
+    if not puntero:
+        return []
+    return [segmento.replace('~1', '/').replace('~0', '~') for segmento in puntero[1:].split('/')]
+
+
+# Cada paso es (expresión sobre ``doc``, parámetros, condición o None, parámetros)
+
+def _agregar(destino, ruta, valor):
+    """``add`` de JSON Patch sobre el fragmento ``destino`` (sql, params) con ``valor`` (sql, params)"""
+    padre, ultimo = ruta[:-1], ruta[-1]
+    d_sql, d_params = destino
+    v_sql, v_params = valor
+    if ultimo == '-':
+        insercion, despues = padre + ['-1'], True
+    else:
+        insercion, despues = ruta, False
+    sql = (
+        f"CASE WHEN jsonb_typeof({d_sql} #> %s::text[]) = 'array' "
+        f"THEN jsonb_insert({d_sql}, %s::text[], {v_sql}, %s) "
+        f"ELSE jsonb_set({d_sql}, %s::text[], {v_sql}, true) END"
+    )
+    params = [*d_params, padre, *d_params, insercion, *v_params, despues, *d_params, ruta, *v_params]
+    # El padre debe existir y poder contener el valor
+    condicion = f"jsonb_typeof({d_sql} #> %s::text[]) IN ('object', 'array')"
+    params_condicion = [*d_params, padre]
+    if ultimo != '-':
+        # En un arreglo la posición no puede pasar de su largo (RFC 6902 §4.1)
+        if INDICE_RE.fullmatch(ultimo):
+            en_arreglo = f"jsonb_array_length({d_sql} #> %s::text[]) >= %s"
+            params_arreglo = [*d_params, padre, int(ultimo)]
+        else:
+            en_arreglo, params_arreglo = 'false', []
+        condicion += (
+            f" AND CASE WHEN jsonb_typeof({d_sql} #> %s::text[]) = 'array' THEN {en_arreglo} ELSE true END"
+        )
+        params_condicion += [*d_params, padre, *params_arreglo]
+    return sql, params, condicion, params_condicion
+
+
+def _pasos_json_patch(operaciones):
+    if not isinstance(operaciones, list):
+        raise ParcheInvalido('Un JSON Patch es un arreglo de operaciones')
+    if len(operaciones) > settings.NEGOCIOS_PERSONALIZACION['MAXIMO_OPERACIONES']:
+        raise ParcheInvalido(
+            f"Máximo {settings.NEGOCIOS_PERSONALIZACION['MAXIMO_OPERACIONES']} operaciones por parche"
+        )
+    pasos, secciones = [], set()
+    doc = ('doc', [])
+    for operacion in operaciones:
+        if not isinstance(operacion, dict) or operacion.get('op') not in OPERACIONES:
+            raise ParcheInvalido(f'Operación inválida: {operacion!r}; se admite {", ".join(OPERACIONES)}')
+        op = operacion['op']
+        ruta = _ruta(operacion.get('path'))
+        if op in ('add', 'replace', 'test'):
+            if 'value' not in operacion:
+                raise ParcheInvalido(f'"{op}" necesita "value"')
+            valor = _externalizar(operacion['value'])
+        if op in ('move', 'copy'):
+            origen = _ruta(operacion.get('from'), 'from')
+            if op == 'move' and ruta[:len(origen)] == origen and ruta != origen:
+                raise ParcheInvalido('No se puede mover un valor dentro de sí mismo')
+
+        if not ruta:
+            # Todo el documento: solo reemplazarlo por otro objeto (o comprobarlo)
+            if op == 'test':
+                pasos.append(('doc', [], 'doc = %s::jsonb', [_json(valor)]))
+                continue
+            if op not in ('add', 'replace') or not isinstance(valor, dict):
+                raise ParcheInvalido('La personalización completa solo se puede reemplazar por un objeto')
+            pasos.append(('%s::jsonb', [_json(valor)], None, []))
+            secciones.add(None)
+            continue
+
+        if op != 'test':
+            secciones.add(ruta[0])
+        if op == 'add':
+            pasos.append(_agregar(doc, ruta, ('%s::jsonb', [_json(valor)])))
+        elif op == 'replace':
+            pasos.append((
+                'jsonb_set(doc, %s::text[], %s::jsonb, false)', [ruta, _json(valor)],
+                'doc #> %s::text[] IS NOT NULL', [ruta],
+            ))
+        elif op == 'remove':
+            pasos.append(('doc #- %s::text[]', [ruta], 'doc #> %s::text[] IS NOT NULL', [ruta]))
+        elif op == 'test':
+            pasos.append(('doc', [], 'doc #> %s::text[] = %s::jsonb', [ruta, _json(valor)]))
+        else:
+            if not origen:
+                raise ParcheInvalido(f'"{op}" no admite "from" vacío')
+            destino = ('(doc #- %s::text[])', [origen]) if op == 'move' else doc
+            sql, params, condicion, params_condicion = _agregar(destino, ruta, ('(doc #> %s::text[])', [origen]))
+            pasos.append((
+                sql, params,
+                f'doc #> %s::text[] IS NOT NULL AND {condicion}', [origen, *params_condicion],
+            ))
+            if op == 'move':
+                secciones.add(origen[0])
+    return pasos, secciones
+
+
+def _pasos_merge_patch(parche, ruta=()):
+    if not isinstance(parche, dict):
+        raise ParcheInvalido('El merge patch de la personalización debe ser un objeto')
+    ruta = list(ruta)
+    planos = {clave: _externalizar(valor) for clave, valor in parche.items()
+              if valor is not None and not isinstance(valor, dict)}
+    borrar = [clave for clave, valor in parche.items() if valor is None]
+    pasos = []
+    if planos or borrar:
+        cambio = '(({objetivo}) || %s::jsonb) - %s::text[]'
+        if ruta:
+            pasos.append((
+                'jsonb_set(doc, %s::text[], ' + cambio.format(objetivo='doc #> %s::text[]') + ')',
+                [ruta, ruta, _json(planos), borrar], None, [],
+            ))
+        else:
+            pasos.append((cambio.format(objetivo='doc'), [_json(planos), borrar], None, []))
+    for clave, valor in parche.items():
+        if isinstance(valor, dict):
+            sub = ruta + [clave]
+            # Si no había un objeto en esa clave se empieza de uno vacío (RFC 7396)
+            pasos.append((
+                "jsonb_set(doc, %s::text[], CASE WHEN jsonb_typeof(doc #> %s::text[]) = 'object' "
+                "THEN doc #> %s::text[] ELSE '{}'::jsonb END, true)",
+                [sub, sub, sub], None, [],
+            ))
+            pasos.extend(_pasos_merge_patch(valor, sub))
+    return pasos
+
+
+def aplicar(negocio_id, usuario, tipo, parche):
+    """
+    Aplica el parche a la personalización del negocio de ``usuario``.
+    Devuelve ``(secciones, actualizado_en)``: ``{clave: valor nuevo o None}``
+    de las claves de primer nivel tocadas. ``Negocio.DoesNotExist`` si no es suyo.
+    """
+    if tipo == MERGE_PATCH:
+        pasos, secciones = _pasos_merge_patch(parche), set(parche)
+    elif tipo == JSON_PATCH:
+        pasos, secciones = _pasos_json_patch(parche)
+    else:
+        raise ParcheInvalido(f'Se espera {MERGE_PATCH} o {JSON_PATCH}')
+
+    tabla = Negocio._meta.db_table
+    ctes = [
+        f"p0 AS (SELECT COALESCE(personalizacion, '{{}}'::jsonb) AS doc FROM {tabla} "
+        "WHERE id_negocio = %s AND id_usuario = %s AND activo FOR UPDATE)"
+    ]
+    params = [negocio_id, usuario.id_usuario]
+    for numero, (expresion, params_expresion, condicion, params_condicion) in enumerate(pasos, start=1):
+        cte = f"p{numero} AS (SELECT {expresion} AS doc FROM p{numero - 1}"
+        if condicion:
+            cte += f" WHERE {condicion}"
+        ctes.append(cte + ")")
+        params += [*params_expresion, *params_condicion]
+
+    ahora = timezone.now()
+    todo = None in secciones
+    sql = (
+        "WITH " + ", ".join(ctes) + ", "
+        f"final AS (SELECT doc, {TAMANO_SQL.format('doc')} AS tamano FROM p{len(pasos)}), "
+        f"cambio AS (UPDATE {tabla} SET personalizacion = final.doc, actualizado_en = %s "
+        f"FROM final WHERE {tabla}.id_negocio = %s AND final.tamano <= %s RETURNING 1) "
+        "SELECT EXISTS (SELECT 1 FROM p0), (SELECT tamano FROM final), EXISTS (SELECT 1 FROM cambio), "
+        + (
+            "(SELECT doc FROM final)" if todo else
+            "(SELECT jsonb_object_agg(clave, doc -> clave) FROM final, unnest(%s::text[]) AS clave)"
+        )
+    )
+    params += [ahora, negocio_id, settings.NEGOCIOS_PERSONALIZACION['TAMANO_MAXIMO']]
+    if not todo:
+        params.append(sorted(secciones))
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            existe, tamano, escrito, cambios = cursor.fetchone()
+    except DataError as e:
+        # Rutas que atraviesan un valor que no es objeto ni arreglo, índices no numéricos...
+        raise ParcheNoAplicable(str(e).splitlines()[0])
+
+    if not existe:
+        raise Negocio.DoesNotExist
+    if tamano is None:
+        raise ParcheNoAplicable('Falló un "test" o una ruta no existe en la personalización actual')
+    if not escrito:
+        raise PersonalizacionDemasiadoGrande(
+            f"La personalización no puede pasar de {settings.NEGOCIOS_PERSONALIZACION['TAMANO_MAXIMO']} bytes"
+        )
+    if isinstance(cambios, str):
+        cambios = orjson.loads(cambios)
+    return cambios or {}, ahora
@@ -0,0 +1,83 @@
+"""
+Proyección local de los propietarios (``Propietario``) desde Kafka.
+
+``manage.py consumir_propietarios`` lee el topic 'usuarios.creados' de
+ms_usuarios por lotes y llama a ``aplicar`` con cada lote:
+
+- Un solo ``INSERT ... ON CONFLICT DO UPDATE`` por lote (upsert). Un evento
+  con ``producido_en`` anterior o igual al ya aplicado no se escribe, y si
+  los datos no cambian ``actualizado_en`` (y con él el ETag de los negocios)
+  se queda igual: la entrega al menos una vez no duplica ni retrocede nada.
+- El lote se escribe en una transacción y los offsets se confirman después;
+  si el proceso cae entre ambos, el lote se vuelve a aplicar sin efecto.
+- Al cambiar los datos de un propietario se invalida en la cache el detalle de sus negocios
+  y sus listados (solo llega a los workers si la cache es compartida, ver
+  ``NEGOCIOS_CACHE``).
+"""
+import json
+
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache
+from .models import Negocio, Propietario
+
+CAMPOS = ('nombre', 'apellido_paterno', 'correo')
+
+
+def leer(valor):
+    """Payload de un mensaje (bytes JSON); ``None`` si no es un evento de usuario válido"""
+    try:
+        datos = json.loads(valor)
+    except (TypeError, ValueError):
+        return None
+    if not isinstance(datos, dict) or not isinstance(datos.get('id_usuario'), int):
+        return None
+    return datos
+
+
+def _producido_en(evento):
+    try:
+        return parse_datetime(evento.get('producido_en') or '')
+    except (TypeError, ValueError):
+        return None
+
+
+def aplicar(eventos):
+    """Upsert de los payloads de 'usuarios.creados' (en orden); devuelve cuántos propietarios cambiaron"""
+    # Un INSERT no puede actualizar dos veces la misma fila: gana el último evento
+    ultimos = {evento['id_usuario']: evento for evento in eventos}
+    if not ultimos:
+        return 0
+    ahora = timezone.now()
+    filas = [
+        [id_usuario, *(evento.get(campo) or None for campo in CAMPOS), _producido_en(evento), ahora]
+        for id_usuario, evento in ultimos.items()
+    ]
+    tabla = Propietario._meta.db_table
+    columnas = ', '.join(CAMPOS)
+    excluidos = ', '.join(f'EXCLUDED.{campo}' for campo in CAMPOS)
+    actuales = ', '.join(f'{tabla}.{campo}' for campo in CAMPOS)
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {tabla} (id_usuario, {columnas}, producido_en, actualizado_en) "
+                f"VALUES {', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(filas))} "
+                f"ON CONFLICT (id_usuario) DO UPDATE SET ({columnas}) = ({excluidos}), "
+                f"producido_en = COALESCE(EXCLUDED.producido_en, {tabla}.producido_en), "
+                f"actualizado_en = CASE WHEN ({actuales}) IS DISTINCT FROM ({excluidos}) "
+                f"THEN EXCLUDED.actualizado_en ELSE {tabla}.actualizado_en END "
+                # Sin fecha (eventos viejos del contrato) se aplica en orden de llegada
+                f"WHERE {tabla}.producido_en IS NULL OR EXCLUDED.producido_en IS NULL "
+                f"OR EXCLUDED.producido_en > {tabla}.producido_en "
+                "RETURNING id_usuario, actualizado_en = %s",
+                [dato for fila in filas for dato in fila] + [ahora],
+            )
+            cambiados = [id_usuario for id_usuario, cambio in cursor.fetchall() if cambio]
+        if cambiados:
+            negocios = Negocio.objects.filter(id_usuario__in=cambiados).values_list('id_negocio', flat=True)
+            for id_negocio in negocios:
+                cache.invalidar(id_negocio)
+            cache.invalidar(id_usuarios=cambiados)
+    return len(cambiados)
@@ -0,0 +1,96 @@
+"""
+Selección de campos (sparse fieldsets) para las respuestas de negocios.
+
+El cliente puede pedir ``?fields=a,b``, ``?exclude=a,b`` o una proyección con
+nombre (``?vista=resumen``). Los campos elegidos se llevan también a la
+consulta con ``.only()``, así que las columnas pesadas (``descripcion``,
+``personalizacion``...) ni siquiera se leen de Postgres.
+
+Con ``?incluir=propietario`` cada negocio trae además el resumen de su dueño,
+leído de la proyección local (``Propietario``) en la misma consulta (un LEFT
+JOIN), sin llamar a ms_usuarios.
+"""
+from django.db.models import F
+from rest_framework.exceptions import ValidationError
+
+
+PROYECCIONES = {
+    # Tarjetas y grids: solo lo necesario para pintar el negocio
+    'resumen': ('id_negocio', 'nombre', 'tipo', 'logo_url', 'activo'),
+}
+
+# Columnas que siempre se leen: la clave primaria, la del cursor de paginación
+# y la que alimenta los validadores (ETag / Last-Modified)
+CAMPOS_SIEMPRE = ('id_negocio', 'creado_en', 'actualizado_en')
+
+# Columnas internas que la API nunca devuelve
+CAMPOS_INTERNOS = ('busqueda', 'horario_minutos')
+
+# Datos relacionados que se pueden pedir con ``?incluir=`` y sus anotaciones
+INCLUIBLES = {
+    'propietario': {
+        # Sale del propio negocio; si hay fila en la proyección lo dice actualizado_en (NOT NULL)
+        'propietario_id': F('propietario__id_usuario'),
+        'propietario_nombre': F('propietario__nombre'),
+        'propietario_apellido_paterno': F('propietario__apellido_paterno'),
+        'propietario_actualizado_en': F('propietario__actualizado_en'),
+    },
+}
+
+
+def _lista(valor):
+    return [campo.strip() for campo in valor.split(',') if campo.strip()]
+
+
+def campos_solicitados(request, disponibles):
+    """
+    Devuelve la tupla de campos pedidos o ``None`` si se quieren todos.
+    Lanza ``ValidationError`` si se piden campos o vistas desconocidas.
+    """
+    params = request.query_params
+    vista = params.get('vista')
+    fields = params.get('fields')
+    exclude = params.get('exclude')
+
+    if vista is None and fields is None and exclude is None:
+        return None
+
+    if vista is not None:
+        if vista not in PROYECCIONES:
+            raise ValidationError({'vista': f'Vista desconocida: {vista}'})
+        campos = list(PROYECCIONES[vista])
+    elif fields is not None:
+        campos = _lista(fields)
+    else:
+        campos = list(disponibles)
+
+    excluir = _lista(exclude) if exclude else []
+    desconocidos = [campo for campo in campos + excluir if campo not in disponibles]
+    if desconocidos:
+        raise ValidationError({'fields': f'Campos desconocidos: {", ".join(desconocidos)}'})
+
+    campos = tuple(campo for campo in campos if campo not in excluir)
+    if not campos:
+        raise ValidationError({'fields': 'Debe quedar al menos un campo'})
+    return campos
+
+
+def incluidos(request):
+    """Tupla de relaciones pedidas con ``?incluir=``; lanza ``ValidationError`` si alguna no existe"""
+    valor = request.query_params.get('incluir')
+    if not valor:
+        return ()
+    pedidos = tuple(dict.fromkeys(_lista(valor)))
+    desconocidos = [nombre for nombre in pedidos if nombre not in INCLUIBLES]
+    if desconocidos:
+        raise ValidationError({'incluir': f'No se puede incluir: {", ".join(desconocidos)}'})
+    return pedidos
+
+
+def proyectar(queryset, campos, incluir=()):
+    """Limita las columnas leídas a los campos pedidos y agrega las relaciones incluidas."""
+    for nombre in incluir:
+        queryset = queryset.annotate(**INCLUIBLES[nombre])
+    if campos is None:
+        return queryset.defer(*CAMPOS_INTERNOS)
+    return queryset.only(*dict.fromkeys(CAMPOS_SIEMPRE + campos))
@@ -0,0 +1,37 @@
+"""
+Parsers propios de ms_negocios, sobre los de orjson de ``acaclick_comun``.
+
+El renderer y el parser JSON (``ORJSONRenderer``, ``ORJSONParser``) son los
+compartidos con ms_usuarios; aquí van solo los tipos de contenido que usa este
+servicio: NDJSON para las cargas masivas y los dos formatos de parche.
+"""
+import orjson
+from acaclick_comun.renderers import ORJSONParser
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Un objeto JSON por línea (cargas masivas); devuelve la lista de objetos"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        items = []
+        for numero, linea in enumerate(stream.read().splitlines(), start=1):
+            if not linea.strip():
+                continue
+            try:
+                items.append(orjson.loads(linea))
+            except orjson.JSONDecodeError as e:
+                raise ParseError(f'NDJSON parse error - línea {numero}: {e}')
+        return items
+
+
+class MergePatchParser(ORJSONParser):
+    """JSON Merge Patch (RFC 7396), para ``PATCH`` de la personalización"""
+    media_type = 'application/merge-patch+json'
+
+
+class JSONPatchParser(ORJSONParser):
+    """JSON Patch (RFC 6902): arreglo de operaciones"""
+    media_type = 'application/json-patch+json'
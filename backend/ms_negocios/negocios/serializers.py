@@ -1,10 +1,43 @@
 from rest_framework import serializers
 from .models import Negocio
+from .blobs import BlobInvalido, externalizar, externalizar_personalizacion
 from decimal import Decimal
 
 
+class CamposDinamicosMixin:
+    """Permite limitar los campos de salida con el argumento ``campos``"""
+    campos_fijos = ()
+
+    def __init__(self, *args, campos=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos) - set(self.campos_fijos):
+                self.fields.pop(nombre)
+
+
+class PropietarioResumenField(serializers.Field):
+    """Resumen del dueño a partir de las anotaciones de ``proyectar(..., incluir=('propietario',))``"""
+
+    def __init__(self, **kwargs):
+        super().__init__(source='*', read_only=True, **kwargs)
+
+    def to_representation(self, negocio):
+        # Sin fila en la proyección (aún no llega su evento): null
+        if negocio.propietario_actualizado_en is None:
+            return None
+        return {
+            'id_usuario': negocio.propietario_id,
+            'nombre': negocio.propietario_nombre,
+            'apellido_paterno': negocio.propietario_apellido_paterno,
+        }
+
+
+class NegocioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
+    def __init__(self, *args, incluir=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'propietario' in incluir:
+            self.fields['propietario'] = PropietarioResumenField()
 
-class NegocioSerializer(serializers.ModelSerializer):
     class Meta:
         model = Negocio
         fields = [
@@ -31,7 +64,21 @@ class NegocioSerializer(serializers.ModelSerializer):
             'creado_en',
             'actualizado_en',
         ]
-        read_only_fields = ['id_negocio', 'tenant_id', 'creado_en', 'actualizado_en']
+        # El propietario sale del token, nunca del cuerpo de la petición; la baja
+        # solo por DELETE, que retira el escaparate y publica el tombstone
+        read_only_fields = ['id_negocio', 'id_usuario', 'tenant_id', 'activo', 'creado_en', 'actualizado_en']
+
+    def validate_logo_url(self, value):
+        try:
+            return externalizar(value)
+        except BlobInvalido as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_personalizacion(self, value):
+        try:
+            return externalizar_personalizacion(value)
+        except BlobInvalido as e:
+            raise serializers.ValidationError(str(e))
 
     def create(self, validated_data):
         # Si no se proporciona id_usuario, usar 1 por defecto (usuario hardcodeado)
@@ -42,6 +89,35 @@ class NegocioSerializer(serializers.ModelSerializer):
 
 
 
+
+class NegocioCercanoSerializer(NegocioSerializer):
+    """Negocio con su distancia (en metros) al punto buscado"""
+    distancia = serializers.FloatField(read_only=True)
+    campos_fijos = ('distancia',)
+
+    class Meta(NegocioSerializer.Meta):
+        fields = NegocioSerializer.Meta.fields + ['distancia']
+
+
+class CercanosSerializer(serializers.Serializer):
+    """Parámetros de la búsqueda por cercanía"""
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    radio = serializers.FloatField(min_value=1, max_value=50000, default=5000)  # metros
+
+
+class BusquedaSerializer(serializers.Serializer):
+    """Parámetros de la búsqueda de texto"""
+    q = serializers.CharField(min_length=2, max_length=200)
+
+
+class FiltrosListadoSerializer(serializers.Serializer):
+    """Filtros que aceptan todos los listados"""
+    tipo = serializers.ChoiceField(choices=Negocio.TIPO_CHOICES, required=False)
+    abierto_ahora = serializers.BooleanField(required=False)
+    abierto_a = serializers.TimeField(required=False, input_formats=['%H:%M'])
+
+
 class NegocioCreateSerializer(serializers.Serializer):
     """Serializer para crear negocio desde el frontend"""
     businessName = serializers.CharField(required=True)
@@ -58,16 +134,23 @@ class NegocioCreateSerializer(serializers.Serializer):
     description = serializers.CharField(required=False, allow_null=True, allow_blank=True)
     location = serializers.DictField(required=False, allow_null=True)  # {lat, lng}
     logo = serializers.CharField(required=False, allow_null=True, allow_blank=True)
-    # 👇 NUEVO
-    id_usuario = serializers.IntegerField(required=False)
+
+    def validate_logo(self, value):
+        # El logo llega como data URL; se guarda como blob y queda solo la URL
+        try:
+            return externalizar(value)
+        except BlobInvalido as e:
+            raise serializers.ValidationError(str(e))
 
     def create(self, validated_data):
-        # 1️⃣ Sacar id_usuario del body
-        id_usuario = validated_data.pop("id_usuario", None)
+        negocio = self.construir(validated_data)
+        negocio.save()
+        return negocio
 
-        # Si no viene, de momento fallback a 1 (solo para pruebas)
-        if id_usuario is None:
-            id_usuario = 1
+    def construir(self, validated_data):
+        """Negocio sin guardar a partir de los datos validados (lo usa también la carga masiva)"""
+        # 1️⃣ El propietario lo pone la vista (usuario del token): save(id_usuario=...)
+        id_usuario = validated_data.pop("id_usuario")
 
         # 2️⃣ Extraer location si existe
         location = validated_data.pop("location", None)
@@ -105,8 +188,8 @@ class NegocioCreateSerializer(serializers.Serializer):
         else:
             sitio_web = None
 
-        # 5️⃣ Crear el negocio con id_usuario correcto
-        negocio = Negocio.objects.create(
+        # 5️⃣ Armar el negocio con id_usuario correcto
+        return Negocio(
             nombre=validated_data["businessName"],
             tipo=validated_data["businessType"],
             correo=validated_data["email"],
@@ -122,7 +205,5 @@ class NegocioCreateSerializer(serializers.Serializer):
             latitud=latitud,
             longitud=longitud,
             logo_url=logo_url,
-            id_usuario=id_usuario,  # 👈 AHORA usa el que viene del frontend
+            id_usuario=id_usuario,
         )
-
-        return negocio
@@ -1,4 +1,1261 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import io
+import math
+import tempfile
+import threading
+import time as reloj
+import uuid
+from datetime import time, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+import jwt
+import orjson
+from acaclick_comun.compresion import CompresionMiddleware
+from acaclick_comun.renderers import ORJSONParser, ORJSONRenderer
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
+from . import autenticacion, blobs, cache, escaparate, eventos, geo, parches, propietarios
+from .geo import geohash_de
+from .models import Escaparate, EventoOutbox, Negocio, Propietario
+from .outbox import publicar_pendientes
+
+
+def token_de(id_usuario, vence_en=3600, **claims):
+    """Access token como los que firma ms_usuarios (simplejwt)"""
+    return jwt.encode(
+        {'token_type': 'access', 'user_id': str(id_usuario), 'exp': int(reloj.time()) + vence_en, **claims},
+        settings.NEGOCIOS_JWT['CLAVE'],
+        algorithm=settings.NEGOCIOS_JWT['ALGORITMO'],
+    )
+
+
+class NegociosTestCase(TestCase):
+    """Cada prueba empieza con la cache de lectura y la de tokens vacías"""
+
+    def setUp(self):
+        super().setUp()
+        cache.obtener_backend.cache_clear()
+        autenticacion._config.cache_clear()
+
+    def autenticar(self, id_usuario):
+        self.client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {token_de(id_usuario)}'
+
+
+class PlanesDeConsultaTests(NegociosTestCase):
+    """
+    Regresión de planes: con una tabla grande, cada consulta que hacen las
+    vistas de lectura debe resolverse con un índice y no con un Seq Scan.
+    """
+
+    TOTAL = 20000
+    USUARIOS = 500
+
+    @classmethod
+    def setUpTestData(cls):
+        ahora = timezone.now()
+        negocios = []
+        for i in range(cls.TOTAL):
+            # Rejilla de ~100 x 200 puntos alrededor de Acapulco
+            latitud = round(16.7 + (i % 100) * 0.003, 6)
+            longitud = round(-100.0 + (i // 100) * 0.0015, 6)
+            negocios.append(Negocio(
+                nombre=f'Negocio {i}',
+                tipo='otro',
+                descripcion=f'Negocio local número {i} con productos y servicios para toda la familia. ' * 4,
+                correo=f'negocio{i}@example.com',
+                telefono='7440000000',
+                direccion='Acapulco, Guerrero',
+                latitud=latitud,
+                longitud=longitud,
+                geohash=geohash_de(latitud, longitud),
+                id_usuario=i % cls.USUARIOS,
+                # La mayoría abre de día; muy pocos son nocturnos
+                horario_apertura=time(20, 0) if i % 200 == 5 else time(9, 0),
+                horario_cierre=time(2, 0) if i % 200 == 5 else time(18, 0),
+                activo=i % 10 != 0,
+            ))
+        Negocio.objects.bulk_create(negocios, batch_size=2000)
+        # auto_now_add no deja fijar la fecha en bulk_create; repartirla aquí
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'UPDATE negocios SET creado_en = %s - id_negocio * interval %s',
+                [ahora, '1 minute'],
+            )
+            cursor.execute('ANALYZE negocios')
+        cls.negocio = Negocio.objects.filter(activo=True).first()
+
+    def planes(self, url):
+        """Hace la petición y devuelve el EXPLAIN de cada consulta a negocios."""
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+
+        planes = []
+        with connection.cursor() as cursor:
+            for consulta in consultas.captured_queries:
+                if '"negocios"' not in consulta['sql']:
+                    continue
+                cursor.execute('EXPLAIN ' + consulta['sql'])
+                planes.append('\n'.join(fila[0] for fila in cursor.fetchall()))
+        self.assertTrue(planes, f'{url} no consultó la tabla negocios')
+        return respuesta, planes
+
+    def assertUsaIndice(self, url, indice=None):
+        respuesta, planes = self.planes(url)
+        for plan in planes:
+            self.assertNotIn('Seq Scan', plan, f'{url}:\n{plan}')
+            self.assertIn('Index', plan, f'{url}:\n{plan}')
+            if indice:
+                self.assertIn(indice, plan, f'{url}:\n{plan}')
+        return respuesta
+
+    def test_listar_negocios(self):
+        self.assertUsaIndice(reverse('listar_negocios'), 'negocios_activos_creado_idx')
+
+    def test_listar_negocios_pagina_siguiente(self):
+        primera = self.assertUsaIndice(reverse('listar_negocios'))
+        siguiente = primera.json()['next']
+        self.assertIsNotNone(siguiente)
+        self.assertUsaIndice(siguiente, 'negocios_activos_creado_idx')
+
+    def test_listar_negocios_resumen(self):
+        self.assertUsaIndice(reverse('listar_negocios') + '?vista=resumen', 'negocios_activos_creado_idx')
+
+    def test_negocios_por_usuario(self):
+        url = reverse('negocios_por_usuario', args=[self.negocio.id_usuario])
+        self.assertUsaIndice(url, 'negocios_usuario_creado_idx')
+
+    def test_negocios_por_usuario_pagina_siguiente(self):
+        url = reverse('negocios_por_usuario', args=[self.negocio.id_usuario]) + '?page_size=5'
+        siguiente = self.assertUsaIndice(url).json()['next']
+        self.assertIsNotNone(siguiente)
+        self.assertUsaIndice(siguiente, 'negocios_usuario_creado_idx')
+
+    def test_obtener_negocio(self):
+        self.assertUsaIndice(reverse('obtener_negocio', args=[self.negocio.id_negocio]))
+
+    def test_negocios_cercanos(self):
+        url = reverse('negocios_cercanos') + '?lat=16.85&lng=-99.85&radio=1500'
+        respuesta = self.assertUsaIndice(url, 'negocios_geohash_idx')
+        distancias = [negocio['distancia'] for negocio in respuesta.json()['results']]
+        self.assertTrue(distancias)
+        self.assertEqual(distancias, sorted(distancias))
+        self.assertLessEqual(distancias[-1], 1500)
+
+    def test_buscar_negocios(self):
+        url = reverse('buscar_negocios') + '?q=pozole&tipo=restaurante'
+        _, planes = self.planes(url)
+        for plan in planes:
+            self.assertNotIn('Seq Scan', plan, plan)
+            self.assertIn('negocios_busqueda_idx', plan, plan)
+            self.assertIn('negocios_nombre_trgm_idx', plan, plan)
+
+    def test_abiertos_a_una_hora(self):
+        self.assertUsaIndice(reverse('listar_negocios') + '?abierto_a=01:30', 'negocios_horario_idx')
+
+    def test_busqueda_por_tenant(self):
+        plan = Negocio.objects.filter(tenant_id=self.negocio.tenant_id).explain()
+        self.assertIn('negocios_tenant_idx', plan)
+        self.assertNotIn('Seq Scan', plan)
+
+
+class GeoTests(SimpleTestCase):
+    def test_vectores_conocidos(self):
+        self.assertEqual(geo.codificar_geohash(42.6, -5.6, 5), 'ezs42')
+        self.assertEqual(geo.codificar_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(geo.codificar_geohash(0.0, 0.0), 's00000000')
+        self.assertEqual(geo.codificar_geohash(-90.0, -180.0), '000000000')
+        self.assertEqual(geo.codificar_geohash(90.0, 180.0), 'zzzzzzzzz')
+        self.assertEqual(geo.geohash_de(Decimal('16.8531'), Decimal('-99.8237')), geo.codificar_geohash(16.8531, -99.8237))
+        self.assertIsNone(geo.geohash_de(None, 1))
+
+    def test_precision_para_radio(self):
+        self.assertEqual(geo.precision_para_radio(1, 0), geo.PRECISION_GEOHASH)
+        self.assertEqual(geo.precision_para_radio(20_000_000, 0), 1)
+        self.assertEqual(geo.precision_para_radio(100, 90), 1)
+        for radio in (10, 150, 1500, 5000, 50000):
+            for lat in (0, 16.85, 60, -75):
+                precision = geo.precision_para_radio(radio, lat)
+                alto, ancho = geo.tamano_celda(precision)
+                cos_lat = math.cos(math.radians(lat))
+                # La celda elegida mide al menos el radio; la siguiente ya no
+                self.assertGreaterEqual(min(alto, ancho * cos_lat) * geo.METROS_POR_GRADO, radio)
+                if precision < geo.PRECISION_GEOHASH:
+                    alto, ancho = geo.tamano_celda(precision + 1)
+                    self.assertLess(min(alto, ancho * cos_lat) * geo.METROS_POR_GRADO, radio)
+
+    def test_vecinas_normales_y_en_el_antimeridiano(self):
+        celdas = geo.celdas_cercanas(16.85, -99.85, 1500)
+        self.assertEqual(len(celdas), 9)
+        self.assertIn(geo.codificar_geohash(16.85, -99.85, len(celdas[0])), celdas)
+
+        celdas = geo.celdas_cercanas(0.0, 179.9999, 500)
+        precision = len(celdas[0])
+        self.assertEqual(len(celdas), 9)
+        self.assertIn(geo.codificar_geohash(0.0, 179.9999, precision), celdas)
+        # Al otro lado del antimeridiano
+        self.assertIn(geo.codificar_geohash(0.0, -179.9999, precision), celdas)
+
+    def test_vecinas_cerca_de_los_polos(self):
+        for lat in (89.9999, -89.9999, 90.0):
+            celdas = geo.celdas_cercanas(lat, 10.0, 100)
+            precision = len(celdas[0])
+            # El círculo toca el polo: todas las longitudes son vecinas
+            for lng in (-179.0, -90.0, 0.0, 90.0, 179.0):
+                self.assertIn(geo.codificar_geohash(lat, lng, precision), celdas, (lat, lng))
+
+    def test_haversine(self):
+        self.assertEqual(geo.haversine(16.85, -99.85, 16.85, -99.85), 0)
+        self.assertAlmostEqual(geo.haversine(0, 0, 1, 0), geo.METROS_POR_GRADO, places=3)
+        self.assertAlmostEqual(geo.haversine(0, 179.9995, 0, -179.9995), 0.001 * geo.METROS_POR_GRADO, places=3)
+        self.assertAlmostEqual(geo.haversine(90, 0, -90, 0), math.pi * geo.RADIO_TIERRA_M, places=3)
+
+
+class CercanosTests(NegociosTestCase):
+    def crear(self, lat, lng):
+        return Negocio.objects.create(
+            nombre=f'{lat},{lng}', tipo='otro', correo='n@example.com', telefono='1', direccion='x',
+            id_usuario=1, latitud=Decimal(str(lat)), longitud=Decimal(str(lng)),
+        )
+
+    def cercanos(self, lat, lng, radio):
+        negocios = geo.filtrar_cercanos(Negocio.objects.filter(activo=True), lat, lng, radio)
+        return {negocio.nombre for negocio in negocios}
+
+    def test_caja_que_cruza_el_antimeridiano(self):
+        self.crear(0, 179.9995)
+        self.crear(0, -179.9995)
+        self.crear(0, 179.99)
+        self.assertEqual(self.cercanos(0, 179.9999, 500), {'0,179.9995', '0,-179.9995'})
+
+    def test_circulo_que_toca_el_polo(self):
+        self.crear(89.9999, 0)
+        self.crear(89.9999, 180)
+        self.crear(89.9999, -90)
+        self.crear(89.99, 0)
+        self.assertEqual(self.cercanos(89.9999, 0, 100), {'89.9999,0', '89.9999,180', '89.9999,-90'})
+
+
+class BusquedaTests(NegociosTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, tipo, descripcion in [
+            ('Tacos El Güero', 'restaurante', 'Los mejores tacos al pastor'),
+            ('Pozolería Acapulco', 'restaurante', 'Pozole verde los jueves'),
+            ('Ferretería Hidalgo', 'minorista', 'Herramientas y tornillos'),
+            ('Estética Bella', 'servicio', 'Cortes, peinados y tacos de canasta los viernes'),
+        ]:
+            Negocio.objects.create(
+                nombre=nombre, tipo=tipo, descripcion=descripcion, correo='n@example.com',
+                telefono='1', direccion='Acapulco', id_usuario=1,
+            )
+
+    def buscar(self, consulta):
+        respuesta = self.client.get(reverse('buscar_negocios') + consulta)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return [negocio['nombre'] for negocio in respuesta.json()['results']]
+
+    def test_ordena_por_relevancia(self):
+        # Coincidir en el nombre pesa más que en la descripción
+        self.assertEqual(self.buscar('?q=tacos'), ['Tacos El Güero', 'Estética Bella'])
+
+    def test_tolera_errores_de_dedo(self):
+        self.assertEqual(self.buscar('?q=tacoz'), ['Tacos El Güero'])
+        self.assertEqual(self.buscar('?q=ferreteria'), ['Ferretería Hidalgo'])
+
+    def test_filtra_por_tipo(self):
+        self.assertEqual(self.buscar('?q=tacos&tipo=restaurante'), ['Tacos El Güero'])
+
+    def test_actualizacion_incremental(self):
+        negocio = Negocio.objects.get(nombre='Ferretería Hidalgo')
+        self.autenticar(1)
+        self.client.patch(
+            reverse('actualizar_negocio', args=[negocio.id_negocio]),
+            {'descripcion': 'Ahora también vendemos pintura'},
+            content_type='application/json',
+        )
+        self.assertEqual(self.buscar('?q=pintura'), ['Ferretería Hidalgo'])
+
+    def test_paginas_con_relevancia_empatada(self):
+        for _ in range(7):
+            Negocio.objects.create(
+                nombre='Taqueria', tipo='restaurante', correo='n@example.com', telefono='1',
+                direccion='Acapulco', id_usuario=1,
+            )
+        vistos = []
+        url = reverse('buscar_negocios') + '?q=taqueria&page_size=3'
+        while url and len(vistos) < 20:
+            datos = self.client.get(url).json()
+            vistos += [negocio['id_negocio'] for negocio in datos['results']]
+            url = datos['next']
+        # Todas empatan en relevancia: sin repetir ni saltar, y la última página no trae `next`
+        ids = Negocio.objects.filter(nombre='Taqueria').values_list('id_negocio', flat=True)
+        self.assertEqual(vistos, sorted(ids, reverse=True))
+
+    def test_consulta_demasiado_corta(self):
+        respuesta = self.client.get(reverse('buscar_negocios') + '?q=x')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class AbiertoAhoraTests(NegociosTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for nombre, apertura, cierre in [
+            ('Diurno', time(9, 0), time(18, 0)),
+            ('Nocturno', time(20, 0), time(2, 0)),
+            ('24 horas', time(0, 0), time(0, 0)),
+            ('Sin horario', None, None),
+        ]:
+            Negocio.objects.create(
+                nombre=nombre, tipo='restaurante' if nombre != 'Diurno' else 'minorista',
+                correo='n@example.com', telefono='1', direccion='x', id_usuario=1,
+                horario_apertura=apertura, horario_cierre=cierre,
+            )
+
+    def abiertos(self, consulta):
+        respuesta = self.client.get(reverse('listar_negocios') + consulta)
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        return sorted(negocio['nombre'] for negocio in respuesta.json()['results'])
+
+    def test_horario_normal(self):
+        self.assertEqual(self.abiertos('?abierto_a=12:00'), ['24 horas', 'Diurno'])
+        # La hora de cierre ya no cuenta como abierto
+        self.assertEqual(self.abiertos('?abierto_a=18:00'), ['24 horas'])
+
+    def test_horario_que_cruza_medianoche(self):
+        self.assertEqual(self.abiertos('?abierto_a=23:30'), ['24 horas', 'Nocturno'])
+        self.assertEqual(self.abiertos('?abierto_a=01:59'), ['24 horas', 'Nocturno'])
+        self.assertEqual(self.abiertos('?abierto_a=02:00'), ['24 horas'])
+
+    def test_abierto_ahora_usa_la_zona_del_servicio(self):
+        # 04:30 UTC son las 22:30 en America/Mexico_City
+        ahora = timezone.now().replace(hour=4, minute=30)
+        with mock.patch('django.utils.timezone.now', return_value=ahora):
+            self.assertEqual(self.abiertos('?abierto_ahora=1'), ['24 horas', 'Nocturno'])
+
+    def test_se_combina_con_otros_filtros(self):
+        self.assertEqual(self.abiertos('?abierto_a=12:00&tipo=restaurante'), ['24 horas'])
+
+    def test_hora_invalida(self):
+        respuesta = self.client.get(reverse('listar_negocios') + '?abierto_a=25:00')
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class CursorTests(NegociosTestCase):
+    def test_paginas_sin_repetir_ni_saltar_con_empates(self):
+        Negocio.objects.bulk_create([
+            Negocio(nombre=f'N{i}', tipo='otro', correo='n@example.com', telefono='1',
+                    direccion='x', id_usuario=1)
+            for i in range(25)
+        ])
+        # Misma fecha para todos: el orden depende solo del desempate por id
+        Negocio.objects.update(creado_en=timezone.now() - timedelta(days=1))
+
+        vistos = []
+        url = reverse('listar_negocios') + '?page_size=7'
+        while url:
+            datos = self.client.get(url).json()
+            vistos += [negocio['id_negocio'] for negocio in datos['results']]
+            url = datos['next']
+        self.assertEqual(vistos, sorted(Negocio.objects.values_list('id_negocio', flat=True), reverse=True))
+
+    def test_cursor_invalido(self):
+        respuesta = self.client.get(reverse('listar_negocios') + '?cursor=basura')
+        self.assertEqual(respuesta.status_code, 404)
+
+
+class CamposTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com', telefono='1', direccion='x',
+            id_usuario=1, descripcion='Larga', personalizacion={'heroTitle': 'Hola'},
+        )
+        self.listado = reverse('listar_negocios')
+
+    def test_fields_y_exclude(self):
+        datos = self.client.get(self.listado, {'fields': 'nombre,tipo'}).json()
+        self.assertEqual(set(datos['results'][0]), {'nombre', 'tipo'})
+
+        datos = self.client.get(self.listado, {'exclude': 'descripcion,personalizacion'}).json()
+        campos = set(datos['results'][0])
+        self.assertNotIn('descripcion', campos)
+        self.assertNotIn('personalizacion', campos)
+        self.assertIn('nombre', campos)
+
+        datos = self.client.get(self.listado, {'vista': 'resumen', 'exclude': 'activo'}).json()
+        self.assertEqual(set(datos['results'][0]), {'id_negocio', 'nombre', 'tipo', 'logo_url'})
+
+        detalle = self.client.get(reverse('obtener_negocio', args=[self.negocio.id_negocio]), {'fields': 'nombre'})
+        self.assertEqual(detalle.json(), {'nombre': 'Café Central'})
+
+    def test_campos_desconocidos(self):
+        for params in ({'fields': 'nombre,secreto'}, {'exclude': 'busqueda'}, {'vista': 'todo'},
+                       {'fields': 'nombre', 'exclude': 'nombre'}):
+            respuesta = self.client.get(self.listado, params)
+            self.assertEqual(respuesta.status_code, 400, params)
+
+    def test_solo_se_leen_las_columnas_pedidas(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(self.listado, {'fields': 'nombre'})
+        sql = next(q['sql'] for q in consultas.captured_queries if 'FROM "negocios"' in q['sql'])
+        self.assertIn('"negocios"."nombre"', sql)
+        for columna in ('descripcion', 'personalizacion', 'busqueda', 'correo'):
+            self.assertNotIn(f'"negocios"."{columna}"', sql)
+
+
+class CacheLecturaTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com',
+            telefono='1', direccion='x', id_usuario=7,
+        )
+
+    def consultas_a_negocios(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json(), sum('"negocios"' in c['sql'] for c in consultas.captured_queries)
+
+    def test_detalle_se_sirve_de_cache(self):
+        url = reverse('obtener_negocio', args=[self.negocio.id_negocio])
+        _, consultas = self.consultas_a_negocios(url)
+        self.assertEqual(consultas, 1)
+        datos, consultas = self.consultas_a_negocios(url)
+        self.assertEqual(consultas, 0)
+        self.assertEqual(datos['nombre'], 'Café Central')
+
+    def test_actualizar_invalida_detalle_y_listados(self):
+        detalle = reverse('obtener_negocio', args=[self.negocio.id_negocio])
+        del_usuario = reverse('negocios_por_usuario', args=[7])
+        for url in (detalle, del_usuario):
+            self.consultas_a_negocios(url)
+
+        self.autenticar(7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                reverse('actualizar_negocio', args=[self.negocio.id_negocio]),
+                {'nombre': 'Café Norte'},
+                content_type='application/json',
+            )
+
+        datos, consultas = self.consultas_a_negocios(detalle)
+        self.assertEqual((datos['nombre'], consultas), ('Café Norte', 1))
+        datos, _ = self.consultas_a_negocios(del_usuario)
+        self.assertEqual([n['nombre'] for n in datos['results']], ['Café Norte'])
+
+    def test_otros_negocios_siguen_en_cache(self):
+        otro = Negocio.objects.create(
+            nombre='Otro', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=9,
+        )
+        url = reverse('obtener_negocio', args=[otro.id_negocio])
+        self.consultas_a_negocios(url)
+        self.autenticar(7)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('eliminar_negocio', args=[self.negocio.id_negocio]))
+        _, consultas = self.consultas_a_negocios(url)
+        self.assertEqual(consultas, 0)
+
+    def test_fallos_concurrentes_se_agrupan(self):
+        llamadas = []
+
+        def cargar():
+            llamadas.append(1)
+            reloj.sleep(0.05)
+            return {'id_negocio': 1}
+
+        resultados = []
+        hilos = [
+            threading.Thread(target=lambda: resultados.append(cache.leer_negocio(10**9, None, cargar)))
+            for _ in range(20)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(llamadas), 1)
+        self.assertEqual(resultados, [{'id_negocio': 1}] * 20)
+
+
+class RespuestasCondicionalesTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com',
+            telefono='1', direccion='x', id_usuario=7,
+        )
+        self.detalle = reverse('obtener_negocio', args=[self.negocio.id_negocio])
+
+    def test_detalle_no_modificado(self):
+        etag = self.client.get(self.detalle)['ETag']
+        respuesta = self.client.get(self.detalle, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+
+    def test_proyeccion_tiene_otro_etag(self):
+        completo = self.client.get(self.detalle)['ETag']
+        resumen = self.client.get(self.detalle, {'vista': 'resumen'})['ETag']
+        self.assertNotEqual(completo, resumen)
+
+    def test_listado_no_modificado_sin_leer_filas(self):
+        url = reverse('listar_negocios')
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(len(consultas.captured_queries), 1)
+        self.assertIn('MAX(', consultas.captured_queries[0]['sql'])
+
+    def test_listado_cambia_al_actualizar(self):
+        url = reverse('listar_negocios')
+        etag = self.client.get(url)['ETag']
+        self.negocio.nombre = 'Café Norte'
+        self.negocio.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_listado_por_usuario_desde_cache(self):
+        url = reverse('negocios_por_usuario', args=[7])
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(len(consultas.captured_queries), 0)
+
+    def test_if_modified_since(self):
+        modificado = self.client.get(self.detalle)['Last-Modified']
+        respuesta = self.client.get(self.detalle, HTTP_IF_MODIFIED_SINCE=modificado)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_if_match(self):
+        url = reverse('actualizar_negocio', args=[self.negocio.id_negocio])
+        self.autenticar(7)
+        etag = self.client.get(self.detalle)['ETag']
+        respuesta = self.client.patch(
+            url, {'nombre': 'Café Norte'}, content_type='application/json', HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+        # Una segunda escritura con el ETag viejo pierde
+        respuesta = self.client.patch(
+            url, {'nombre': 'Café Sur'}, content_type='application/json', HTTP_IF_MATCH=etag,
+        )
+        self.assertEqual(respuesta.status_code, 412)
+        self.negocio.refresh_from_db()
+        self.assertEqual(self.negocio.nombre, 'Café Norte')
+
+
+class RenderYCompresionTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(30):
+            Negocio.objects.create(
+                nombre=f'Negocio {i}', tipo='otro', correo='n@example.com', telefono='1',
+                direccion='Costera Miguel Alemán', id_usuario=7, descripcion='Descripción larga ' * 20,
+            )
+        self.url = reverse('listar_negocios')
+
+    def test_tipos_nativos_y_decimal(self):
+        identificador = uuid.uuid4()
+        datos = {'precio': Decimal('12.50'), 'id': identificador, 'abre': time(9, 30)}
+        renderizado = ORJSONRenderer().render(datos)
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(renderizado)),
+            {'precio': 12.5, 'id': str(identificador), 'abre': '09:30:00'},
+        )
+
+    def test_json_invalido(self):
+        negocio = Negocio.objects.first()
+        self.autenticar(7)
+        respuesta = self.client.patch(
+            reverse('actualizar_negocio', args=[negocio.id_negocio]), '{"nombre": ', content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_gzip(self):
+        plano = self.client.get(self.url)
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+        self.assertEqual(gzip.decompress(respuesta.content), plano.content)
+        self.assertEqual(respuesta['ETag'], 'W/' + plano['ETag'])
+
+    def test_brotli_preferido(self):
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate, br')
+        self.assertEqual(respuesta['Content-Encoding'], 'br')
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br;q=0.5')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+
+    @override_settings(COMPRESION={'UMBRAL': 10**6, 'NIVEL_GZIP': 6, 'NIVEL_BROTLI': 5})
+    def test_por_debajo_del_umbral(self):
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(respuesta.has_header('Content-Encoding'))
+
+    def test_middleware_async(self):
+        async def vista(request):
+            return HttpResponse(b'{"a": 1}' * 200, content_type='application/json')
+
+        middleware = CompresionMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        respuesta = async_to_sync(middleware)(request)
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(respuesta.content), b'{"a": 1}' * 200)
+
+    def test_etag_debil_revalida(self):
+        etag = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')['ETag']
+        respuesta = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+
+class MasivoTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.autenticar(7)
+
+    def item(self, i, **extra):
+        return {
+            'businessName': f'Franquicia {i}', 'businessType': 'restaurante', 'email': 'f@example.com',
+            'phone': '1', 'address': 'x', 'location': {'lat': 16.86, 'lng': -99.88},
+            **extra,
+        }
+
+    def test_crear_json_con_errores_por_item(self):
+        items = [self.item(0), self.item(1, email='no-es-correo'), self.item(2)]
+        respuesta = self.client.post(reverse('crear_negocios_masivo'), items, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 207)
+        resultados = respuesta.json()['resultados']
+        self.assertEqual([r['estado'] for r in resultados], ['creado', 'error', 'creado'])
+        self.assertIn('email', resultados[1]['errores'])
+        negocio = Negocio.objects.get(id_negocio=resultados[2]['id_negocio'])
+        self.assertEqual((negocio.nombre, negocio.geohash[:4]), ('Franquicia 2', geohash_de(16.86, -99.88)[:4]))
+
+    def test_crear_ndjson_en_varios_lotes(self):
+        cuerpo = '\n'.join(orjson.dumps(self.item(i)).decode() for i in range(5))
+        with self.settings(NEGOCIOS_MASIVO={'MAXIMO_ITEMS': 10, 'LOTE': 2}):
+            with CaptureQueriesContext(connection) as consultas:
+                respuesta = self.client.post(
+                    reverse('crear_negocios_masivo'), cuerpo, content_type='application/x-ndjson',
+                )
+        self.assertEqual(respuesta.status_code, 201)
+        self.assertEqual(Negocio.objects.filter(nombre__startswith='Franquicia').count(), 5)
+        inserts = [c for c in consultas.captured_queries if c['sql'].startswith('INSERT INTO "negocios"')]
+        self.assertEqual(len(inserts), 3)
+
+    def test_limite_de_items(self):
+        with self.settings(NEGOCIOS_MASIVO={'MAXIMO_ITEMS': 1, 'LOTE': 2}):
+            respuesta = self.client.post(
+                reverse('crear_negocios_masivo'), [self.item(0), self.item(1)], content_type='application/json',
+            )
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_actualizar(self):
+        a, b, ajeno = (
+            Negocio.objects.create(
+                nombre=f'N{i}', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=usuario,
+            )
+            for i, usuario in enumerate((7, 7, 8))
+        )
+        antes = a.actualizado_en
+        items = [
+            {'id_negocio': a.id_negocio, 'nombre': 'Nuevo', 'latitud': '16.86', 'longitud': '-99.88'},
+            {'id_negocio': b.id_negocio, 'tipo': 'no-existe'},
+            {'id_negocio': 10**9, 'nombre': 'X'},
+            {'id_negocio': a.id_negocio, 'nombre': 'Otra vez'},
+            {'id_negocio': ajeno.id_negocio, 'nombre': 'Ajeno'},
+        ]
+        respuesta = self.client.patch(
+            reverse('actualizar_negocios_masivo'), items, content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual(
+            [r['estado'] for r in respuesta.json()['resultados']], ['actualizado', 'error', 'error', 'error', 'error'],
+        )
+        a.refresh_from_db()
+        self.assertEqual(a.nombre, 'Nuevo')
+        self.assertGreater(a.actualizado_en, antes)
+        self.assertEqual(a.geohash, geohash_de(a.latitud, a.longitud))
+
+
+class AutenticacionTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com',
+            telefono='1', direccion='x', id_usuario=7,
+        )
+        self.actualizar = reverse('actualizar_negocio', args=[self.negocio.id_negocio])
+
+    def patch(self, token):
+        return self.client.patch(
+            self.actualizar, {'nombre': 'Café Norte'}, content_type='application/json',
+            HTTP_AUTHORIZATION=f'Bearer {token}',
+        )
+
+    def test_escrituras_piden_token(self):
+        respuesta = self.client.patch(self.actualizar, {'nombre': 'X'}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertEqual(self.client.get(reverse('listar_negocios')).status_code, 200)
+
+    def test_tokens_rechazados(self):
+        for token in (
+            token_de(7, vence_en=-10),
+            token_de(7, token_type='refresh'),
+            jwt.encode({'user_id': '7', 'exp': int(reloj.time()) + 60}, 'otra-clave', algorithm='HS256'),
+            'no.es.jwt',
+        ):
+            self.assertEqual(self.patch(token).status_code, 401, token)
+
+    def test_negocio_ajeno_no_existe(self):
+        self.assertEqual(self.patch(token_de(8)).status_code, 404)
+        self.negocio.refresh_from_db()
+        self.assertEqual(self.negocio.nombre, 'Café Central')
+
+    def test_token_validado_se_reutiliza(self):
+        token = token_de(7)
+        with mock.patch('negocios.autenticacion.jwt.decode', wraps=jwt.decode) as decode:
+            self.assertEqual(self.patch(token).status_code, 200)
+            self.assertEqual(self.patch(token).status_code, 200)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_crear_usa_el_propietario_del_token(self):
+        self.autenticar(9)
+        respuesta = self.client.post(reverse('crear_negocio'), {
+            'businessName': 'Mío', 'businessType': 'otro', 'email': 'm@example.com',
+            'phone': '1', 'address': 'x', 'id_usuario': 7,
+        }, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 201, respuesta.content)
+        self.assertEqual(respuesta.json()['id_usuario'], 9)
+
+    def test_mis_negocios(self):
+        Negocio.objects.create(
+            nombre='Ajeno', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=8,
+        )
+        self.autenticar(7)
+        respuesta = self.client.get(reverse('mis_negocios'))
+        self.assertEqual([n['nombre'] for n in respuesta.json()['results']], ['Café Central'])
+
+
+class PropietariosTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com',
+            telefono='1', direccion='x', id_usuario=7,
+        )
+        Negocio.objects.create(
+            nombre='Sin dueño conocido', tipo='otro', correo='n@example.com',
+            telefono='1', direccion='x', id_usuario=8,
+        )
+
+    def aplicar(self, *eventos):
+        with self.captureOnCommitCallbacks(execute=True):
+            return propietarios.aplicar(list(eventos))
+
+    def test_upsert_idempotente_y_gana_el_ultimo(self):
+        evento = {
+            'id_usuario': 7, 'correo': 'ana@example.com', 'nombre': 'Ana', 'apellido_paterno': 'López',
+            'producido_en': '2026-10-18T13:56:00+00:00',
+        }
+        nuevo = {**evento, 'nombre': 'Ana María', 'producido_en': '2026-10-18T14:00:00+00:00'}
+        self.assertEqual(self.aplicar(evento, nuevo), 1)
+        url = reverse('obtener_negocio', args=[self.negocio.id_negocio])
+        etag = self.client.get(url, {'incluir': 'propietario'})['ETag']
+        actualizado_en = Propietario.objects.get().actualizado_en
+
+        # Un reintento del evento viejo no pisa al nuevo
+        self.assertEqual(self.aplicar(evento), 0)
+        self.assertEqual(Propietario.objects.get().nombre, 'Ana María')
+        # Repetir el último no cambia la fila ni el ETag
+        self.assertEqual(self.aplicar(nuevo), 0)
+        self.assertEqual(Propietario.objects.count(), 1)
+        self.assertEqual(Propietario.objects.get().actualizado_en, actualizado_en)
+        respuesta = self.client.get(url, {'incluir': 'propietario'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+    def test_sin_producido_en_gana_el_ultimo_en_llegar(self):
+        evento = {'id_usuario': 7, 'correo': 'ana@example.com', 'nombre': 'Ana', 'apellido_paterno': 'López'}
+        self.assertEqual(self.aplicar(evento), 1)
+        actualizado_en = Propietario.objects.get().actualizado_en
+        self.assertEqual(self.aplicar(evento), 0)
+        self.assertEqual(Propietario.objects.get().actualizado_en, actualizado_en)
+        self.assertEqual(self.aplicar({**evento, 'nombre': 'Ana María'}), 1)
+        self.assertEqual(Propietario.objects.get().nombre, 'Ana María')
+
+    def test_mensajes_invalidos(self):
+        self.assertIsNone(propietarios.leer(b'no es json'))
+        self.assertIsNone(propietarios.leer(b'[1]'))
+        self.assertIsNone(propietarios.leer(None))
+        self.assertEqual(propietarios.leer(b'{"id_usuario": 7}'), {'id_usuario': 7})
+
+    def test_listado_incluye_propietario_en_una_consulta(self):
+        self.aplicar({'id_usuario': 7, 'nombre': 'Ana', 'apellido_paterno': 'López', 'correo': 'a@example.com'})
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(reverse('listar_negocios'), {'incluir': 'propietario'})
+        por_nombre = {n['nombre']: n['propietario'] for n in respuesta.json()['results']}
+        self.assertEqual(
+            por_nombre['Café Central'], {'id_usuario': 7, 'nombre': 'Ana', 'apellido_paterno': 'López'}
+        )
+        self.assertIsNone(por_nombre['Sin dueño conocido'])
+        sin_incluir = self.client.get(reverse('listar_negocios')).json()['results'][0]
+        self.assertNotIn('propietario', sin_incluir)
+
+    def test_detalle_y_validadores_siguen_al_propietario(self):
+        url = reverse('obtener_negocio', args=[self.negocio.id_negocio])
+        respuesta = self.client.get(url, {'incluir': 'propietario', 'vista': 'resumen'})
+        self.assertIsNone(respuesta.json()['propietario'])
+        self.assertNotEqual(respuesta['ETag'], self.client.get(url, {'vista': 'resumen'})['ETag'])
+
+        self.aplicar({'id_usuario': 7, 'nombre': 'Ana', 'apellido_paterno': 'López'})
+        nueva = self.client.get(
+            url, {'incluir': 'propietario', 'vista': 'resumen'}, HTTP_IF_NONE_MATCH=respuesta['ETag'],
+        )
+        self.assertEqual(nueva.status_code, 200)
+        self.assertEqual(nueva.json()['propietario']['nombre'], 'Ana')
+
+        listado = reverse('listar_negocios')
+        etag = self.client.get(listado, {'incluir': 'propietario'})['ETag']
+        self.aplicar({'id_usuario': 7, 'nombre': 'Ana María', 'apellido_paterno': 'López'})
+        respuesta = self.client.get(listado, {'incluir': 'propietario'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_incluir_desconocido(self):
+        respuesta = self.client.get(reverse('listar_negocios'), {'incluir': 'productos'})
+        self.assertEqual(respuesta.status_code, 400)
+
+
+class ProducerEnMemoria:
+    """Producer de prueba: guarda lo enviado en vez de hablar con Kafka"""
+
+    def __init__(self):
+        self.enviados = []
+
+    def send(self, topic, key=None, value=None, headers=None):
+        self.enviados.append((topic, key, value))
+        return mock.Mock()
+
+    def flush(self, timeout=None):
+        pass
+
+
+class EventosCambiosTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.autenticar(7)
+
+    def eventos(self):
+        return [(e.clave, e.payload) for e in EventoOutbox.objects.order_by('id_evento')]
+
+    def test_ciclo_de_vida_de_un_negocio(self):
+        respuesta = self.client.post(reverse('crear_negocio'), {
+            'businessName': 'Café Central', 'businessType': 'restaurante', 'email': 'n@example.com',
+            'phone': '1', 'address': 'x',
+        }, content_type='application/json')
+        id_negocio = respuesta.json()['id_negocio']
+        self.client.patch(
+            reverse('actualizar_negocio', args=[id_negocio]), {'nombre': 'Café Norte'}, content_type='application/json',
+        )
+        self.client.post(
+            reverse('personalizar_tienda', args=[id_negocio]), {'colores': {'primario': '#000'}},
+            content_type='application/json',
+        )
+        self.client.delete(reverse('eliminar_negocio', args=[id_negocio]))
+
+        eventos = self.eventos()
+        self.assertEqual({clave for clave, _ in eventos}, {str(id_negocio)})
+        self.assertEqual(
+            [payload and payload['tipo'] for _, payload in eventos],
+            ['negocio.creado', 'negocio.actualizado', 'negocio.actualizado', None],
+        )
+        # Cada evento lleva el estado completo, no solo lo que cambió
+        self.assertEqual(eventos[1][1]['negocio']['nombre'], 'Café Norte')
+        self.assertEqual(eventos[2][1]['negocio']['personalizacion'], {'colores': {'primario': '#000'}})
+        self.assertEqual(eventos[2][1]['negocio']['nombre'], 'Café Norte')
+
+    def test_escritura_fallida_no_deja_evento(self):
+        respuesta = self.client.post(
+            reverse('crear_negocio'), {'businessName': 'Sin datos'}, content_type='application/json',
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertFalse(EventoOutbox.objects.exists())
+
+    def test_masivo_un_insert_de_eventos_por_lote(self):
+        items = [
+            {'businessName': f'F{i}', 'businessType': 'otro', 'email': 'f@example.com', 'phone': '1', 'address': 'x'}
+            for i in range(5)
+        ]
+        with self.settings(NEGOCIOS_MASIVO={'MAXIMO_ITEMS': 10, 'LOTE': 2}):
+            with CaptureQueriesContext(connection) as consultas:
+                self.client.post(reverse('crear_negocios_masivo'), items, content_type='application/json')
+        inserts = [c for c in consultas.captured_queries if c['sql'].startswith('INSERT INTO "outbox"')]
+        self.assertEqual(len(inserts), 3)
+        self.assertEqual(
+            [payload['negocio']['nombre'] for _, payload in self.eventos()], [f'F{i}' for i in range(5)],
+        )
+
+    def test_negocio_inactivo_se_publica_como_tombstone(self):
+        activo, inactivo = Negocio.objects.bulk_create([
+            Negocio(nombre=nombre, tipo='otro', correo='n@example.com', telefono='1', direccion='x',
+                    id_usuario=7, activo=nombre == 'A')
+            for nombre in ('A', 'I')
+        ])
+        eventos.publicar_cambios([activo, inactivo])
+        eventos.publicar_cambio(inactivo)
+        self.assertEqual(
+            [(clave, payload and payload['tipo']) for clave, payload in self.eventos()],
+            [(str(activo.id_negocio), 'negocio.actualizado'),
+             (str(inactivo.id_negocio), None), (str(inactivo.id_negocio), None)],
+        )
+
+    def test_patch_de_activo_no_publica_la_baja_como_cambio(self):
+        negocio = Negocio.objects.create(
+            nombre='N', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=7,
+        )
+        self.client.patch(
+            reverse('actualizar_negocios_masivo'), [{'id_negocio': negocio.id_negocio, 'activo': False}],
+            content_type='application/json',
+        )
+        self.assertTrue(all(payload['negocio']['activo'] for _, payload in self.eventos()))
+
+    def test_relay_publica_en_orden_con_tombstones(self):
+        negocio = Negocio.objects.create(
+            nombre='N', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=7,
+        )
+        eventos.publicar_cambio(negocio, eventos.CREADO)
+        eventos.publicar_baja(negocio.id_negocio)
+        producer = ProducerEnMemoria()
+        self.assertEqual(publicar_pendientes(producer), 2)
+        self.assertEqual(
+            [(topic, clave, valor and valor['tipo']) for topic, clave, valor in producer.enviados],
+            [('negocios.cambios', str(negocio.id_negocio), 'negocio.creado'),
+             ('negocios.cambios', str(negocio.id_negocio), None)],
+        )
+        self.assertEqual(publicar_pendientes(producer), 0)
+
+
+class EscaparateTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com', telefono='1',
+            direccion='Costera 100', id_usuario=7, personalizacion={'primaryColor': '#000000', 'extra': 1},
+        )
+        self.url = reverse('ver_escaparate', args=[self.negocio.id_negocio])
+        self.autenticar(7)
+
+    def ver(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_documento_mezcla_plantilla_y_negocio(self):
+        respuesta = self.ver()
+        self.assertEqual(respuesta.status_code, 200)
+        documento = orjson.loads(respuesta.content)
+        self.assertEqual(documento['nombre'], 'Café Central')
+        self.assertNotIn('id_usuario', documento)
+        tienda = documento['tienda']
+        self.assertEqual(tienda['primaryColor'], '#000000')
+        self.assertEqual(tienda['extra'], 1)
+        self.assertEqual(tienda['heroBtn'], escaparate.PLANTILLA['heroBtn'])
+        self.assertEqual((tienda['storeName'], tienda['mapAddress']), ('Café Central', 'Costera 100'))
+
+    def test_se_sirve_precomprimido_en_una_consulta(self):
+        self.ver()
+        with self.assertNumQueries(1):
+            respuesta = self.ver(HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(orjson.loads(gzip.decompress(respuesta.content))['id_negocio'], self.negocio.id_negocio)
+        self.assertIn('Accept-Encoding', respuesta['Vary'])
+
+        no_modificado = self.ver(HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+
+    def test_cambios_regeneran_y_baja_retira(self):
+        etag = self.ver()['ETag']
+        self.client.post(
+            reverse('personalizar_tienda', args=[self.negocio.id_negocio]), {'heroTitle': 'Hola'},
+            content_type='application/json',
+        )
+        respuesta = self.ver(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(orjson.loads(respuesta.content)['tienda']['heroTitle'], 'Hola')
+
+        self.client.patch(
+            reverse('actualizar_negocio', args=[self.negocio.id_negocio]), {'nombre': 'Café Norte'},
+            content_type='application/json',
+        )
+        self.assertEqual(orjson.loads(self.ver().content)['tienda']['storeName'], 'Café Norte')
+
+        self.client.delete(reverse('eliminar_negocio', args=[self.negocio.id_negocio]))
+        self.assertEqual(self.ver().status_code, 404)
+        self.assertFalse(Escaparate.objects.exists())
+
+    def test_activo_no_se_cambia_por_patch(self):
+        self.ver()
+        self.client.patch(
+            reverse('actualizar_negocio', args=[self.negocio.id_negocio]), {'activo': False},
+            content_type='application/json',
+        )
+        self.client.patch(
+            reverse('actualizar_negocios_masivo'), [{'id_negocio': self.negocio.id_negocio, 'activo': False}],
+            content_type='application/json',
+        )
+        self.negocio.refresh_from_db()
+        self.assertTrue(self.negocio.activo)
+        self.assertEqual(self.ver().status_code, 200)
+
+    def test_inactivo_no_se_sirve_aunque_quede_el_documento(self):
+        self.ver()
+        Negocio.objects.filter(pk=self.negocio.pk).update(activo=False)
+        self.assertEqual(self.ver().status_code, 404)
+
+    def test_reconstruir_desactualizados(self):
+        otro = Negocio.objects.create(
+            nombre='Otro', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=7,
+        )
+        escaparate.materializar([self.negocio, otro])
+        Escaparate.objects.filter(negocio=otro).update(version_plantilla=0, cuerpo=b'{}')
+        with mock.patch.dict(escaparate.PLANTILLA, heroBtn='Ver más'):
+            call_command('reconstruir_escaparates', desactualizados=True, stdout=io.StringIO())
+        tiendas = {
+            fila.negocio_id: orjson.loads(bytes(fila.cuerpo))['tienda'] for fila in Escaparate.objects.all()
+        }
+        self.assertEqual(tiendas[otro.id_negocio]['heroBtn'], 'Ver más')
+        # El que ya estaba al día no se tocó
+        self.assertEqual(tiendas[self.negocio.id_negocio]['heroBtn'], 'Explorar Productos')
+
+
+class PersonalizacionParcialTests(NegociosTestCase):
+    def setUp(self):
+        super().setUp()
+        self.negocio = Negocio.objects.create(
+            nombre='Café Central', tipo='restaurante', correo='n@example.com', telefono='1', direccion='x',
+            id_usuario=7,
+            personalizacion={
+                'primaryColor': '#000000', 'heroTitle': 'Hola', 'secciones': ['a', 'b'],
+                'redes': {'facebook': 'fb', 'x': 'x'},
+            },
+        )
+        self.url = reverse('personalizar_tienda', args=[self.negocio.id_negocio])
+        self.autenticar(7)
+
+    def parchar(self, cuerpo, tipo='application/merge-patch+json'):
+        return self.client.patch(self.url, orjson.dumps(cuerpo), content_type=tipo)
+
+    def personalizacion(self):
+        return Negocio.objects.values_list('personalizacion', flat=True).get(pk=self.negocio.pk)
+
+    def test_merge_patch_en_una_sentencia_y_solo_lo_que_cambio(self):
+        with CaptureQueriesContext(connection) as consultas:
+            respuesta = self.parchar({'heroTitle': 'Bienvenidos', 'primaryColor': None, 'redes': {'x': None, 'ig': 'i'}})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(
+            respuesta.json()['personalizacion'],
+            {'heroTitle': 'Bienvenidos', 'primaryColor': None, 'redes': {'facebook': 'fb', 'ig': 'i'}},
+        )
+        self.assertIn('ETag', respuesta)
+        self.assertEqual(self.personalizacion(), {
+            'heroTitle': 'Bienvenidos', 'secciones': ['a', 'b'], 'redes': {'facebook': 'fb', 'ig': 'i'},
+        })
+        # El documento nunca se lee en Python antes de escribirlo
+        updates = [q['sql'] for q in consultas.captured_queries if 'UPDATE "negocios"' in q['sql'] or 'UPDATE negocios' in q['sql']]
+        self.assertEqual(len(updates), 1)
+
+    def test_json_plano_se_trata_como_merge_patch(self):
+        respuesta = self.parchar({'heroTitle': 'Otro'}, 'application/json')
+        self.assertEqual(respuesta.json()['personalizacion'], {'heroTitle': 'Otro'})
+        self.assertEqual(self.personalizacion()['primaryColor'], '#000000')
+
+    def test_json_patch(self):
+        respuesta = self.parchar([
+            {'op': 'test', 'path': '/heroTitle', 'value': 'Hola'},
+            {'op': 'add', 'path': '/secciones/1', 'value': 'nueva'},
+            {'op': 'add', 'path': '/secciones/-', 'value': 'final'},
+            {'op': 'replace', 'path': '/redes/facebook', 'value': 'fb2'},
+            {'op': 'remove', 'path': '/redes/x'},
+            {'op': 'move', 'from': '/primaryColor', 'path': '/bgColor'},
+        ], 'application/json-patch+json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(set(respuesta.json()['personalizacion']), {'secciones', 'redes', 'primaryColor', 'bgColor'})
+        self.assertEqual(self.personalizacion(), {
+            'heroTitle': 'Hola', 'secciones': ['a', 'nueva', 'b', 'final'], 'redes': {'facebook': 'fb2'},
+            'bgColor': '#000000',
+        })
+
+    def test_json_patch_que_no_aplica_no_escribe(self):
+        antes = self.personalizacion()
+        for operaciones in (
+            [{'op': 'add', 'path': '/heroTitle', 'value': 'x'}, {'op': 'test', 'path': '/heroTitle', 'value': 'Hola'}],
+            [{'op': 'remove', 'path': '/noExiste'}],
+            [{'op': 'replace', 'path': '/heroTitle/sub', 'value': 1}],
+        ):
+            respuesta = self.parchar(operaciones, 'application/json-patch+json')
+            self.assertEqual(respuesta.status_code, 409, operaciones)
+        self.assertEqual(self.personalizacion(), antes)
+
+        respuesta = self.parchar([{'op': 'borrar', 'path': '/x'}], 'application/json-patch+json')
+        self.assertEqual(respuesta.status_code, 400)
+
+    @override_settings(NEGOCIOS_PERSONALIZACION={'TAMANO_MAXIMO': 200, 'MAXIMO_OPERACIONES': 100})
+    def test_tamano_maximo(self):
+        respuesta = self.parchar({'featuredDesc': 'x' * 300})
+        self.assertEqual(respuesta.status_code, 413)
+        self.assertNotIn('featuredDesc', self.personalizacion())
+        respuesta = self.client.post(self.url, {'featuredDesc': 'x' * 300}, content_type='application/json')
+        self.assertEqual(respuesta.status_code, 413)
+
+    def test_documento_justo_en_el_limite(self):
+        documento = {'heroTitle': 'Hola', 'secciones': ['a', 'b'], 'redes': {'facebook': 'fb', 'x': 1.5}}
+        tamano = parches.medir(documento)
+        # El texto del jsonb lleva espacios tras ":" y ","; el JSON compacto no
+        self.assertGreater(tamano, len(orjson.dumps(documento)))
+        ajustes = {'MAXIMO_OPERACIONES': 100}
+        with self.settings(NEGOCIOS_PERSONALIZACION={**ajustes, 'TAMANO_MAXIMO': tamano}):
+            self.assertEqual(self.client.post(self.url, documento, content_type='application/json').status_code, 200)
+            # Un parche que no cambia nada no puede rechazar lo que el POST aceptó
+            self.assertEqual(self.parchar({'heroTitle': 'Hola'}).status_code, 200)
+        with self.settings(NEGOCIOS_PERSONALIZACION={**ajustes, 'TAMANO_MAXIMO': tamano - 1}):
+            self.assertEqual(self.client.post(self.url, documento, content_type='application/json').status_code, 413)
+            self.assertEqual(self.parchar({'heroTitle': 'Hola'}).status_code, 413)
+
+    def test_json_patch_indice_fuera_del_arreglo(self):
+        antes = self.personalizacion()
+        for ruta in ('/secciones/3', '/secciones/01', '/secciones/x'):
+            respuesta = self.parchar([{'op': 'add', 'path': ruta, 'value': 'z'}], 'application/json-patch+json')
+            self.assertEqual(respuesta.status_code, 409, ruta)
+        self.assertEqual(self.personalizacion(), antes)
+        # Justo en el largo es agregar al final
+        self.parchar([{'op': 'add', 'path': '/secciones/2', 'value': 'c'}], 'application/json-patch+json')
+        self.assertEqual(self.personalizacion()['secciones'], ['a', 'b', 'c'])
+
+    def test_solo_el_propietario(self):
+        self.autenticar(8)
+        self.assertEqual(self.parchar({'heroTitle': 'x'}).status_code, 404)
+        self.assertEqual(self.personalizacion()['heroTitle'], 'Hola')
+
+    def test_publica_evento_y_regenera_escaparate(self):
+        self.parchar({'heroTitle': 'Bienvenidos'})
+        evento = EventoOutbox.objects.get()
+        self.assertEqual(evento.payload['negocio']['personalizacion']['heroTitle'], 'Bienvenidos')
+        cuerpo = orjson.loads(bytes(Escaparate.objects.get(negocio=self.negocio).cuerpo))
+        self.assertEqual(cuerpo['tienda']['heroTitle'], 'Bienvenidos')
+
+
+class BlobsTests(NegociosTestCase):
+    CONTENIDO = b'\x89PNG\r\n\x1a\nimagen de prueba'
+
+    def setUp(self):
+        super().setUp()
+        raiz = tempfile.TemporaryDirectory()
+        self.addCleanup(raiz.cleanup)
+        ajustes = override_settings(NEGOCIOS_BLOBS={
+            **settings.NEGOCIOS_BLOBS, 'OPCIONES': {'raiz': raiz.name}, 'TAMANO_MAXIMO': 1024,
+        })
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        blobs.obtener_almacenamiento.cache_clear()
+        self.addCleanup(blobs.obtener_almacenamiento.cache_clear)
+        self.data_url = 'data:image/png;base64,' + base64.b64encode(self.CONTENIDO).decode()
+        self.clave = hashlib.sha256(self.CONTENIDO).hexdigest() + '.png'
+
+    def test_externalizar_guarda_una_vez_por_contenido(self):
+        url = blobs.externalizar(self.data_url)
+        self.assertEqual(url, settings.NEGOCIOS_BLOBS['URL_BASE'] + self.clave)
+        self.assertEqual(blobs.externalizar(self.data_url), url)
+        with blobs.obtener_almacenamiento().abrir(self.clave) as archivo:
+            self.assertEqual(archivo.read(), self.CONTENIDO)
+        # Lo que no es data URL no se toca
+        self.assertEqual(blobs.externalizar('https://example.com/logo.png'), 'https://example.com/logo.png')
+        self.assertEqual(
+            blobs.externalizar_personalizacion({'storeLogo': self.data_url, 'heroTitle': 'Hola'}),
+            {'storeLogo': url, 'heroTitle': 'Hola'},
+        )
+
+    def test_data_urls_invalidas(self):
+        for valor in (
+            'data:image/svg+xml;base64,PHN2Zz4=',
+            'data:image/png,sin-base64',
+            'data:image/png;base64,no es base64!',
+            'data:image/png;base64,',
+            'data:image/png;base64,' + 'A' * 2000,
+        ):
+            with self.assertRaises(blobs.BlobInvalido, msg=valor):
+                blobs.externalizar(valor)
+
+    def test_servir_blob_y_304(self):
+        blobs.externalizar(self.data_url)
+        url = reverse('servir_blob', args=[self.clave])
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(b''.join(respuesta.streaming_content), self.CONTENIDO)
+        self.assertEqual(respuesta['Content-Type'], 'image/png')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+
+        no_modificado = self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(no_modificado.status_code, 304)
+        self.assertEqual(no_modificado['ETag'], respuesta['ETag'])
+
+    def test_backend_incompleto_no_se_instancia(self):
+        class SinAbrir(blobs.AlmacenamientoBlobs):
+            def existe(self, clave):
+                return False
+
+            def guardar(self, clave, contenido):
+                pass
+
+        with self.assertRaises(TypeError):
+            SinAbrir()
+
+    def test_claves_invalidas(self):
+        blobs.externalizar(self.data_url)
+        for clave in (self.clave + '\n', self.clave.upper(), self.clave[:-4] + '.svg', '../' + self.clave):
+            self.assertFalse(blobs.CLAVE_RE.match(clave), clave)
+        self.assertEqual(self.client.get('/api/negocios/blobs/' + self.clave + '%0A').status_code, 404)
+        self.assertEqual(self.client.get(reverse('servir_blob', args=['0' * 64 + '.png'])).status_code, 404)
+
+    def test_migrar_blobs(self):
+        base64_ = Negocio.objects.create(
+            nombre='Con base64', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=1,
+            logo_url=self.data_url, personalizacion={'featuredImage': self.data_url, 'heroTitle': 'Hola'},
+        )
+        roto = Negocio.objects.create(
+            nombre='Roto', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=1,
+            logo_url='data:image/svg+xml;base64,PHN2Zz4=',
+        )
+        limpio = Negocio.objects.create(
+            nombre='Limpio', tipo='otro', correo='n@example.com', telefono='1', direccion='x', id_usuario=1,
+            logo_url='https://example.com/logo.png',
+        )
+        escaparate.materializar([base64_])
+        salida, errores = io.StringIO(), io.StringIO()
+
+        call_command('migrar_blobs', dry_run=True, stdout=salida, stderr=errores)
+        self.assertIn('Por migrar: 2 de 3', salida.getvalue())
+        self.assertEqual(Negocio.objects.get(pk=base64_.pk).logo_url, self.data_url)
+
+        call_command('migrar_blobs', lote=1, stdout=salida, stderr=errores)
+        url = settings.NEGOCIOS_BLOBS['URL_BASE'] + self.clave
+        base64_.refresh_from_db()
+        self.assertEqual(base64_.logo_url, url)
+        self.assertEqual(base64_.personalizacion, {'featuredImage': url, 'heroTitle': 'Hola'})
+        # El escaparate ya armado deja de servir el base64
+        tienda = orjson.loads(bytes(Escaparate.objects.get(negocio=base64_).cuerpo))['tienda']
+        self.assertEqual((tienda['storeLogo'], tienda['featuredImage']), (url, url))
+        # Y el topic compactado recibe el logo nuevo
+        evento = EventoOutbox.objects.get(clave=str(base64_.id_negocio))
+        self.assertEqual(evento.payload['negocio']['logo_url'], url)
+        self.assertIn(f'Negocio {roto.id_negocio}', errores.getvalue())
+        self.assertEqual(Negocio.objects.get(pk=limpio.pk).logo_url, 'https://example.com/logo.png')
@@ -4,10 +4,17 @@ from . import views
 urlpatterns = [
     path("", views.listar_negocios, name="listar_negocios"),
     path("crear/", views.crear_negocio, name="crear_negocio"),
+    path("masivo/crear/", views.crear_negocios_masivo, name="crear_negocios_masivo"),
+    path("masivo/actualizar/", views.actualizar_negocios_masivo, name="actualizar_negocios_masivo"),
+    path("cercanos/", views.negocios_cercanos, name="negocios_cercanos"),
+    path("buscar/", views.buscar_negocios, name="buscar_negocios"),
     path("<int:id_negocio>/", views.obtener_negocio, name="obtener_negocio"),
     path("<int:id_negocio>/actualizar/", views.actualizar_negocio, name="actualizar_negocio"),
     path("<int:id_negocio>/eliminar/", views.eliminar_negocio, name="eliminar_negocio"),
     path("<int:id_negocio>/personalizar/", views.personalizar_tienda, name="personalizar_tienda"),
+    path("<int:id_negocio>/escaparate/", views.ver_escaparate, name="ver_escaparate"),
+    path("mios/", views.mis_negocios, name="mis_negocios"),
     path("usuario/<int:id_usuario>/", views.negocios_por_usuario, name="negocios_por_usuario"),
+    path("blobs/<str:clave>", views.servir_blob, name="servir_blob"),
 ]
 
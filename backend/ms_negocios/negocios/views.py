@@ -1,28 +1,92 @@
+from acaclick_comun import compresion
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramWordSimilarity
+from django.db import OperationalError, connection, transaction
+from django.db.models import F, FloatField, Q
+from django.db.models.functions import Cast
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_GET
 from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from . import cache, condicional, escaparate, eventos, masivo, parches
+from .blobs import CLAVE_RE, TIPOS_POR_EXTENSION, BlobInvalido, externalizar_personalizacion, obtener_almacenamiento
+from .filtros import filtrar_listado
+from .geo import filtrar_cercanos
 from .models import Negocio
-from .serializers import NegocioSerializer, NegocioCreateSerializer
+from .paginacion import PaginacionDistancia, PaginacionRelevancia
+from .proyecciones import campos_solicitados, incluidos, proyectar
+from .serializers import (
+    BusquedaSerializer,
+    CercanosSerializer,
+    NegocioCercanoSerializer,
+    NegocioSerializer,
+    NegocioCreateSerializer,
+)
+
+
+def _pagina(request, queryset, paginador=None, serializer_class=NegocioSerializer):
+    """Serializar una sola página del listado (paginación por cursor) con sus validadores"""
+    campos = campos_solicitados(request, NegocioSerializer.Meta.fields)
+    incluir = incluidos(request)
+    if paginador is None:
+        paginador = api_settings.DEFAULT_PAGINATION_CLASS()
+    pagina = paginador.paginate_queryset(proyectar(queryset, campos, incluir), request)
+    serializer = serializer_class(pagina, many=True, campos=campos, incluir=incluir)
+    datos = paginador.get_paginated_response(serializer.data).data
+    etag, modificado = condicional.validadores_filas(request, paginador.filas)
+    return {
+        'datos': {**datos, 'results': list(datos['results'])},
+        'etag': etag,
+        'modificado': modificado,
+    }
+
+
+def _paginar(request, queryset, paginador=None, serializer_class=NegocioSerializer):
+    """Responder una página del listado, o 304 si el cliente ya la tiene"""
+    if paginador is None:
+        paginador = api_settings.DEFAULT_PAGINATION_CLASS()
+    if condicional.es_condicional(request):
+        # Se compara contra un agregado de la página, sin leer sus filas
+        ventana = paginador.ventana(queryset, request)
+        respuesta = condicional.no_modificado(
+            request, *condicional.validadores_consulta(request, ventana, incluidos(request))
+        )
+        if respuesta is not None:
+            return respuesta
+    return condicional.responder(request, **_pagina(request, queryset, paginador, serializer_class))
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def listar_negocios(request):
     """Listar todos los negocios"""
-    negocios = Negocio.objects.filter(activo=True)
-    serializer = NegocioSerializer(negocios, many=True)
-    return Response(serializer.data)
+    negocios = filtrar_listado(request, Negocio.objects.filter(activo=True))
+    return _paginar(request, negocios)
 
 
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def obtener_negocio(request, id_negocio):
     """Obtener un negocio por ID"""
+    campos = campos_solicitados(request, NegocioSerializer.Meta.fields)
+    incluir = incluidos(request)
+
+    def cargar():
+        negocio = proyectar(Negocio.objects, campos, incluir).get(id_negocio=id_negocio, activo=True)
+        modificado = condicional.modificado(negocio)
+        return {
+            'datos': dict(NegocioSerializer(negocio, campos=campos, incluir=incluir).data),
+            'etag': condicional.etag_negocio(negocio.id_negocio, modificado, campos, incluir),
+            'modificado': modificado,
+        }
+
     try:
-        negocio = Negocio.objects.get(id_negocio=id_negocio, activo=True)
-        serializer = NegocioSerializer(negocio)
-        return Response(serializer.data)
+        # Los validadores van en la cache: un 304 no toca la base
+        return condicional.responder(request, **cache.leer_negocio(id_negocio, campos, cargar, incluir))
     except Negocio.DoesNotExist:
         return Response(
             {'error': 'Negocio no encontrado'},
@@ -31,16 +95,19 @@ def obtener_negocio(request, id_negocio):
 
 
 @api_view(['POST'])
-@permission_classes([AllowAny])
+@permission_classes([IsAuthenticated])
 def crear_negocio(request):
-    """Crear un nuevo negocio"""
+    """Crear un nuevo negocio (el propietario es el usuario del token)"""
     try:
         serializer = NegocioCreateSerializer(data=request.data)
         
         if serializer.is_valid():
-            negocio = serializer.save()
-            response_serializer = NegocioSerializer(negocio)
-            return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+            with transaction.atomic():
+                negocio = serializer.save(id_usuario=request.user.id_usuario)
+                cache.invalidar(id_usuarios=[negocio.id_usuario])
+                datos = NegocioSerializer(negocio).data
+                eventos.publicar_cambio(negocio, eventos.CREADO, datos)
+            return Response(datos, status=status.HTTP_201_CREATED)
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
@@ -54,34 +121,111 @@ def crear_negocio(request):
 
 
 @api_view(['PUT', 'PATCH'])
-@permission_classes([AllowAny])
+@permission_classes([IsAuthenticated])
 def actualizar_negocio(request, id_negocio):
-    """Actualizar un negocio"""
-    try:
-        negocio = Negocio.objects.get(id_negocio=id_negocio)
-    except Negocio.DoesNotExist:
-        return Response(
-            {'error': 'Negocio no encontrado'},
-            status=status.HTTP_404_NOT_FOUND
+    """Actualizar un negocio propio (con If-Match, solo si nadie lo cambió antes)"""
+    with transaction.atomic():
+        try:
+            # El bloqueo evita que otra escritura se cuele entre la comprobación y el guardado
+            negocio = Negocio.objects.del_propietario(request.user).select_for_update().get(id_negocio=id_negocio)
+        except Negocio.DoesNotExist:
+            return Response(
+                {'error': 'Negocio no encontrado'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        etag = condicional.etag_negocio(negocio.id_negocio, negocio.actualizado_en)
+        if condicional.if_match_falla(request, etag):
+            return condicional.con_validadores(
+                Response(
+                    {'error': 'El negocio cambió desde la última lectura'},
+                    status=status.HTTP_412_PRECONDITION_FAILED
+                ),
+                etag,
+                negocio.actualizado_en,
+            )
+
+        serializer = NegocioSerializer(negocio, data=request.data, partial=True)
+
+        if serializer.is_valid():
+            serializer.save()
+            cache.invalidar(id_negocio, [negocio.id_usuario])
+            eventos.publicar_cambio(negocio, datos=serializer.data)
+            escaparate.materializar([negocio])
+            return condicional.con_validadores(
+                Response(serializer.data),
+                condicional.etag_negocio(negocio.id_negocio, negocio.actualizado_en),
+                negocio.actualizado_en,
+            )
+
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _items_masivos(request):
+    """Lista de ítems del cuerpo (arreglo JSON o NDJSON) o la respuesta de error"""
+    items = request.data
+    if not isinstance(items, list):
+        return None, Response(
+            {'error': 'Se esperaba un arreglo JSON o NDJSON (un objeto por línea)'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-    
-    serializer = NegocioSerializer(negocio, data=request.data, partial=True)
-    
-    if serializer.is_valid():
-        serializer.save()
-        return Response(serializer.data)
-    
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    maximo = settings.NEGOCIOS_MASIVO['MAXIMO_ITEMS']
+    if len(items) > maximo:
+        return None, Response(
+            {'error': f'Máximo {maximo} negocios por carga'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    return items, None
+
+
+def _respuesta_masiva(resultados, estado_ok):
+    """201/200 si todo salió bien, 207 si hubo errores parciales, 400 si falló todo"""
+    errores = sum(resultado['estado'] == 'error' for resultado in resultados)
+    if not errores:
+        codigo = estado_ok
+    elif errores == len(resultados):
+        codigo = status.HTTP_400_BAD_REQUEST
+    else:
+        codigo = status.HTTP_207_MULTI_STATUS
+    return Response({
+        'total': len(resultados),
+        'errores': errores,
+        'resultados': resultados,
+    }, status=codigo)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def crear_negocios_masivo(request):
+    """Crear muchos negocios en una sola petición, todos del usuario del token"""
+    items, error = _items_masivos(request)
+    if error is not None:
+        return error
+    return _respuesta_masiva(masivo.crear(items, request.user), status.HTTP_201_CREATED)
+
+
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def actualizar_negocios_masivo(request):
+    """Actualizar muchos negocios propios en una sola petición (cada ítem lleva su id_negocio)"""
+    items, error = _items_masivos(request)
+    if error is not None:
+        return error
+    return _respuesta_masiva(masivo.actualizar(items, request.user), status.HTTP_200_OK)
 
 
 @api_view(['DELETE'])
-@permission_classes([AllowAny])
+@permission_classes([IsAuthenticated])
 def eliminar_negocio(request, id_negocio):
-    """Eliminar (desactivar) un negocio"""
+    """Eliminar (desactivar) un negocio propio"""
     try:
-        negocio = Negocio.objects.get(id_negocio=id_negocio)
-        negocio.activo = False
-        negocio.save()
+        with transaction.atomic():
+            negocio = Negocio.objects.del_propietario(request.user).get(id_negocio=id_negocio)
+            negocio.activo = False
+            negocio.save()
+            cache.invalidar(id_negocio, [negocio.id_usuario])
+            eventos.publicar_baja(negocio.id_negocio)
+            escaparate.retirar(negocio.id_negocio)
         return Response({'message': 'Negocio eliminado correctamente'}, status=status.HTTP_200_OK)
     except Negocio.DoesNotExist:
         return Response(
@@ -90,34 +234,196 @@ def eliminar_negocio(request, id_negocio):
         )
 
 
+def _listar_de_usuario(request, id_usuario, negocios):
+    negocios = filtrar_listado(request, negocios.filter(activo=True))
+    if 'abierto_ahora' in request.query_params:
+        # Depende de la hora actual: no se puede cachear
+        return _paginar(request, negocios)
+
+    return condicional.responder(
+        request, **cache.leer_lista_usuario(id_usuario, request, lambda: _pagina(request, negocios))
+    )
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def negocios_por_usuario(request, id_usuario):
     """Listar negocios de un usuario específico"""
-    negocios = Negocio.objects.filter(id_usuario=id_usuario, activo=True)
-    serializer = NegocioSerializer(negocios, many=True)
-    return Response(serializer.data)
+    return _listar_de_usuario(request, id_usuario, Negocio.objects.filter(id_usuario=id_usuario))
 
 
-@api_view(['POST'])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def mis_negocios(request):
+    """Listar los negocios del usuario del token"""
+    return _listar_de_usuario(request, request.user.id_usuario, Negocio.objects.del_propietario(request.user))
+
+
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def negocios_cercanos(request):
+    """Listar negocios cercanos a un punto, del más cercano al más lejano"""
+    parametros = CercanosSerializer(data=request.query_params)
+    parametros.is_valid(raise_exception=True)
+    datos = parametros.validated_data
+    negocios = filtrar_listado(request, Negocio.objects.filter(activo=True))
+    negocios = filtrar_cercanos(negocios, datos['lat'], datos['lng'], datos['radio'])
+    return _paginar(request, negocios, PaginacionDistancia(), NegocioCercanoSerializer)
+
+
+@api_view(['GET'])
 @permission_classes([AllowAny])
+def buscar_negocios(request):
+    """Buscar negocios por nombre, descripción y dirección (tolera errores de dedo)"""
+    parametros = BusquedaSerializer(data=request.query_params)
+    parametros.is_valid(raise_exception=True)
+    texto = parametros.validated_data['q']
+
+    negocios = filtrar_listado(request, Negocio.objects.filter(activo=True))
+
+    # Texto completo (índice GIN sobre `busqueda`) o trigramas sobre el nombre
+    consulta = SearchQuery(texto, config='spanish', search_type='websearch')
+    negocios = negocios.filter(
+        Q(busqueda=consulta) | Q(nombre__trigram_word_similar=texto)
+    ).annotate(
+        # real -> float8: el cursor guarda un float y debe compararse igual con los empates
+        relevancia=Cast(
+            SearchRank(F('busqueda'), consulta) + TrigramWordSimilarity(texto, 'nombre'), FloatField()
+        )
+    )
+
+    # Presupuesto de latencia: Postgres cancela la consulta si se pasa
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SET LOCAL statement_timeout = %s',
+                    [settings.NEGOCIOS_BUSQUEDA['TIMEOUT_MS']],
+                )
+            return _paginar(request, negocios, PaginacionRelevancia())
+    except OperationalError:
+        return Response(
+            {'error': 'La búsqueda tardó demasiado, intenta con términos más específicos'},
+            status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+@api_view(['POST', 'PATCH'])
+@permission_classes([IsAuthenticated])
 def personalizar_tienda(request, id_negocio):
-    """Guardar personalización de la tienda"""
+    """
+    Guardar personalización de la tienda (solo su propietario).
+    POST reemplaza el documento; PATCH aplica un JSON Merge Patch (o JSON
+    normal, con la misma semántica) o un JSON Patch en la base de datos y
+    responde solo con las secciones que cambiaron.
+    """
+    if request.method == 'PATCH':
+        return _parchar_personalizacion(request, id_negocio)
+
     try:
-        negocio = Negocio.objects.get(id_negocio=id_negocio)
+        negocio = Negocio.objects.del_propietario(request.user).get(id_negocio=id_negocio)
     except Negocio.DoesNotExist:
         return Response(
             {'error': 'Negocio no encontrado'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Actualizar el campo de personalización
-    personalizacion_data = request.data
+    # Actualizar el campo de personalización (las imágenes embebidas pasan a blobs)
+    try:
+        personalizacion_data = externalizar_personalizacion(request.data)
+    except BlobInvalido as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    # Medido igual que en PATCH, para que un documento aceptado aquí no lo rechace un parche vacío
+    if parches.medir(personalizacion_data) > settings.NEGOCIOS_PERSONALIZACION['TAMANO_MAXIMO']:
+        return Response(
+            {'error': f"La personalización no puede pasar de {settings.NEGOCIOS_PERSONALIZACION['TAMANO_MAXIMO']} bytes"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
     negocio.personalizacion = personalizacion_data
-    negocio.save()
-    
-    serializer = NegocioSerializer(negocio)
+    with transaction.atomic():
+        negocio.save(update_fields=['personalizacion', 'actualizado_en'])
+        cache.invalidar(id_negocio, [negocio.id_usuario])
+        serializer = NegocioSerializer(negocio)
+        eventos.publicar_cambio(negocio, datos=serializer.data)
+        escaparate.materializar([negocio])
+
     return Response({
         'message': 'Personalización guardada exitosamente',
         'negocio': serializer.data
     }, status=status.HTTP_200_OK)
+
+
+def _parchar_personalizacion(request, id_negocio):
+    tipo = parches.JSON_PATCH if request.content_type.startswith(parches.JSON_PATCH) else parches.MERGE_PATCH
+    with transaction.atomic():
+        try:
+            cambios, _ = parches.aplicar(id_negocio, request.user, tipo, request.data)
+        except Negocio.DoesNotExist:
+            return Response({'error': 'Negocio no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+        except (parches.ParcheInvalido, BlobInvalido) as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except parches.ParcheNoAplicable as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except parches.PersonalizacionDemasiadoGrande as e:
+            return Response({'error': str(e)}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        # El evento y el escaparate llevan el estado completo del negocio
+        negocio = Negocio.objects.defer('busqueda', 'horario_minutos').get(id_negocio=id_negocio)
+        cache.invalidar(id_negocio, [negocio.id_usuario])
+        eventos.publicar_cambio(negocio)
+        escaparate.materializar([negocio])
+
+    return condicional.con_validadores(
+        Response({
+            'id_negocio': negocio.id_negocio,
+            'personalizacion': cambios,
+            'actualizado_en': negocio.actualizado_en,
+        }),
+        condicional.etag_negocio(negocio.id_negocio, negocio.actualizado_en),
+        negocio.actualizado_en,
+    )
+
+
+@require_GET
+def servir_blob(request, clave):
+    """Servir un blob (logo o imagen) guardado por su hash de contenido"""
+    if not CLAVE_RE.match(clave):
+        raise Http404
+
+    # El contenido de una clave nunca cambia, así que el ETag es el propio hash
+    etag = '"%s"' % clave.split('.')[0]
+    if request.headers.get('If-None-Match') == etag:
+        respuesta = HttpResponseNotModified()
+    else:
+        try:
+            archivo = obtener_almacenamiento().abrir(clave)
+        except FileNotFoundError:
+            raise Http404
+        respuesta = FileResponse(archivo, content_type=TIPOS_POR_EXTENSION[clave.rsplit('.', 1)[1]])
+        respuesta['X-Content-Type-Options'] = 'nosniff'
+
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return respuesta
+
+
+@require_GET
+def ver_escaparate(request, id_negocio):
+    """Documento público de la tienda, ya armado y comprimido (ver escaparate.py)"""
+    gzip_aceptado = compresion.acepta(request.META.get('HTTP_ACCEPT_ENCODING', ''), 'gzip')
+    fila = escaparate.leer(id_negocio, gzip_aceptado)
+    if fila is None:
+        return JsonResponse({'error': 'Negocio no encontrado'}, status=404)
+    cuerpo, huella, generado_en = fila
+
+    # Cada codificación es una representación distinta: su propio ETag
+    etag = f'"e{huella}{"-gz" if gzip_aceptado else ""}"'
+    respuesta = condicional.no_modificado(request, etag, generado_en)
+    if respuesta is None:
+        respuesta = condicional.con_validadores(
+            HttpResponse(cuerpo, content_type='application/json'), etag, generado_en
+        )
+        if gzip_aceptado:
+            respuesta['Content-Encoding'] = 'gzip'
+    patch_vary_headers(respuesta, ('Accept-Encoding',))
+    return respuesta
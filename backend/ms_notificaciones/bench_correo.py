@@ -0,0 +1,108 @@
+"""
+Benchmark del envío de correos contra un SMTP local (aiosmtpd, en el mismo proceso).
+
+Compara abrir una conexión por mensaje (lo que haría un envío ingenuo) contra
+el pool de conexiones persistentes, con varios hilos, y contra ``enviar_lote``.
+``--latencia-ms`` simula lo que cuesta el saludo (EHLO/STARTTLS/AUTH) de un
+servidor real; en local ese costo es casi cero.
+
+    pip install aiosmtpd
+    python bench_correo.py --mensajes 500 --latencia-ms 50
+"""
+import argparse
+import asyncio
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiosmtpd.controller import Controller
+
+from correo import Despachador, LimitadorPorDominio, PoolSMTP
+
+
+class Receptor:
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.recibidos = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.latencia)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            self.recibidos += 1
+        return "250 OK"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mensajes", type=int, default=500)
+    parser.add_argument("--hilos", type=int, default=8)
+    parser.add_argument("--pool", type=int, default=4)
+    parser.add_argument("--latencia-ms", type=float, default=50)
+    parser.add_argument("--dominios", type=int, default=20)
+    args = parser.parse_args()
+
+    receptor = Receptor(args.latencia_ms / 1000)
+    controlador = Controller(receptor, hostname="127.0.0.1", port=8025)
+    controlador.start()
+
+    sin_limite = LimitadorPorDominio(tasa=1e9, rafaga=10**9)
+    envios = [
+        ("bienvenida", f"usuario{i}@dominio{i % args.dominios}.mx",
+         {"nombre": f"Usuario {i}", "apellido_paterno": "Pérez", "correo": f"usuario{i}@dominio{i % args.dominios}.mx"})
+        for i in range(args.mensajes)
+    ]
+
+    def sin_pool():
+        despachador = Despachador(None, sin_limite, "bench@acaclick.mx")
+
+        def enviar(envio):
+            mensaje = despachador.construir(*envio)
+            with smtplib.SMTP("127.0.0.1", 8025) as smtp:
+                smtp.send_message(mensaje)
+
+        with ThreadPoolExecutor(args.hilos) as hilos:
+            list(hilos.map(enviar, envios))
+
+    def con_pool():
+        pool = PoolSMTP("127.0.0.1", 8025, tamano=args.pool)
+        despachador = Despachador(pool, sin_limite, "bench@acaclick.mx")
+        with ThreadPoolExecutor(args.hilos) as hilos:
+            list(hilos.map(lambda envio: despachador.enviar(*envio), envios))
+        pool.cerrar()
+
+    def por_lotes():
+        pool = PoolSMTP("127.0.0.1", 8025, tamano=args.pool)
+        despachador = Despachador(pool, sin_limite, "bench@acaclick.mx")
+        tamano = max(1, args.mensajes // args.hilos)
+        lotes = [envios[i:i + tamano] for i in range(0, len(envios), tamano)]
+        with ThreadPoolExecutor(args.hilos) as hilos:
+            errores = [e for lote in hilos.map(despachador.enviar_lote, lotes) for e in lote if e]
+        pool.cerrar()
+        if errores:
+            print(f"  {len(errores)} errores, p. ej. {errores[0]!r}")
+
+    try:
+        print(f"{'estrategia':<32}{'segundos':>10}{'correos/s':>12}")
+        for nombre, funcion in (
+            ("una conexión por mensaje", sin_pool),
+            (f"pool de {args.pool} conexiones", con_pool),
+            (f"pool + enviar_lote", por_lotes),
+        ):
+            antes = receptor.recibidos
+            inicio = time.perf_counter()
+            funcion()
+            segundos = time.perf_counter() - inicio
+            recibidos = receptor.recibidos - antes
+            print(f"{nombre:<32}{segundos:>10.2f}{recibidos / segundos:>12.0f}")
+    finally:
+        controlador.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark de throughput del motor de consumo.
+
+Compara el procesamiento mensaje por mensaje (1 trabajador, como el consumer
+anterior) contra el pool de carriles por clave, con un procesamiento simulado
+que tarda ``--ms`` milisegundos (lo que tarda, p. ej., mandar un correo).
+Verifica además que cada clave se procesó en orden y que los offsets
+confirmados cubren todos los mensajes.
+
+Sin ``--kafka`` usa un consumer en memoria (no hace falta broker); con
+``--kafka`` produce los mensajes en un topic de prueba y los consume de verdad.
+
+    python bench_motor.py --mensajes 2000 --ms 5 --trabajadores 1 8 32
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+from collections import defaultdict, namedtuple
+
+from kafka.structs import TopicPartition
+
+from motor import MotorConsumo
+
+Registro = namedtuple("Registro", "topic partition offset key value leader_epoch")
+
+
+class ConsumerEnMemoria:
+    """Reparte los mensajes en particiones y los entrega con la interfaz de poll/commit/close"""
+
+    def __init__(self, mensajes, particiones, topic="bench"):
+        self.colas = defaultdict(list)
+        for clave, valor in mensajes:
+            tp = TopicPartition(topic, hash(clave) % particiones)
+            self.colas[tp].append(Registro(topic, tp.partition, len(self.colas[tp]), clave, valor, -1))
+        self.posiciones = dict.fromkeys(self.colas, 0)
+        self.confirmados = {}
+
+    def poll(self, timeout_ms=0, max_records=500):
+        lote = {}
+        restantes = max_records
+        for tp, cola in self.colas.items():
+            if restantes == 0:
+                break
+            inicio = self.posiciones[tp]
+            registros = cola[inicio:inicio + restantes]
+            if registros:
+                lote[tp] = registros
+                self.posiciones[tp] += len(registros)
+                restantes -= len(registros)
+        return lote
+
+    def commit(self, offsets):
+        for tp, offset in offsets.items():
+            self.confirmados[tp] = offset.offset
+
+    def close(self, autocommit=True):
+        pass
+
+
+def generar(mensajes, claves):
+    return [(f"usuario-{i % claves}", {"secuencia": i}) for i in range(mensajes)]
+
+
+def correr(consumer, trabajadores, ms, max_records, total):
+    vistos = defaultdict(list)
+    lock = threading.Lock()
+
+    def procesar(registro):
+        time.sleep(ms / 1000)
+        with lock:
+            vistos[registro.key].append(registro.value["secuencia"])
+
+    motor = MotorConsumo(consumer, procesar, max_records=max_records, trabajadores=trabajadores, timeout_ms=200)
+
+    def vigilar():
+        while sum(len(v) for v in vistos.values()) < total:
+            time.sleep(0.01)
+        motor.detener()
+
+    hilo = threading.Thread(target=vigilar, daemon=True)
+    inicio = time.perf_counter()
+    hilo.start()
+    motor.ejecutar()
+    segundos = time.perf_counter() - inicio
+    en_orden = all(secuencias == sorted(secuencias) for secuencias in vistos.values())
+    return segundos, en_orden
+
+
+def consumer_kafka(broker, mensajes, particiones, max_records):
+    from kafka import KafkaConsumer, KafkaProducer
+    from kafka.admin import KafkaAdminClient, NewTopic
+
+    topic = f"bench.motor.{uuid.uuid4().hex[:8]}"
+    KafkaAdminClient(bootstrap_servers=broker).create_topics(
+        [NewTopic(topic, num_partitions=particiones, replication_factor=1)]
+    )
+    producer = KafkaProducer(
+        bootstrap_servers=broker,
+        key_serializer=str.encode,
+        value_serializer=lambda v: json.dumps(v).encode(),
+        linger_ms=20,
+    )
+    for clave, valor in mensajes:
+        producer.send(topic, key=clave, value=valor)
+    producer.flush()
+    producer.close()
+
+    consumer = KafkaConsumer(
+        bootstrap_servers=broker,
+        group_id=topic,
+        auto_offset_reset="earliest",
+        enable_auto_commit=False,
+        max_poll_records=max_records,
+        key_deserializer=lambda k: k.decode(),
+        value_deserializer=lambda v: json.loads(v.decode()),
+    )
+    consumer.subscribe([topic])
+    return consumer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mensajes", type=int, default=2000)
+    parser.add_argument("--claves", type=int, default=200)
+    parser.add_argument("--particiones", type=int, default=6)
+    parser.add_argument("--ms", type=float, default=5, help="Tiempo simulado de procesamiento por mensaje")
+    parser.add_argument("--max-records", type=int, default=500)
+    parser.add_argument("--trabajadores", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--kafka", metavar="BROKER", help="p. ej. localhost:9092")
+    args = parser.parse_args()
+
+    mensajes = generar(args.mensajes, args.claves)
+    print(f"{'trabajadores':>12} {'segundos':>10} {'mensajes/s':>12}  orden por clave")
+    for trabajadores in args.trabajadores:
+        if args.kafka:
+            consumer = consumer_kafka(args.kafka, mensajes, args.particiones, args.max_records)
+        else:
+            consumer = ConsumerEnMemoria(mensajes, args.particiones)
+        segundos, en_orden = correr(consumer, trabajadores, args.ms, args.max_records, args.mensajes)
+        if isinstance(consumer, ConsumerEnMemoria):
+            completos = all(consumer.confirmados.get(tp) == len(cola) for tp, cola in consumer.colas.items())
+            en_orden = en_orden and completos
+        print(f"{trabajadores:>12} {segundos:>10.2f} {args.mensajes / segundos:>12.0f}  {'ok' if en_orden else 'FALLO'}")
+
+
+if __name__ == "__main__":
+    main()
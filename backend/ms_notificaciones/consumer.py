@@ -1,33 +1,130 @@
 import json
-from kafka import KafkaConsumer
+import logging
+import os
+from functools import partial
+
+from kafka import KafkaConsumer, KafkaProducer
+
+from correo import despachador_desde_entorno
+from metricas import Metricas
+from motor import MotorConsumo
 
 KAFKA_BROKER_URL = "localhost:9092"
 KAFKA_TOPIC_USUARIOS_CREADOS = "usuarios.creados"
+# Mensajes que siguieron fallando tras los reintentos, con el error en las cabeceras
+KAFKA_TOPIC_DESCARTADOS = "usuarios.creados.descartados"
+
+# Lote por poll e hilos que procesan en paralelo (un carril por clave)
+MAX_RECORDS = 500
+TRABAJADORES = 8
+
+# Puerto del endpoint /metrics (Prometheus); 0 lo desactiva
+METRICAS_PUERTO = int(os.environ.get("METRICAS_PUERTO", "9108"))
+
+
+def procesar_usuarios_creados(registros, despachador=None):
+    """
+    Procesa un grupo de ``usuarios.creados`` y devuelve los errores alineados
+    (``None`` si salió bien); el motor reintenta solo los que fallaron.
+    """
+    errores = [None] * len(registros)
+    if despachador is None:
+        # Sin SMTP configurado (SMTP_HOST) solo se registra
+        for registro in registros:
+            _registrar(registro.value)
+        return errores
+
+    envios, posiciones = [], []
+    for posicion, registro in enumerate(registros):
+        data = registro.value
+        if not data.get("correo"):
+            print(f"[CORREO] Usuario sin correo, no se envía bienvenida: {data}")
+            continue
+        posiciones.append(posicion)
+        envios.append(("bienvenida", data["correo"], {
+            "nombre": data.get("nombre") or "",
+            "apellido_paterno": data.get("apellido_paterno") or "",
+            "correo": data["correo"],
+        }))
+
+    # Todo el grupo por el pool, agrupado por dominio en una conexión cada uno
+    for posicion, (_, correo, _), error in zip(posiciones, envios, despachador.enviar_lote(envios)):
+        errores[posicion] = error
+        if error is None:
+            print(f"[CORREO] Bienvenida enviada a {correo}")
+    return errores
+
+
+def _registrar(data):
+    # Un solo print: se procesa en varios hilos y las líneas no deben mezclarse
+    print(
+        f"[KAFKA] Mensaje recibido: {data}\n"
+        "========= [NOTIFICACIÓN] =========\n"
+        "Usuario creado, debería mandarse un correo:\n"
+        f"{json.dumps(data, indent=4, ensure_ascii=False)}\n"
+        "==================================\n"
+    )
+
+
+def apartar_descartado(producer, registro, error):
+    """Copia el mensaje al topic de descartados; espera el ack para poder confirmar su offset"""
+    producer.send(
+        KAFKA_TOPIC_DESCARTADOS,
+        key=registro.key,
+        value=registro.value,
+        headers=[
+            ("origen", f"{registro.topic}[{registro.partition}]@{registro.offset}".encode()),
+            ("error", repr(error).encode()),
+        ],
+    ).get(timeout=10)
 
 
 def main():
+    logging.basicConfig(level=logging.INFO, format="[%(name)s] %(message)s")
     print("[KAFKA] Conectando a localhost:9092 ...")
 
     consumer = KafkaConsumer(
-        KAFKA_TOPIC_USUARIOS_CREADOS,
         bootstrap_servers=KAFKA_BROKER_URL,
         value_deserializer=lambda m: json.loads(m.decode("utf-8")),
+        key_deserializer=lambda k: k.decode("utf-8") if k is not None else None,
         group_id="ms_notificaciones",
         auto_offset_reset="earliest",
-        enable_auto_commit=True,
+        # Los offsets se confirman a mano, solo después de procesar cada lote
+        enable_auto_commit=False,
+        max_poll_records=MAX_RECORDS,
     )
 
+    producer_descartados = KafkaProducer(
+        bootstrap_servers=KAFKA_BROKER_URL,
+        key_serializer=lambda k: k.encode("utf-8") if k is not None else None,
+        value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+        acks="all",
+    )
+
+    despachador = despachador_desde_entorno()
+    procesar = partial(procesar_usuarios_creados, despachador=despachador)
+    metricas = Metricas()
+    servidor = metricas.servir(METRICAS_PUERTO) if METRICAS_PUERTO else None
+    if servidor is not None:
+        print(f"[METRICAS] Expuestas en http://0.0.0.0:{METRICAS_PUERTO}/metrics")
+    motor = MotorConsumo(consumer, procesar, max_records=MAX_RECORDS, trabajadores=TRABAJADORES,
+                         metricas=metricas, al_descartar=partial(apartar_descartado, producer_descartados),
+                         por_grupos=True)
+    consumer.subscribe([KAFKA_TOPIC_USUARIOS_CREADOS], listener=motor.oyente())
+    motor.instalar_senales()
+
     print(
         f"[KAFKA] Consumer conectado. Escuchando tópico '{KAFKA_TOPIC_USUARIOS_CREADOS}'..."
     )
-
-    for message in consumer:
-        data = message.value
-        print("[KAFKA] Mensaje recibido:", data)
-        print("========= [NOTIFICACIÓN] =========")
-        print("Usuario creado, debería mandarse un correo:")
-        print(json.dumps(data, indent=4, ensure_ascii=False))
-        print("==================================\n")
+    try:
+        motor.ejecutar()
+    finally:
+        if despachador is not None:
+            despachador.pool.cerrar()
+        producer_descartados.close()
+        if servidor is not None:
+            servidor.shutdown()
+    print("[KAFKA] Consumer detenido.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,7 @@
+"""Envío de notificaciones por correo (plantillas, pool SMTP y límites por dominio)"""
+from .config import despachador_desde_entorno
+from .despachador import Despachador
+from .limites import LimitadorPorDominio
+from .pool import PoolSMTP
+
+__all__ = ["Despachador", "LimitadorPorDominio", "PoolSMTP", "despachador_desde_entorno"]
@@ -0,0 +1,39 @@
+"""
+Configuración del envío de correos por variables de entorno.
+
+Sin ``SMTP_HOST`` el envío está desactivado y el consumer solo registra lo que
+mandaría. Para probar en local con aiosmtpd:
+
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 python consumer.py
+"""
+import os
+
+from .despachador import Despachador
+from .limites import LimitadorPorDominio
+from .pool import PoolSMTP
+
+
+def _booleano(nombre, defecto=False):
+    return os.environ.get(nombre, str(defecto)).lower() in ("1", "true", "si", "sí", "yes")
+
+
+def despachador_desde_entorno():
+    """``Despachador`` configurado por entorno, o ``None`` si no hay SMTP"""
+    host = os.environ.get("SMTP_HOST")
+    if not host:
+        return None
+    pool = PoolSMTP(
+        host,
+        port=int(os.environ.get("SMTP_PORT", 25)),
+        tamano=int(os.environ.get("SMTP_POOL", 4)),
+        usuario=os.environ.get("SMTP_USUARIO"),
+        password=os.environ.get("SMTP_PASSWORD"),
+        starttls=_booleano("SMTP_STARTTLS"),
+        keepalive=float(os.environ.get("SMTP_KEEPALIVE", 30)),
+    )
+    limitador = LimitadorPorDominio(
+        tasa=float(os.environ.get("CORREO_TASA_POR_DOMINIO", 5)),
+        rafaga=int(os.environ.get("CORREO_RAFAGA_POR_DOMINIO", 10)),
+    )
+    return Despachador(pool, limitador, os.environ.get("CORREO_REMITENTE", "no-responder@acaclick.mx"))
@@ -0,0 +1,95 @@
+"""
+Despachador de notificaciones por correo.
+
+Arma el mensaje con una plantilla cacheada, respeta el límite del dominio de
+destino y lo manda por el pool de conexiones SMTP. ``enviar_lote`` agrupa los
+correos por dominio y los manda por una misma conexión.
+"""
+import smtplib
+from collections import defaultdict
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+
+from . import plantillas
+from .pool import ERRORES_DE_CONEXION
+
+
+class Despachador:
+    def __init__(self, pool, limitador, remitente, nombre_remitente="AcaClick"):
+        self.pool = pool
+        self.limitador = limitador
+        self.remitente = remitente
+        self.nombre_remitente = nombre_remitente
+
+    def construir(self, plantilla, destinatario, contexto):
+        asunto, texto, html = plantillas.obtener(plantilla).renderizar(**contexto)
+        mensaje = EmailMessage()
+        mensaje["From"] = formataddr((self.nombre_remitente, self.remitente))
+        mensaje["To"] = destinatario
+        mensaje["Subject"] = asunto
+        mensaje["Message-ID"] = make_msgid(domain=self.remitente.rpartition("@")[2])
+        mensaje.set_content(texto)
+        if html is not None:
+            mensaje.add_alternative(html, subtype="html")
+        return mensaje
+
+    def enviar(self, plantilla, destinatario, contexto):
+        mensaje = self.construir(plantilla, destinatario, contexto)
+        self.limitador.esperar(_dominio(destinatario))
+        self.pool.enviar(mensaje)
+
+    def enviar_lote(self, envios):
+        """
+        ``envios`` es una lista de ``(plantilla, destinatario, contexto)``.
+        Devuelve una lista de errores alineada (``None`` si se envió).
+        """
+        errores = [None] * len(envios)
+        por_dominio = defaultdict(list)
+        for indice, (plantilla, destinatario, contexto) in enumerate(envios):
+            try:
+                por_dominio[_dominio(destinatario)].append(
+                    (indice, self.construir(plantilla, destinatario, contexto))
+                )
+            except (KeyError, ValueError) as e:
+                errores[indice] = e
+
+        for dominio, mensajes in por_dominio.items():
+            pendientes = mensajes
+            # Si la conexión se cae a mitad, lo que falta se reintenta una vez con otra
+            for intento in range(2):
+                pendientes = self._enviar_por_conexion(dominio, pendientes, errores)
+                if not pendientes:
+                    break
+            for indice, _ in pendientes:
+                errores[indice] = smtplib.SMTPServerDisconnected("Conexión perdida durante el lote")
+        return errores
+
+    def _enviar_por_conexion(self, dominio, mensajes, errores):
+        """Envía por una sola conexión; devuelve los que quedaron sin enviar si se cayó"""
+        try:
+            with self.pool.conexion() as conexion:
+                for posicion, (indice, mensaje) in enumerate(mensajes):
+                    self.limitador.esperar(dominio)
+                    try:
+                        conexion.smtp.send_message(mensaje)
+                        conexion.enviados += 1
+                    except ERRORES_DE_CONEXION:
+                        raise _Interrumpido(mensajes[posicion:])
+                    except smtplib.SMTPException as e:
+                        # Rechazo del servidor (destinatario inválido...): la sesión sigue usable
+                        errores[indice] = e
+        except _Interrumpido as interrumpido:
+            return interrumpido.pendientes
+        except ERRORES_DE_CONEXION:
+            return mensajes
+        return []
+
+
+class _Interrumpido(ConnectionError):
+    def __init__(self, pendientes):
+        super().__init__("Conexión SMTP perdida")
+        self.pendientes = pendientes
+
+
+def _dominio(correo):
+    return correo.rpartition("@")[2].lower()
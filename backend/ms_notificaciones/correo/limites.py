@@ -0,0 +1,41 @@
+"""
+Límite de envíos por dominio de destino (token bucket).
+
+Los proveedores (gmail.com, outlook.com...) difieren los correos o bloquean al
+remitente si recibe demasiados seguidos. Cada dominio tiene su cubeta: se
+rellena a ``tasa`` correos por segundo hasta ``rafaga`` y cada envío toma uno.
+"""
+import threading
+import time
+
+
+class LimitadorPorDominio:
+    def __init__(self, tasa=5.0, rafaga=10, tasas=None):
+        self.tasa = tasa
+        self.rafaga = rafaga
+        # Tasas particulares por dominio: {"gmail.com": 20}
+        self.tasas = tasas or {}
+        self._cubetas = {}
+        self._lock = threading.Lock()
+
+    def _tomar(self, dominio):
+        """Toma un permiso; devuelve 0 o los segundos que hay que esperar"""
+        tasa = self.tasas.get(dominio, self.tasa)
+        ahora = time.monotonic()
+        with self._lock:
+            fichas, ultima = self._cubetas.get(dominio, (self.rafaga, ahora))
+            fichas = min(self.rafaga, fichas + (ahora - ultima) * tasa)
+            if fichas >= 1:
+                self._cubetas[dominio] = (fichas - 1, ahora)
+                return 0
+            self._cubetas[dominio] = (fichas, ahora)
+            return (1 - fichas) / tasa
+
+    def esperar(self, dominio):
+        """Bloquea hasta que se pueda mandar otro correo a ``dominio``"""
+        dominio = dominio.lower()
+        while True:
+            espera = self._tomar(dominio)
+            if not espera:
+                return
+            time.sleep(espera)
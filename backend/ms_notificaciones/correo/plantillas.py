@@ -0,0 +1,39 @@
+"""
+Plantillas de correo: se leen y compilan una sola vez por proceso.
+
+Cada plantilla es un par ``<nombre>.txt`` / ``<nombre>.html`` en ``plantillas/``
+con marcadores ``$variable``. La primera línea del ``.txt`` es el asunto
+(``Asunto: ...``). En el HTML los valores se escapan.
+"""
+import html
+from functools import lru_cache
+from pathlib import Path
+from string import Template
+
+DIRECTORIO = Path(__file__).resolve().parent / "plantillas"
+
+
+class Plantilla:
+    def __init__(self, asunto, texto, html_=None):
+        self.asunto = Template(asunto)
+        self.texto = Template(texto)
+        self.html = Template(html_) if html_ is not None else None
+
+    def renderizar(self, **contexto):
+        """Devuelve ``(asunto, texto, html)``; falla si falta una variable"""
+        escapado = {clave: html.escape(str(valor)) for clave, valor in contexto.items()}
+        return (
+            self.asunto.substitute(contexto),
+            self.texto.substitute(contexto),
+            self.html.substitute(escapado) if self.html is not None else None,
+        )
+
+
+@lru_cache(maxsize=None)
+def obtener(nombre):
+    """Plantilla compilada (cacheada) por nombre"""
+    primera, _, texto = (DIRECTORIO / f"{nombre}.txt").read_text(encoding="utf-8").partition("\n")
+    asunto = primera.removeprefix("Asunto:").strip()
+    ruta_html = DIRECTORIO / f"{nombre}.html"
+    contenido_html = ruta_html.read_text(encoding="utf-8") if ruta_html.exists() else None
+    return Plantilla(asunto, texto.lstrip("\n"), contenido_html)
@@ -0,0 +1,154 @@
+"""
+Pool de conexiones SMTP persistentes.
+
+Abrir una conexión SMTP (TCP + EHLO + STARTTLS + AUTH) cuesta más que mandar
+un correo, así que las conexiones se reutilizan. Al tomar una conexión que
+estuvo ociosa más de ``keepalive`` segundos se comprueba con ``NOOP``; si el
+servidor la cerró (o falla a mitad de un envío) se abre otra y se reintenta
+una vez.
+"""
+import queue
+import smtplib
+import threading
+import time
+from contextlib import contextmanager
+
+# Errores que dejan la conexión inservible (no los rechazos del servidor, que
+# también heredan de OSError pero dejan la sesión usable)
+ERRORES_DE_CONEXION = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class _Conexion:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.usada_en = time.monotonic()
+        self.enviados = 0
+
+
+class PoolSMTP:
+    def __init__(self, host, port=25, tamano=4, usuario=None, password=None,
+                 starttls=False, timeout=10, keepalive=30, max_envios=1000):
+        self.host = host
+        self.port = port
+        self.tamano = tamano
+        self.usuario = usuario
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.keepalive = keepalive
+        # Algunos servidores cortan tras N mensajes por sesión: renovar antes
+        self.max_envios = max_envios
+        self._libres = queue.LifoQueue()
+        self._abiertas = 0
+        self._lock = threading.Lock()
+        self._cerrado = False
+
+    def _abrir(self):
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.usuario:
+                smtp.login(self.usuario, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        return _Conexion(smtp)
+
+    @staticmethod
+    def _cerrar(conexion):
+        try:
+            conexion.smtp.quit()
+        except Exception:
+            conexion.smtp.close()
+
+    def _tomar(self):
+        try:
+            conexion = self._libres.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                nueva = self._abiertas < self.tamano
+                if nueva:
+                    self._abiertas += 1
+            if not nueva:
+                # Todas ocupadas: esperar a que se libere una
+                try:
+                    conexion = self._libres.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError("Todas las conexiones SMTP del pool están ocupadas")
+            else:
+                try:
+                    return self._abrir()
+                except Exception:
+                    with self._lock:
+                        self._abiertas -= 1
+                    raise
+
+        if time.monotonic() - conexion.usada_en > self.keepalive:
+            try:
+                if conexion.smtp.noop()[0] != 250:
+                    raise smtplib.SMTPServerDisconnected("NOOP rechazado")
+            except ERRORES_DE_CONEXION:
+                conexion.smtp.close()
+                conexion = self._reabrir()
+        return conexion
+
+    def _reabrir(self):
+        try:
+            return self._abrir()
+        except Exception:
+            with self._lock:
+                self._abiertas -= 1
+            raise
+
+    def _devolver(self, conexion):
+        conexion.usada_en = time.monotonic()
+        if self._cerrado or conexion.enviados >= self.max_envios:
+            self._cerrar(conexion)
+            with self._lock:
+                self._abiertas -= 1
+        else:
+            self._libres.put(conexion)
+
+    @contextmanager
+    def conexion(self):
+        """Conexión SMTP del pool (``smtplib.SMTP``)"""
+        conexion = self._tomar()
+        try:
+            yield conexion
+        except ERRORES_DE_CONEXION:
+            # Conexión rota: se descarta y el hueco queda libre para una nueva
+            conexion.smtp.close()
+            with self._lock:
+                self._abiertas -= 1
+            raise
+        except Exception:
+            self._devolver(conexion)
+            raise
+        else:
+            self._devolver(conexion)
+
+    def enviar(self, mensaje):
+        """Envía un ``EmailMessage``; si la conexión estaba rota reintenta una vez con otra"""
+        for intento in range(2):
+            try:
+                with self.conexion() as conexion:
+                    conexion.smtp.send_message(mensaje)
+                    conexion.enviados += 1
+                    return
+            except ERRORES_DE_CONEXION:
+                if intento == 1:
+                    raise
+
+    def cerrar(self):
+        self._cerrado = True
+        while True:
+            try:
+                conexion = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._cerrar(conexion)
+            with self._lock:
+                self._abiertas -= 1
@@ -0,0 +1,175 @@
+"""
+Métricas del consumer en formato de texto de Prometheus.
+
+Se sirven en ``http://<host>:<METRICAS_PUERTO>/metrics`` desde un hilo aparte
+(sin dependencias, solo la biblioteca estándar):
+
+- ``notificaciones_mensajes_total`` / ``notificaciones_errores_total`` por topic
+- ``notificaciones_mensajes_por_segundo``: ritmo de la última ventana (60 s)
+- ``notificaciones_procesamiento_segundos``: histograma por mensaje
+- ``notificaciones_latencia_extremo_segundos``: de ``producido_en`` (cuando el
+  servicio de origen generó el evento) hasta que terminó de procesarse
+- ``notificaciones_lag``: mensajes por partición entre el último offset
+  confirmado y el final de la partición
+
+El consumer de Kafka no es seguro entre hilos, así que el lag no se consulta
+al exponer: el motor lo actualiza desde su propio hilo después de cada lote.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict, deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+BUCKETS_PROCESAMIENTO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900)
+VENTANA_RITMO = 60
+
+
+def _etiquetas(etiquetas):
+    if not etiquetas:
+        return ""
+    pares = ",".join(f'{clave}="{str(valor)}"' for clave, valor in etiquetas)
+    return "{" + pares + "}"
+
+
+class _Histograma:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.conteos = [0] * (len(buckets) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.conteos[bisect_left(self.buckets, valor)] += 1
+        self.suma += valor
+        self.total += 1
+
+    def lineas(self, nombre, etiquetas):
+        acumulado = 0
+        for limite, conteo in zip(self.buckets, self.conteos):
+            acumulado += conteo
+            yield f"{nombre}_bucket{_etiquetas(etiquetas + (('le', limite),))} {acumulado}"
+        yield f"{nombre}_bucket{_etiquetas(etiquetas + (('le', '+Inf'),))} {self.total}"
+        yield f"{nombre}_sum{_etiquetas(etiquetas)} {self.suma}"
+        yield f"{nombre}_count{_etiquetas(etiquetas)} {self.total}"
+
+
+class Metricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.mensajes = defaultdict(int)
+        self.errores = defaultdict(int)
+        self.procesamiento = defaultdict(lambda: _Histograma(BUCKETS_PROCESAMIENTO))
+        self.latencia = defaultdict(lambda: _Histograma(BUCKETS_LATENCIA))
+        self.lag = {}
+        self._ventana = deque()
+
+    def observar_mensaje(self, registro, segundos, ok):
+        """Lo llama el motor por cada mensaje, al terminar de procesarlo"""
+        etiquetas = (("topic", registro.topic),)
+        latencia = _latencia_extremo(registro.value)
+        with self._lock:
+            self.mensajes[etiquetas] += 1
+            if not ok:
+                self.errores[etiquetas] += 1
+            self.procesamiento[etiquetas].observar(segundos)
+            if latencia is not None:
+                self.latencia[etiquetas].observar(latencia)
+
+    def observar_lote(self, cantidad):
+        ahora = time.monotonic()
+        with self._lock:
+            self._ventana.append((ahora, cantidad))
+            while self._ventana and self._ventana[0][0] < ahora - VENTANA_RITMO:
+                self._ventana.popleft()
+
+    def actualizar_lag(self, consumer, confirmados):
+        """
+        ``confirmados``: ``{TopicPartition: offset}`` que lleva el motor. El final
+        de la partición sale de lo que ya trajo el fetch (``highwater``), sin
+        pedírselo al broker; para una partición recién asignada se pregunta una
+        vez por su offset confirmado.
+        """
+        lag = {}
+        for tp in consumer.assignment():
+            final = consumer.highwater(tp)
+            if final is None:
+                continue
+            if tp not in confirmados:
+                confirmado = consumer.committed(tp)
+                if confirmado is None:
+                    continue
+                confirmados[tp] = confirmado
+            lag[(("topic", tp.topic), ("partition", tp.partition))] = max(0, final - confirmados[tp])
+        with self._lock:
+            self.lag = lag
+
+    def exponer(self):
+        ahora = time.monotonic()
+        lineas = []
+        with self._lock:
+            recientes = sum(cantidad for momento, cantidad in self._ventana if momento >= ahora - VENTANA_RITMO)
+
+            lineas += ["# HELP notificaciones_mensajes_total Mensajes procesados.",
+                       "# TYPE notificaciones_mensajes_total counter"]
+            lineas += [f"notificaciones_mensajes_total{_etiquetas(e)} {v}" for e, v in self.mensajes.items()]
+
+            lineas += ["# HELP notificaciones_errores_total Mensajes descartados tras agotar los reintentos.",
+                       "# TYPE notificaciones_errores_total counter"]
+            lineas += [f"notificaciones_errores_total{_etiquetas(e)} {v}" for e, v in self.errores.items()]
+
+            lineas += ["# HELP notificaciones_mensajes_por_segundo Ritmo de procesamiento del último minuto.",
+                       "# TYPE notificaciones_mensajes_por_segundo gauge",
+                       f"notificaciones_mensajes_por_segundo {recientes / VENTANA_RITMO}"]
+
+            lineas += ["# HELP notificaciones_procesamiento_segundos Tiempo de procesamiento por mensaje.",
+                       "# TYPE notificaciones_procesamiento_segundos histogram"]
+            for e, histograma in self.procesamiento.items():
+                lineas += histograma.lineas("notificaciones_procesamiento_segundos", e)
+
+            lineas += ["# HELP notificaciones_latencia_extremo_segundos Desde que se produjo el evento hasta procesarlo.",
+                       "# TYPE notificaciones_latencia_extremo_segundos histogram"]
+            for e, histograma in self.latencia.items():
+                lineas += histograma.lineas("notificaciones_latencia_extremo_segundos", e)
+
+            lineas += ["# HELP notificaciones_lag Mensajes pendientes por partición (final - confirmado).",
+                       "# TYPE notificaciones_lag gauge"]
+            lineas += [f"notificaciones_lag{_etiquetas(e)} {v}" for e, v in self.lag.items()]
+        return "\n".join(lineas) + "\n"
+
+    def servir(self, puerto, host="0.0.0.0"):
+        """Sirve ``/metrics`` en un hilo daemon; devuelve el servidor"""
+        metricas = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != "/metrics":
+                    self.send_error(404)
+                    return
+                cuerpo = metricas.exponer().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        servidor = ThreadingHTTPServer((host, puerto), Manejador)
+        threading.Thread(target=servidor.serve_forever, name="metricas", daemon=True).start()
+        return servidor
+
+
+def _latencia_extremo(valor):
+    if not isinstance(valor, dict) or not valor.get("producido_en"):
+        return None
+    try:
+        producido = datetime.fromisoformat(valor["producido_en"])
+    except (TypeError, ValueError):
+        return None
+    if producido.tzinfo is None:
+        producido = producido.replace(tzinfo=timezone.utc)
+    return max(0.0, (datetime.now(timezone.utc) - producido).total_seconds())
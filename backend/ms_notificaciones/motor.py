@@ -0,0 +1,202 @@
+"""
+Motor de consumo por lotes para ms_notificaciones.
+
+- Lee lotes con ``poll(max_records=...)`` en vez de mensaje por mensaje.
+- Reparte el lote entre un pool acotado de hilos por "carril": todos los
+  mensajes de una misma clave (y partición) van al mismo carril y se procesan
+  en orden; carriles distintos corren en paralelo.
+- Confirma los offsets a mano y solo cuando el lote completo terminó, así que
+  nunca se confirma un mensaje sin procesar (entrega al menos una vez).
+- Se detiene limpio con SIGINT/SIGTERM: termina el lote en curso, confirma y
+  cierra. En un rebalanceo no hay trabajo a medias: el poll (donde ocurre el
+  rebalanceo) solo se llama entre lotes.
+- Con ``por_grupos=True`` ``procesar`` recibe una lista de registros y
+  devuelve una lista alineada de errores (``None`` si salió bien): los carriles
+  se reparten en un grupo por trabajador (cada clave entera en un solo grupo y
+  en orden) y cada grupo se procesa de una vez, p. ej. un envío de correos por
+  lote. Se reintentan juntos los que fallaron y, de su misma clave, todos los
+  que venían detrás del primer fallo (aunque hayan salido bien), para que la
+  última vez que se procesa cada mensaje respete el orden de su clave.
+- Un mensaje que sigue fallando tras ``reintentos`` se entrega a
+  ``al_descartar(registro, error)`` (p. ej. para mandarlo a un topic de
+  descartados) antes de confirmar su offset. Si ``al_descartar`` falla, el lote
+  no se confirma y el motor se detiene: el mensaje se vuelve a leer al reiniciar.
+  Sin ``al_descartar`` solo se registra en el log.
+- Con ``metricas`` (ver ``metricas.py``) reporta cada mensaje procesado y, tras
+  cada confirmación, el lag por partición.
+"""
+import logging
+import signal
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from kafka import ConsumerRebalanceListener
+from kafka.errors import CommitFailedError
+from kafka.structs import OffsetAndMetadata
+
+logger = logging.getLogger("notificaciones.motor")
+
+
+class _Oyente(ConsumerRebalanceListener):
+    def __init__(self, motor):
+        self.motor = motor
+
+    def on_partitions_revoked(self, revoked):
+        # Confirmar lo procesado antes de ceder las particiones
+        self.motor.confirmar()
+        # Si vuelven a asignarse, su offset confirmado se vuelve a leer del broker
+        for tp in revoked:
+            self.motor.confirmados.pop(tp, None)
+        if revoked:
+            logger.info("Particiones revocadas: %s", sorted((tp.topic, tp.partition) for tp in revoked))
+
+    def on_partitions_assigned(self, assigned):
+        if assigned:
+            logger.info("Particiones asignadas: %s", sorted((tp.topic, tp.partition) for tp in assigned))
+
+
+class MotorConsumo:
+    def __init__(self, consumer, procesar, max_records=500, trabajadores=8,
+                 timeout_ms=1000, reintentos=3, espera_reintento=0.5, metricas=None, al_descartar=None,
+                 por_grupos=False):
+        self.consumer = consumer
+        self.procesar = procesar
+        self.max_records = max_records
+        self.timeout_ms = timeout_ms
+        self.reintentos = reintentos
+        self.espera_reintento = espera_reintento
+        self.metricas = metricas
+        self.al_descartar = al_descartar
+        self.por_grupos = por_grupos
+        self.trabajadores = trabajadores
+        self.pool = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="notificaciones")
+        self.detenido = threading.Event()
+        # Offsets procesados y aún sin confirmar: {TopicPartition: OffsetAndMetadata}
+        self._pendientes = {}
+        # Último offset confirmado por partición (para el lag): {TopicPartition: int}
+        self.confirmados = {}
+
+    def oyente(self):
+        """Listener de rebalanceo para ``consumer.subscribe(..., listener=...)``"""
+        return _Oyente(self)
+
+    def instalar_senales(self):
+        signal.signal(signal.SIGINT, lambda *_: self.detener())
+        signal.signal(signal.SIGTERM, lambda *_: self.detener())
+
+    def detener(self):
+        self.detenido.set()
+
+    def ejecutar(self):
+        try:
+            while not self.detenido.is_set():
+                lote = self.consumer.poll(timeout_ms=self.timeout_ms, max_records=self.max_records)
+                if lote:
+                    self.procesar_lote(lote)
+                    self.confirmar()
+                if self.metricas is not None:
+                    self.metricas.actualizar_lag(self.consumer, self.confirmados)
+        finally:
+            self.confirmar()
+            self.pool.shutdown(wait=True)
+            self.consumer.close(autocommit=False)
+
+    def procesar_lote(self, lote):
+        """Procesa ``{TopicPartition: [registros]}`` y deja sus offsets listos para confirmar"""
+        carriles = OrderedDict()
+        for tp, registros in lote.items():
+            for registro in registros:
+                # Sin clave, el orden que se respeta es el de la partición
+                carriles.setdefault((tp, registro.key), []).append(registro)
+
+        if self.por_grupos:
+            grupos = [[] for _ in range(min(self.trabajadores, len(carriles)))]
+            for numero, registros in enumerate(carriles.values()):
+                grupos[numero % len(grupos)].extend(registros)
+            tareas = [self.pool.submit(self._grupo, registros) for registros in grupos]
+        else:
+            tareas = [self.pool.submit(self._carril, registros) for registros in carriles.values()]
+
+        # Esperar a todos los carriles antes de avanzar offsets
+        for futuro in tareas:
+            futuro.result()
+
+        if self.metricas is not None:
+            self.metricas.observar_lote(sum(len(registros) for registros in lote.values()))
+
+        for tp, registros in lote.items():
+            ultimo = registros[-1]
+            self._pendientes[tp] = OffsetAndMetadata(ultimo.offset + 1, "", ultimo.leader_epoch)
+
+    def _carril(self, registros):
+        for registro in registros:
+            inicio = time.perf_counter()
+            ok = False
+            for intento in range(self.reintentos + 1):
+                try:
+                    self.procesar(registro)
+                    ok = True
+                    break
+                except Exception as e:
+                    if intento == self.reintentos:
+                        # No bloquear la partición para siempre: se aparta y se sigue
+                        self.descartar(registro, e)
+                    else:
+                        time.sleep(self.espera_reintento * 2 ** intento)
+            if self.metricas is not None:
+                self.metricas.observar_mensaje(registro, time.perf_counter() - inicio, ok)
+
+    def _grupo(self, registros):
+        inicio = time.perf_counter()
+        pendientes = registros
+        for intento in range(self.reintentos + 1):
+            try:
+                errores = self.procesar(pendientes)
+            except Exception as e:
+                errores = [e] * len(pendientes)
+            fallidos = [(registro, error) for registro, error in zip(pendientes, errores) if error is not None]
+            ultimo = intento == self.reintentos
+            # Carriles con un fallo: desde él, todo su carril se vuelve a mandar
+            atorados = set()
+            repetir = []
+            for registro, error in zip(pendientes, errores):
+                carril = (registro.topic, registro.partition, registro.key)
+                if error is not None:
+                    atorados.add(carril)
+                if carril in atorados and not ultimo:
+                    repetir.append(registro)
+                elif error is None and self.metricas is not None:
+                    self.metricas.observar_mensaje(registro, time.perf_counter() - inicio, True)
+            if not fallidos:
+                return
+            if not ultimo:
+                time.sleep(self.espera_reintento * 2 ** intento)
+                pendientes = repetir
+
+        for registro, error in fallidos:
+            self.descartar(registro, error)
+            if self.metricas is not None:
+                self.metricas.observar_mensaje(registro, time.perf_counter() - inicio, False)
+
+    def descartar(self, registro, error):
+        logger.error(
+            "Descartado %s[%s]@%s tras %s intentos: %r",
+            registro.topic, registro.partition, registro.offset, self.reintentos + 1, error,
+        )
+        if self.al_descartar is not None:
+            # Si falla se propaga: el lote no se confirma
+            self.al_descartar(registro, error)
+
+    def confirmar(self):
+        if not self._pendientes:
+            return
+        offsets, self._pendientes = self._pendientes, {}
+        try:
+            self.consumer.commit(offsets)
+            self.confirmados.update((tp, meta.offset) for tp, meta in offsets.items())
+        except CommitFailedError as e:
+            # Rebalanceo en medio: el nuevo dueño reprocesará esos mensajes
+            logger.warning("No se pudieron confirmar los offsets: %s", e)
+
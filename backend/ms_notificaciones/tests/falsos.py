@@ -0,0 +1,55 @@
+"""Consumer de Kafka en memoria para probar el motor sin broker"""
+from collections import defaultdict, namedtuple
+
+from kafka.structs import TopicPartition
+
+Registro = namedtuple("Registro", "topic partition offset key value leader_epoch")
+
+
+class ConsumerEnMemoria:
+    """
+    ``mensajes``: lista de ``(particion, clave, valor)``. Entrega lotes con
+    ``poll`` y guarda lo confirmado; al quedarse sin mensajes detiene al motor.
+    """
+
+    def __init__(self, mensajes, topic="pruebas"):
+        self.colas = defaultdict(list)
+        for particion, clave, valor in mensajes:
+            tp = TopicPartition(topic, particion)
+            self.colas[tp].append(Registro(topic, particion, len(self.colas[tp]), clave, valor, -1))
+        self.posiciones = dict.fromkeys(self.colas, 0)
+        self.confirmados = {}
+        self.commits = []
+        self.motor = None
+        self.cerrado = False
+
+    def poll(self, timeout_ms=0, max_records=500):
+        lote = {}
+        restantes = max_records
+        for tp, cola in self.colas.items():
+            registros = cola[self.posiciones[tp]:self.posiciones[tp] + restantes]
+            if registros:
+                lote[tp] = registros
+                self.posiciones[tp] += len(registros)
+                restantes -= len(registros)
+            if not restantes:
+                break
+        if not lote and self.motor is not None:
+            self.motor.detener()
+        return lote
+
+    def commit(self, offsets):
+        self.commits.append({tp: meta.offset for tp, meta in offsets.items()})
+        self.confirmados.update(self.commits[-1])
+
+    def assignment(self):
+        return set(self.colas)
+
+    def highwater(self, tp):
+        return len(self.colas[tp])
+
+    def committed(self, tp):
+        return self.confirmados.get(tp)
+
+    def close(self, autocommit=True):
+        self.cerrado = True
@@ -0,0 +1,224 @@
+import smtplib
+import socket
+import threading
+import unittest
+from email import message_from_bytes
+from email.header import decode_header, make_header
+from unittest import mock
+
+from aiosmtpd.controller import Controller
+
+from consumer import procesar_usuarios_creados
+from correo import Despachador, LimitadorPorDominio, PoolSMTP
+
+from .falsos import Registro
+
+
+def _puerto_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Receptor:
+    """SMTP de prueba: cuenta conexiones (EHLO) y guarda lo recibido"""
+
+    def __init__(self):
+        self.saludos = 0
+        self.recibidos = []
+        self.rechazar = set()
+        self.cortar_datos = 0
+        self._lock = threading.Lock()
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        with self._lock:
+            self.saludos += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address in self.rechazar:
+            return "550 Buzón inexistente"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        with self._lock:
+            if self.cortar_datos:
+                self.cortar_datos -= 1
+                return "421 Cerrando la conexión"
+            self.recibidos.append((envelope.rcpt_tos[0], message_from_bytes(envelope.content)))
+        return "250 OK"
+
+    def destinatarios(self):
+        return [destinatario for destinatario, _ in self.recibidos]
+
+
+class CorreoTestCase(unittest.TestCase):
+    def setUp(self):
+        self.receptor = Receptor()
+        self.controlador = Controller(self.receptor, hostname="127.0.0.1", port=_puerto_libre())
+        self.controlador.start()
+        self.addCleanup(self.apagar)
+
+    def apagar(self):
+        if self.controlador.server is not None:
+            self.controlador.stop()
+
+    def pool(self, **opciones):
+        pool = PoolSMTP("127.0.0.1", self.controlador.port, timeout=5, **opciones)
+        self.addCleanup(pool.cerrar)
+        return pool
+
+    def despachador(self, pool=None, limitador=None):
+        return Despachador(
+            pool or self.pool(tamano=2),
+            limitador or LimitadorPorDominio(tasa=1e6, rafaga=10**6),
+            "no-responder@acaclick.mx",
+        )
+
+
+class PoolTests(CorreoTestCase):
+    def test_reutiliza_conexiones(self):
+        despachador = self.despachador()
+        for i in range(5):
+            despachador.enviar("bienvenida", f"u{i}@example.com", {"nombre": "Ana", "apellido_paterno": "L", "correo": "x"})
+        self.assertEqual(len(self.receptor.recibidos), 5)
+        self.assertEqual(self.receptor.saludos, 1)
+
+    def test_no_pasa_del_tamano(self):
+        despachador = self.despachador(self.pool(tamano=2))
+        contexto = {"nombre": "Ana", "apellido_paterno": "L", "correo": "x"}
+        hilos = [
+            threading.Thread(target=lambda i=i: [
+                despachador.enviar("bienvenida", f"u{i}-{j}@example.com", contexto) for j in range(5)
+            ])
+            for i in range(6)
+        ]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(len(self.receptor.recibidos), 30)
+        self.assertLessEqual(self.receptor.saludos, 2)
+
+    def test_reconecta_si_la_conexion_ociosa_murio(self):
+        pool = self.pool(tamano=1, keepalive=0)
+        despachador = self.despachador(pool)
+        contexto = {"nombre": "Ana", "apellido_paterno": "L", "correo": "x"}
+        despachador.enviar("bienvenida", "a@example.com", contexto)
+        # El servidor (o un firewall) cortó la conexión mientras estaba en el pool
+        with pool.conexion() as conexion:
+            conexion.smtp.sock.shutdown(socket.SHUT_RDWR)
+        despachador.enviar("bienvenida", "b@example.com", contexto)
+        self.assertEqual(self.receptor.destinatarios(), ["a@example.com", "b@example.com"])
+        self.assertEqual(self.receptor.saludos, 2)
+
+    def test_plantilla(self):
+        self.despachador().enviar(
+            "bienvenida", "ana@example.com", {"nombre": "Ana <b>", "apellido_paterno": "López", "correo": "ana@example.com"},
+        )
+        _, mensaje = self.receptor.recibidos[0]
+        self.assertEqual(str(make_header(decode_header(mensaje["Subject"]))), "¡Bienvenido a AcaClick, Ana <b>!")
+        html = next(parte for parte in mensaje.walk() if parte.get_content_type() == "text/html")
+        self.assertIn("Ana &lt;b&gt;", html.get_payload(decode=True).decode())
+
+
+class EnvioPorLotesTests(CorreoTestCase):
+    def envios(self, *destinatarios):
+        return [
+            ("bienvenida", destinatario, {"nombre": "N", "apellido_paterno": "A", "correo": destinatario})
+            for destinatario in destinatarios
+        ]
+
+    def test_una_conexion_por_lote_y_errores_alineados(self):
+        self.receptor.rechazar.add("nadie@example.com")
+        errores = self.despachador(self.pool(tamano=1)).enviar_lote(self.envios(
+            "a@example.com", "nadie@example.com", "b@otro.mx", "c@example.com",
+        ))
+        self.assertIsNone(errores[0])
+        self.assertIsInstance(errores[1], smtplib.SMTPRecipientsRefused)
+        self.assertEqual(errores[2:], [None, None])
+        self.assertEqual(sorted(self.receptor.destinatarios()), ["a@example.com", "b@otro.mx", "c@example.com"])
+        self.assertEqual(self.receptor.saludos, 1)
+
+    def test_conexion_cortada_a_mitad_del_lote(self):
+        self.receptor.cortar_datos = 1
+        errores = self.despachador(self.pool(tamano=1)).enviar_lote(
+            self.envios("a@example.com", "b@example.com", "c@example.com")
+        )
+        # El que recibió el 421 falla; el resto sale por una conexión nueva
+        self.assertIsInstance(errores[0], smtplib.SMTPDataError)
+        self.assertEqual(errores[1:], [None, None])
+        self.assertEqual(self.receptor.destinatarios(), ["b@example.com", "c@example.com"])
+        self.assertEqual(self.receptor.saludos, 2)
+
+    def test_servidor_caido(self):
+        despachador = self.despachador()
+        self.apagar()
+        errores = despachador.enviar_lote(self.envios("a@example.com"))
+        self.assertIsInstance(errores[0], smtplib.SMTPServerDisconnected)
+
+    def test_consumer_manda_el_grupo_por_lote(self):
+        registros = [
+            Registro("usuarios.creados", 0, 0, "1", {"correo": "ana@example.com", "nombre": "Ana"}, -1),
+            Registro("usuarios.creados", 0, 1, "2", {"nombre": "Sin correo"}, -1),
+            Registro("usuarios.creados", 0, 2, "3", {"correo": "nadie@example.com"}, -1),
+        ]
+        self.receptor.rechazar.add("nadie@example.com")
+        despachador = self.despachador()
+        with mock.patch.object(despachador, "enviar", side_effect=AssertionError("no debe enviar uno por uno")), \
+                mock.patch("builtins.print"):
+            errores = procesar_usuarios_creados(registros, despachador)
+        self.assertIsNone(errores[0])
+        self.assertIsNone(errores[1])
+        self.assertIsInstance(errores[2], smtplib.SMTPRecipientsRefused)
+        self.assertEqual(self.receptor.destinatarios(), ["ana@example.com"])
+
+
+class LimitadorTests(unittest.TestCase):
+    def setUp(self):
+        self.reloj = 1000.0
+        self.esperas = []
+
+        def dormir(segundos):
+            self.esperas.append(round(segundos, 6))
+            self.reloj += segundos
+
+        parche = mock.patch("correo.limites.time")
+        tiempo = parche.start()
+        self.addCleanup(parche.stop)
+        tiempo.monotonic.side_effect = lambda: self.reloj
+        tiempo.sleep.side_effect = dormir
+
+    def test_rafaga_y_tasa_por_dominio(self):
+        limitador = LimitadorPorDominio(tasa=2, rafaga=3)
+        for _ in range(3):
+            limitador.esperar("gmail.com")
+        self.assertEqual(self.esperas, [])
+        # Sin fichas: a 2 por segundo, medio segundo por correo
+        limitador.esperar("gmail.com")
+        limitador.esperar("GMAIL.com")
+        self.assertEqual(self.esperas, [0.5, 0.5])
+        # Otro dominio tiene su propia cubeta
+        limitador.esperar("outlook.com")
+        self.assertEqual(len(self.esperas), 2)
+
+    def test_rellena_hasta_la_rafaga(self):
+        limitador = LimitadorPorDominio(tasa=1, rafaga=2, tasas={"lento.mx": 0.5})
+        limitador.esperar("ejemplo.mx")
+        limitador.esperar("ejemplo.mx")
+        self.reloj += 60
+        # Tras un minuto solo hay `rafaga` fichas, no 60
+        for _ in range(3):
+            limitador.esperar("ejemplo.mx")
+        self.assertEqual(self.esperas, [1.0])
+
+        limitador.esperar("lento.mx")
+        limitador.esperar("lento.mx")
+        limitador.esperar("lento.mx")
+        self.assertEqual(self.esperas, [1.0, 2.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
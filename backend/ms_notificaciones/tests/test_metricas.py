@@ -0,0 +1,100 @@
+import unittest
+import urllib.error
+import urllib.request
+from datetime import datetime, timedelta, timezone
+
+from kafka.structs import TopicPartition
+
+from metricas import Metricas
+from motor import MotorConsumo
+
+from .falsos import ConsumerEnMemoria, Registro
+
+
+def _valor(texto, linea):
+    """Valor de la primera línea que empieza con ``linea``"""
+    for renglon in texto.splitlines():
+        if renglon.startswith(linea + " "):
+            return float(renglon.rsplit(" ", 1)[1])
+    raise AssertionError(f"No está {linea!r} en:\n{texto}")
+
+
+class MetricasTests(unittest.TestCase):
+    def test_exposicion(self):
+        metricas = Metricas()
+        hace_dos = (datetime.now(timezone.utc) - timedelta(seconds=2)).isoformat()
+        registro = Registro("usuarios.creados", 0, 0, "1", {"producido_en": hace_dos}, -1)
+        metricas.observar_mensaje(registro, 0.02, True)
+        metricas.observar_mensaje(registro._replace(value={}), 0.3, False)
+        metricas.observar_lote(2)
+
+        texto = metricas.exponer()
+        topic = '{topic="usuarios.creados"}'
+        self.assertIn("# TYPE notificaciones_mensajes_total counter", texto)
+        self.assertEqual(_valor(texto, f"notificaciones_mensajes_total{topic}"), 2)
+        self.assertEqual(_valor(texto, f"notificaciones_errores_total{topic}"), 1)
+        self.assertAlmostEqual(_valor(texto, "notificaciones_mensajes_por_segundo"), 2 / 60)
+
+        # Histograma acumulado
+        base = 'notificaciones_procesamiento_segundos_bucket{topic="usuarios.creados",le='
+        self.assertEqual(_valor(texto, base + '"0.01"}'), 0)
+        self.assertEqual(_valor(texto, base + '"0.025"}'), 1)
+        self.assertEqual(_valor(texto, base + '"0.5"}'), 2)
+        self.assertEqual(_valor(texto, base + '"+Inf"}'), 2)
+        self.assertAlmostEqual(_valor(texto, f"notificaciones_procesamiento_segundos_sum{topic}"), 0.32)
+
+        # Solo el mensaje con producido_en cuenta para la latencia de extremo a extremo
+        latencia = 'notificaciones_latencia_extremo_segundos'
+        self.assertEqual(_valor(texto, f"{latencia}_count{topic}"), 1)
+        self.assertEqual(_valor(texto, f'{latencia}_bucket{{topic="usuarios.creados",le="1"}}'), 0)
+        self.assertEqual(_valor(texto, f'{latencia}_bucket{{topic="usuarios.creados",le="2.5"}}'), 1)
+
+    def test_endpoint(self):
+        metricas = Metricas()
+        servidor = metricas.servir(0, host="127.0.0.1")
+        self.addCleanup(servidor.server_close)
+        self.addCleanup(servidor.shutdown)
+        url = f"http://127.0.0.1:{servidor.server_address[1]}"
+        with urllib.request.urlopen(url + "/metrics", timeout=5) as respuesta:
+            self.assertEqual(respuesta.status, 200)
+            self.assertTrue(respuesta.headers["Content-Type"].startswith("text/plain; version=0.0.4"))
+            self.assertIn("notificaciones_lag", respuesta.read().decode())
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(url + "/otra", timeout=5)
+        self.assertEqual(error.exception.code, 404)
+
+
+class LagTests(unittest.TestCase):
+    def setUp(self):
+        self.consumer = ConsumerEnMemoria([(0, "a", i) for i in range(10)] + [(1, "b", i) for i in range(4)])
+        self.p0, self.p1 = TopicPartition("pruebas", 0), TopicPartition("pruebas", 1)
+        self.metricas = Metricas()
+
+    def lag(self):
+        texto = self.metricas.exponer()
+        return {
+            particion: _valor(texto, f'notificaciones_lag{{topic="pruebas",partition="{particion}"}}')
+            for particion in (0, 1)
+        }
+
+    def test_lag_con_confirmados_y_del_broker(self):
+        # p1 no la ha confirmado este proceso: se pregunta una vez al broker
+        self.consumer.confirmados[self.p1] = 1
+        self.metricas.actualizar_lag(self.consumer, {self.p0: 6})
+        self.assertEqual(self.lag(), {0: 4, 1: 3})
+
+    def test_revocar_olvida_los_confirmados(self):
+        motor = MotorConsumo(self.consumer, lambda registro: None, timeout_ms=0)
+        self.addCleanup(motor.pool.shutdown)
+        motor.confirmados.update({self.p0: 2, self.p1: 1})
+        motor.oyente().on_partitions_revoked({self.p0})
+        self.assertEqual(motor.confirmados, {self.p1: 1})
+
+        # Otro miembro avanzó p0 mientras no era nuestra; al volver se lee lo que él confirmó
+        self.consumer.confirmados[self.p0] = 9
+        self.metricas.actualizar_lag(self.consumer, motor.confirmados)
+        self.assertEqual(self.lag(), {0: 1, 1: 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
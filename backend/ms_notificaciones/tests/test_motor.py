@@ -0,0 +1,175 @@
+import random
+import threading
+import time
+import unittest
+from collections import defaultdict
+
+from motor import MotorConsumo
+
+from .falsos import ConsumerEnMemoria
+
+
+def motor_para(consumer, procesar, **opciones):
+    opciones.setdefault("espera_reintento", 0)
+    motor = MotorConsumo(consumer, procesar, timeout_ms=0, **opciones)
+    consumer.motor = motor
+    return motor
+
+
+class MotorTests(unittest.TestCase):
+    def test_orden_por_clave(self):
+        mensajes = [(i % 3, f"usuario-{i % 7}", i) for i in range(300)]
+        consumer = ConsumerEnMemoria(mensajes)
+        vistos = defaultdict(list)
+        lock = threading.Lock()
+
+        def procesar(registro):
+            # Carriles con tiempos distintos: solo el orden dentro de cada clave está garantizado
+            time.sleep(random.random() / 2000)
+            with lock:
+                vistos[(registro.partition, registro.key)].append(registro.value)
+
+        motor_para(consumer, procesar, max_records=50, trabajadores=8).ejecutar()
+
+        esperados = defaultdict(list)
+        for particion, clave, valor in mensajes:
+            esperados[(particion, clave)].append(valor)
+        self.assertEqual(vistos, esperados)
+        self.assertTrue(consumer.cerrado)
+
+    def test_confirma_solo_lotes_completos(self):
+        consumer = ConsumerEnMemoria([(0, f"k{i % 4}", i) for i in range(40)])
+        adelantados = []
+
+        def procesar(registro):
+            # Mientras se procesa un mensaje, su offset no puede estar confirmado
+            tp = next(iter(consumer.colas))
+            if consumer.confirmados.get(tp, 0) > registro.offset:
+                adelantados.append(registro.offset)
+
+        motor_para(consumer, procesar, max_records=10, trabajadores=4).ejecutar()
+        self.assertEqual(adelantados, [])
+        # Un commit por lote, cada uno justo al final del lote
+        self.assertEqual([list(commit.values()) for commit in consumer.commits], [[10], [20], [30], [40]])
+
+    def test_reintenta_y_sigue(self):
+        consumer = ConsumerEnMemoria([(0, "a", 1), (0, "a", 2)])
+        intentos = defaultdict(int)
+
+        def procesar(registro):
+            intentos[registro.value] += 1
+            if registro.value == 1 and intentos[1] < 3:
+                raise ConnectionError("SMTP caído")
+
+        descartados = []
+        motor_para(consumer, procesar, reintentos=3,
+                   al_descartar=lambda registro, error: descartados.append(registro)).ejecutar()
+        self.assertEqual(dict(intentos), {1: 3, 2: 1})
+        self.assertEqual(descartados, [])
+        self.assertEqual(consumer.confirmados, {next(iter(consumer.colas)): 2})
+
+    def test_descartado_se_aparta_antes_de_confirmar(self):
+        consumer = ConsumerEnMemoria([(0, "a", 1), (0, "a", 2)])
+        procesados, descartados = [], []
+
+        def procesar(registro):
+            if registro.value == 1:
+                raise ValueError("mensaje inválido")
+            procesados.append(registro.value)
+
+        def al_descartar(registro, error):
+            # Todavía sin confirmar cuando se aparta
+            descartados.append((registro.value, type(error), dict(consumer.confirmados)))
+
+        with self.assertLogs("notificaciones.motor", "ERROR"):
+            motor_para(consumer, procesar, reintentos=2, al_descartar=al_descartar).ejecutar()
+        self.assertEqual(descartados, [(1, ValueError, {})])
+        self.assertEqual(procesados, [2])
+        self.assertEqual(list(consumer.confirmados.values()), [2])
+
+    def test_si_no_se_puede_apartar_no_confirma(self):
+        consumer = ConsumerEnMemoria([(0, "a", 1), (0, "b", 2)])
+
+        def procesar(registro):
+            if registro.value == 1:
+                raise ValueError("mensaje inválido")
+
+        def al_descartar(registro, error):
+            raise TimeoutError("topic de descartados no disponible")
+
+        motor = motor_para(consumer, procesar, reintentos=0, al_descartar=al_descartar)
+        with self.assertLogs("notificaciones.motor", "ERROR"), self.assertRaises(TimeoutError):
+            motor.ejecutar()
+        # El lote no se confirmó: al reiniciar se vuelve a leer desde el principio
+        self.assertEqual(consumer.commits, [])
+        self.assertTrue(consumer.cerrado)
+
+
+class MotorPorGruposTests(unittest.TestCase):
+    def test_grupos_por_trabajador_con_claves_en_orden(self):
+        mensajes = [(0, f"k{i % 10}", i) for i in range(100)]
+        consumer = ConsumerEnMemoria(mensajes)
+        grupos = []
+        lock = threading.Lock()
+
+        def procesar(registros):
+            with lock:
+                grupos.append([(registro.key, registro.value) for registro in registros])
+            return [None] * len(registros)
+
+        motor_para(consumer, procesar, max_records=50, trabajadores=4, por_grupos=True).ejecutar()
+        # 2 lotes x 4 grupos; cada clave en un solo grupo por lote y en orden
+        self.assertEqual(len(grupos), 8)
+        for grupo in grupos:
+            for clave in {clave for clave, _ in grupo}:
+                valores = [valor for c, valor in grupo if c == clave]
+                self.assertEqual(valores, sorted(valores))
+        self.assertEqual(sorted(valor for grupo in grupos for _, valor in grupo), list(range(100)))
+        self.assertEqual(list(consumer.confirmados.values()), [100])
+
+    def test_reintenta_solo_los_fallidos(self):
+        consumer = ConsumerEnMemoria([(0, "a", 1), (0, "b", 2), (0, "c", 3)])
+        llamadas = []
+
+        def procesar(registros):
+            llamadas.append([registro.value for registro in registros])
+            # El 2 nunca sale; el 3 falla la primera vez
+            return [
+                ValueError("rechazado") if registro.value == 2
+                or (registro.value == 3 and len(llamadas) == 1) else None
+                for registro in registros
+            ]
+
+        descartados = []
+        with self.assertLogs("notificaciones.motor", "ERROR"):
+            motor_para(consumer, procesar, trabajadores=1, reintentos=2, por_grupos=True,
+                       al_descartar=lambda registro, error: descartados.append(registro.value)).ejecutar()
+        self.assertEqual(llamadas, [[1, 2, 3], [2, 3], [2]])
+        self.assertEqual(descartados, [2])
+        self.assertEqual(list(consumer.confirmados.values()), [3])
+
+    def test_reintento_respeta_el_orden_de_la_clave(self):
+        consumer = ConsumerEnMemoria([(0, "k", 1), (0, "k", 2), (0, "otra", 3)])
+        llamadas, procesados = [], []
+
+        def procesar(registros):
+            llamadas.append([registro.value for registro in registros])
+            # k@1 falla solo la primera vez; k@2 siempre sale bien
+            errores = [
+                ValueError("temporal") if registro.value == 1 and len(llamadas) == 1 else None
+                for registro in registros
+            ]
+            procesados.extend(
+                (registro.key, registro.value) for registro, error in zip(registros, errores) if error is None
+            )
+            return errores
+
+        motor_para(consumer, procesar, trabajadores=1, por_grupos=True).ejecutar()
+        # k@2 se repite detrás de k@1: lo último que se procesó de "k" va en orden
+        self.assertEqual(llamadas, [[1, 2, 3], [1, 2]])
+        self.assertEqual([valor for clave, valor in procesados if clave == "k"][-2:], [1, 2])
+        self.assertEqual(list(consumer.confirmados.values()), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
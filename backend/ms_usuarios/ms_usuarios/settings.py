@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -48,6 +50,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
+    "acaclick_comun.compresion.CompresionMiddleware",
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +97,26 @@ DATABASES = {
 
 
 
+# Hash de contraseñas: Argon2id si está instalado argon2-cffi, si no PBKDF2.
+# Los hashes con otro algoritmo o parámetros se rehacen en el siguiente login.
+# Sin el Argon2PasswordHasher de Django: tiene el mismo nombre ("argon2") y,
+# por ir después, reemplazaría a Argon2Ajustado al verificar
+PASSWORD_HASHERS = [
+    *(["usuarios.hashing.Argon2Ajustado"] if find_spec("argon2") else []),
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+    "django.contrib.auth.hashers.BCryptSHA256PasswordHasher",
+    "django.contrib.auth.hashers.ScryptPasswordHasher",
+]
+
+# Pool de hashing del registro y el login (usuarios/hashing.py)
+USUARIOS_HASHING = {
+    "HILOS": int(os.environ.get("HASHING_HILOS", os.cpu_count() or 2)),
+    "COLA": 64,  # en espera; más allá se responde 503
+    # Recomendación de OWASP para Argon2id: 19 MiB, 2 pasadas, 1 hilo
+    "ARGON2": {"time_cost": 2, "memory_cost": 19 * 1024, "parallelism": 1},
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,11 +169,27 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "usuarios.principal.JWTAuthenticationCacheada",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "acaclick_comun.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "acaclick_comun.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
+}
+
+# Compresión de respuestas (brotli si está instalado, si no gzip)
+COMPRESION = {
+    "UMBRAL": 1024,  # bytes; por debajo no vale la pena
+    "NIVEL_GZIP": 6,
+    "NIVEL_BROTLI": 5,
 }
 
 from datetime import timedelta
@@ -161,6 +200,8 @@ SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": False,
     "BLACKLIST_AFTER_ROTATION": False,
     "AUTH_HEADER_TYPES": ("Bearer",),
+    # Compartida con ms_negocios, que verifica los tokens localmente (NEGOCIOS_JWT)
+    "SIGNING_KEY": os.environ.get("JWT_CLAVE", SECRET_KEY),
 
     # 👇 LO IMPORTANTE PARA TU MODELO
     "USER_ID_FIELD": "id_usuario",   # nombre de tu PK en el modelo Usuario
@@ -168,3 +209,24 @@ SIMPLE_JWT = {
 }
 
 AUTH_USER_MODEL = "usuarios.Usuario"
+
+# Cache local del proceso; en producción, una compartida (Redis/Memcached)
+# para que las invalidaciones lleguen a todos los workers
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    }
+}
+
+# Usuario autenticado ya serializado (usuarios/principal.py)
+USUARIOS_PRINCIPAL = {
+    "CACHE": "default",
+    "TTL": 300,  # segundos
+}
+
+# Sesiones (usuarios/sesiones.py)
+USUARIOS_SESIONES = {
+    "INTERVALO_ACTIVIDAD": 30,  # segundos entre escrituras de ultimo_uso
+    "MAXIMO_PENDIENTES": 10000,  # o antes, si se juntan tantas
+}
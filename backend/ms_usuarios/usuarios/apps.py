@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UsuariosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'usuarios'
+
+    def ready(self):
+        # Invalida la cache del principal (principal.py) cuando cambian usuarios o roles
+        from . import senales  # noqa: F401
@@ -0,0 +1,113 @@
+"""
+Hash y verificación de contraseñas fuera del hilo de la petición.
+
+El registro y el login (vistas async en ``views.py``) mandan el trabajo caro
+(PBKDF2 o Argon2) a un pool de hilos propio y acotado, así una ráfaga de
+logins no ocupa a los workers que atienden lo demás. Tanto ``hashlib`` como
+``argon2-cffi`` sueltan el GIL mientras calculan, por eso bastan hilos.
+
+- ``USUARIOS_HASHING["HILOS"]``: hashes en paralelo por proceso.
+- ``USUARIOS_HASHING["COLA"]``: cuántos más pueden esperar turno; pasado eso
+  se lanza ``HashingSaturado`` (la vista responde 503) en vez de encolar sin fin.
+- El hasher es el primero de ``PASSWORD_HASHERS``. Al verificar, si el hash
+  guardado usa otro algoritmo o parámetros viejos se devuelve uno nuevo para
+  guardarlo (rehash transparente en el login).
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    check_password,
+    get_hasher,
+    identify_hasher,
+    make_password,
+)
+
+
+class HashingSaturado(Exception):
+    """Hay más hashes en curso y en espera de los que admite el pool"""
+
+
+class Argon2Ajustado(Argon2PasswordHasher):
+    """Argon2id con los parámetros de ``USUARIOS_HASHING["ARGON2"]``"""
+
+    @property
+    def time_cost(self):
+        return settings.USUARIOS_HASHING["ARGON2"]["time_cost"]
+
+    @property
+    def memory_cost(self):
+        return settings.USUARIOS_HASHING["ARGON2"]["memory_cost"]
+
+    @property
+    def parallelism(self):
+        return settings.USUARIOS_HASHING["ARGON2"]["parallelism"]
+
+
+_pool = None
+_cupo = None
+_lock = threading.Lock()
+
+
+def _obtener_pool():
+    global _pool, _cupo
+    if _pool is None:
+        with _lock:
+            if _pool is None:
+                config = settings.USUARIOS_HASHING
+                _cupo = threading.BoundedSemaphore(config["HILOS"] + config["COLA"])
+                _pool = ThreadPoolExecutor(config["HILOS"], thread_name_prefix="hashing")
+    return _pool, _cupo
+
+
+def _despues_del_fork():
+    # Los hilos del pool no sobreviven al fork: el hijo crea el suyo
+    global _pool, _cupo
+    _pool = _cupo = None
+
+
+os.register_at_fork(after_in_child=_despues_del_fork)
+
+
+async def _en_pool(funcion, *args):
+    pool, cupo = _obtener_pool()
+    if not cupo.acquire(blocking=False):
+        raise HashingSaturado()
+    try:
+        futuro = pool.submit(funcion, *args)
+    except BaseException:
+        cupo.release()
+        raise
+    # El cupo se libera cuando termina el hash, aunque el cliente ya se haya ido
+    futuro.add_done_callback(lambda _: cupo.release())
+    return await asyncio.wrap_future(futuro)
+
+
+def _necesita_rehash(codificado):
+    preferido = get_hasher("default")
+    try:
+        actual = identify_hasher(codificado)
+    except ValueError:
+        return False
+    return actual.algorithm != preferido.algorithm or preferido.must_update(codificado)
+
+
+def _verificar(password, codificado):
+    # Sin ``setter``: el rehash se devuelve y lo guarda la vista
+    if not check_password(password, codificado):
+        return False, None
+    return True, make_password(password) if _necesita_rehash(codificado) else None
+
+
+async def hacer_hash(password):
+    """Hash de ``password`` con el hasher preferido"""
+    return await _en_pool(make_password, password)
+
+
+async def verificar(password, codificado):
+    """``(valida, nuevo_hash)``; ``nuevo_hash`` solo si hay que actualizar el guardado"""
+    return await _en_pool(_verificar, password, codificado)
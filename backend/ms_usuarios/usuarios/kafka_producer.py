@@ -1,28 +1,147 @@
 # backend/ms_usuarios/usuarios/kafka_producer.py
+"""
+Producer de Kafka de ms_usuarios.
+
+El producer se crea en el primer uso (``get_producer()``), no al importar: así
+``manage.py``, las pruebas y el arranque de los workers no dependen del broker
+ni pagan la importación de ``kafka``. Es uno por proceso, compartido entre
+hilos, y se descarta en los procesos hijos después de un ``fork`` (sus hilos
+de red no sobreviven al fork). Los mensajes sin confirmar están acotados: al
+llegar a ``MAX_PENDIENTES`` quien envía espera hasta ``MAX_BLOQUEO_MS`` y,
+si no se libera espacio, recibe ``ProducerSaturado``.
+"""
 import json
-from kafka import KafkaProducer
+import os
+import threading
+
+from django.utils import timezone
+
+from .outbox import encolar, encolar_muchos
 
 KAFKA_BROKER_URL = "localhost:9092"
 KAFKA_TOPIC_USUARIOS_CREADOS = "usuarios.creados"
 
-producer = KafkaProducer(
-    bootstrap_servers=KAFKA_BROKER_URL,
-    value_serializer=lambda v: json.dumps(v).encode("utf-8"),
-)
+# Orden garantizado por clave: confirmación de todas las réplicas, una petición
+# en vuelo por conexión y sin duplicados en los reintentos
+PRODUCER_CONFIG = {
+    "acks": "all",
+    "enable_idempotence": True,
+    "max_in_flight_requests_per_connection": 1,
+    "retries": 5,
+    "compression_type": "gzip",
+    "linger_ms": 20,
+    # Tiempo máximo bloqueado esperando metadatos del broker en send()
+    "max_block_ms": 5000,
+}
+MAX_PENDIENTES = 10000
+MAX_BLOQUEO_MS = 5000
 
 
-def send_usuario_creado_event(user):
-    """
-    Envía al topic 'usuarios.creados' los datos del usuario recién creado.
-    """
-    payload = {
+class ProducerSaturado(Exception):
+    """Demasiados mensajes sin confirmar: el broker no da abasto o no responde"""
+
+
+def crear_producer(**opciones):
+    """Producer con la serialización de los eventos de ms_usuarios (JSON, clave como texto)"""
+    # Importar kafka cuesta ~250 ms: solo se paga quien publica
+    from kafka import KafkaProducer
+
+    return KafkaProducer(
+        bootstrap_servers=KAFKA_BROKER_URL,
+        key_serializer=lambda k: k.encode("utf-8"),
+        value_serializer=lambda v: json.dumps(v).encode("utf-8"),
+        **opciones,
+    )
+
+
+class ProducerAcotado:
+    """Envuelve un KafkaProducer limitando los mensajes sin confirmar"""
+
+    def __init__(self, producer, max_pendientes=MAX_PENDIENTES, max_bloqueo_ms=MAX_BLOQUEO_MS):
+        self.producer = producer
+        self.max_pendientes = max_pendientes
+        self.max_bloqueo = max_bloqueo_ms / 1000
+        self._cupo = threading.BoundedSemaphore(max_pendientes)
+
+    def send(self, topic, **kwargs):
+        if not self._cupo.acquire(timeout=self.max_bloqueo):
+            raise ProducerSaturado(f"Más de {self.max_pendientes} mensajes sin confirmar")
+        try:
+            futuro = self.producer.send(topic, **kwargs)
+        except Exception:
+            self._cupo.release()
+            raise
+        futuro.add_both(lambda _: self._cupo.release())
+        return futuro
+
+    def flush(self, timeout=None):
+        self.producer.flush(timeout=timeout)
+
+    def close(self, timeout=None):
+        self.producer.close(timeout=timeout)
+
+
+_producer = None
+_pid = None
+_lock = threading.Lock()
+
+
+def get_producer():
+    """Producer compartido del proceso; se crea en el primer uso"""
+    global _producer, _pid
+    # uWSGI y otros hacen fork sin pasar por os.fork(): comprobar también el pid
+    if _producer is not None and _pid == os.getpid():
+        return _producer
+    with _lock:
+        if _producer is None or _pid != os.getpid():
+            _producer = ProducerAcotado(crear_producer(**PRODUCER_CONFIG))
+            _pid = os.getpid()
+        return _producer
+
+
+def cerrar_producer(timeout=None):
+    """Envía lo pendiente y cierra el producer del proceso (si se llegó a crear)"""
+    global _producer
+    with _lock:
+        if _producer is not None and _pid == os.getpid():
+            _producer.close(timeout=timeout)
+        _producer = None
+
+
+def _despues_del_fork():
+    # El hijo hereda el objeto pero no los hilos de red del producer ni un lock
+    # que estuviera tomado en el momento del fork: empezar de cero
+    global _producer, _lock
+    _producer = None
+    _lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_despues_del_fork)
+
+
+def payload_usuario_creado(user):
+    """Cuerpo del evento 'usuarios.creados'"""
+    return {
         "id_usuario": getattr(user, "id_usuario", getattr(user, "pk", None)),
         "correo": getattr(user, "correo", None),
         "nombre": getattr(user, "nombre", None),
         "apellido_paterno": getattr(user, "apellido_paterno", None),
+        # Para medir la latencia de extremo a extremo en los consumers
+        "producido_en": timezone.now().isoformat(),
     }
 
-    print("[KAFKA] Evento usuario_creado enviado:", payload)
 
-    producer.send(KAFKA_TOPIC_USUARIOS_CREADOS, value=payload)
-    producer.flush()
+def send_usuario_creado_event(user):
+    """
+    Encola (outbox) el evento del usuario recién creado para el topic
+    'usuarios.creados'. Debe llamarse dentro de la transacción que crea al
+    usuario; el relay ``publicar_outbox`` lo envía a Kafka.
+    """
+    payload = payload_usuario_creado(user)
+    encolar(KAFKA_TOPIC_USUARIOS_CREADOS, payload["id_usuario"], payload)
+
+
+def send_usuarios_creados_events(users):
+    """Como ``send_usuario_creado_event`` para muchos usuarios, con un solo INSERT"""
+    payloads = [payload_usuario_creado(user) for user in users]
+    encolar_muchos(KAFKA_TOPIC_USUARIOS_CREADOS, [(payload["id_usuario"], payload) for payload in payloads])
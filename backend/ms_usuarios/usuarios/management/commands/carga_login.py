@@ -0,0 +1,132 @@
+import http.client
+import json
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+
+from usuarios.models import Rol, Usuario
+
+PASSWORD = "carga-login-123"
+DOMINIO = "carga.invalid"
+
+
+def _percentil(valores, p):
+    if not valores:
+        return float("nan")
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga del login contra un servidor corriendo (p. ej. uvicorn "
+        "ms_usuarios.asgi:application). Lanza logins concurrentes y, a la vez, "
+        "peticiones baratas a /me/ para ver si esperan detrás del hash. Reporta "
+        "p50/p95/p99 de cada una. Crea usuarios de prueba y los borra al final."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://127.0.0.1:8001")
+        parser.add_argument("--usuarios", type=int, default=20)
+        parser.add_argument("--concurrencia", type=int, default=32, help="Hilos haciendo login")
+        parser.add_argument("--peticiones", type=int, default=500, help="Logins en total")
+        parser.add_argument("--hilos-me", type=int, default=4, help="Hilos pidiendo /me/ durante la carga")
+
+    def handle(self, *args, **options):
+        destino = urlsplit(options["url"])
+        rol, _ = Rol.objects.get_or_create(nombre_rol="carga")
+        # Un solo hash para todos: la preparación no debe tardar más que la prueba
+        codificado = make_password(PASSWORD)
+        Usuario.objects.filter(correo__endswith=f"@{DOMINIO}").delete()
+        Usuario.objects.bulk_create([
+            Usuario(
+                username=f"carga{i}", correo=f"carga{i}@{DOMINIO}", nombre="Carga",
+                apellido_paterno="Login", password=codificado, rol=rol,
+            )
+            for i in range(options["usuarios"])
+        ])
+
+        def conexion():
+            return http.client.HTTPConnection(destino.hostname, destino.port or 80, timeout=60)
+
+        def pedir(cliente, metodo, ruta, cuerpo=None, headers=None):
+            inicio = time.perf_counter()
+            cliente.request(metodo, ruta, body=cuerpo, headers={"Content-Type": "application/json", **(headers or {})})
+            respuesta = cliente.getresponse()
+            datos = respuesta.read()
+            return respuesta.status, datos, time.perf_counter() - inicio
+
+        try:
+            estado, datos, _ = pedir(conexion(), "POST", "/api/auth/token/", json.dumps(
+                {"correo": f"carga0@{DOMINIO}", "password": PASSWORD}
+            ))
+            if estado != 200:
+                self.stderr.write(f"El login de prueba falló ({estado}): {datos[:200]!r}")
+                return
+            access = json.loads(datos)["access"]
+
+            lock = threading.Lock()
+            logins, me, codigos = [], [], {}
+            pendientes = iter(range(options["peticiones"]))
+            terminado = threading.Event()
+
+            def hacer_logins():
+                cliente = conexion()
+                while True:
+                    with lock:
+                        i = next(pendientes, None)
+                    if i is None:
+                        return
+                    cuerpo = json.dumps({"correo": f"carga{i % options['usuarios']}@{DOMINIO}", "password": PASSWORD})
+                    try:
+                        estado, _, segundos = pedir(cliente, "POST", "/api/auth/token/", cuerpo)
+                    except (OSError, http.client.HTTPException):
+                        cliente.close()
+                        cliente = conexion()
+                        estado, segundos = "error", None
+                    with lock:
+                        codigos[estado] = codigos.get(estado, 0) + 1
+                        if estado == 200:
+                            logins.append(segundos)
+
+            def pedir_me():
+                cliente = conexion()
+                while not terminado.is_set():
+                    estado, _, segundos = pedir(
+                        cliente, "GET", "/api/auth/me/", headers={"Authorization": f"Bearer {access}"}
+                    )
+                    if estado == 200:
+                        with lock:
+                            me.append(segundos)
+
+            hilos_me = [threading.Thread(target=pedir_me) for _ in range(options["hilos_me"])]
+            hilos = [threading.Thread(target=hacer_logins) for _ in range(options["concurrencia"])]
+            inicio = time.perf_counter()
+            for hilo in hilos_me + hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+            total = time.perf_counter() - inicio
+            terminado.set()
+            for hilo in hilos_me:
+                hilo.join()
+        finally:
+            Usuario.objects.filter(correo__endswith=f"@{DOMINIO}").delete()
+
+        self.stdout.write(
+            f"{options['peticiones']} logins, {options['concurrencia']} concurrentes, "
+            f"{total:.1f} s ({len(logins) / total:.0f} logins/s); códigos: {codigos}"
+        )
+        self.stdout.write(f"{'':<10}{'n':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+        for nombre, valores in (("login", logins), ("/me/", me)):
+            self.stdout.write(
+                f"{nombre:<10}{len(valores):>7}"
+                + "".join(f"{_percentil(valores, p) * 1000:>10.1f}" for p in (50, 95, 99))
+                + f"{(max(valores) if valores else float('nan')) * 1000:>10.1f}"
+            )
+        if logins:
+            self.stdout.write(f"media login: {statistics.mean(logins) * 1000:.1f} ms")
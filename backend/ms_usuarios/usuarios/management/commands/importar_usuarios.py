@@ -0,0 +1,219 @@
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+
+from usuarios.kafka_producer import send_usuarios_creados_events
+from usuarios.models import Rol, Usuario
+
+OBLIGATORIOS = ("correo", "nombre", "apellido_paterno", "rol")
+
+
+def _iniciar_proceso():
+    # Con "spawn" (Windows, macOS) el proceso hijo arranca sin Django configurado
+    django.setup()
+
+
+def _hashear(passwords):
+    return [make_password(password) for password in passwords]
+
+
+def _leer(ruta, formato):
+    """Filas del archivo como dicts, una a la vez (no se carga completo en memoria)"""
+    with open(ruta, encoding="utf-8-sig", newline="") as archivo:
+        if formato == "csv":
+            for fila in csv.DictReader(archivo):
+                yield {clave: (valor or "").strip() for clave, valor in fila.items() if clave}
+        else:
+            for linea in archivo:
+                if linea.strip():
+                    try:
+                        fila = json.loads(linea)
+                    except json.JSONDecodeError as e:
+                        fila = {"_error": f"JSON inválido: {e}"}
+                    yield fila if isinstance(fila, dict) else {"_error": "Se esperaba un objeto por línea"}
+
+
+def _validar(fila, roles):
+    """``(datos, None)`` o ``(None, motivo)``"""
+    if "_error" in fila:
+        return None, fila["_error"]
+    faltan = [campo for campo in OBLIGATORIOS if not fila.get(campo)]
+    if not fila.get("password") and not fila.get("password_hash"):
+        faltan.append("password")
+    if faltan:
+        return None, f"Faltan campos: {', '.join(faltan)}"
+    correo = str(fila["correo"]).strip().lower()
+    try:
+        validate_email(correo)
+    except ValidationError:
+        return None, "Correo inválido"
+    rol = roles.get(fila["rol"])
+    if rol is None:
+        return None, f"Rol desconocido: {fila['rol']}"
+    try:
+        nacimiento = date.fromisoformat(fila["fecha_nacimiento"]) if fila.get("fecha_nacimiento") else None
+    except ValueError:
+        return None, "fecha_nacimiento debe ser AAAA-MM-DD"
+    return {
+        "correo": correo,
+        "username": str(fila.get("username") or correo)[:150],
+        "nombre": str(fila["nombre"])[:100],
+        "apellido_paterno": str(fila["apellido_paterno"])[:100],
+        "apellido_materno": str(fila.get("apellido_materno") or "")[:100] or None,
+        "fecha_nacimiento": nacimiento,
+        "rol": rol,
+        # Un hash de otro sistema (formato de Django) se conserva; se actualiza en el primer login
+        "password_hash": fila.get("password_hash") or None,
+        "password": fila.get("password") or None,
+    }, None
+
+
+class Command(BaseCommand):
+    help = (
+        "Importa usuarios desde un CSV o NDJSON (uno por fila/línea) sin cargarlo completo "
+        "en memoria. Las contraseñas se hashean en un pool de procesos, los usuarios se "
+        "insertan con bulk_create por lotes y sus eventos 'usuarios.creados' se encolan en "
+        "el outbox en el mismo lote (los publica publicar_outbox). Guarda un checkpoint "
+        "tras cada lote: si se interrumpe, volver a correrlo continúa donde se quedó."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archivo")
+        parser.add_argument("--formato", choices=["csv", "ndjson"], help="Por defecto, según la extensión")
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument("--procesos", type=int, default=os.cpu_count() or 2)
+        parser.add_argument("--checkpoint", help="Por defecto <archivo>.checkpoint")
+        parser.add_argument("--rechazados", help="Por defecto <archivo>.rechazados.ndjson")
+        parser.add_argument("--desde-cero", action="store_true", help="Ignorar el checkpoint existente")
+
+    def handle(self, *args, **options):
+        ruta = options["archivo"]
+        if not os.path.exists(ruta):
+            raise CommandError(f"No existe {ruta}")
+        formato = options["formato"] or ("csv" if ruta.lower().endswith(".csv") else "ndjson")
+        ruta_checkpoint = options["checkpoint"] or f"{ruta}.checkpoint"
+        ruta_rechazados = options["rechazados"] or f"{ruta}.rechazados.ndjson"
+        tamano = options["lote"]
+
+        saltar = 0
+        if os.path.exists(ruta_checkpoint) and not options["desde_cero"]:
+            with open(ruta_checkpoint) as archivo:
+                saltar = json.load(archivo)["procesadas"]
+            self.stdout.write(f"Reanudando después de {saltar} filas")
+
+        # Los roles son pocos: se resuelven en memoria, sin consulta por fila
+        roles = {rol.nombre_rol: rol for rol in Rol.objects.all()}
+        filas = islice(_leer(ruta, formato), saltar, None)
+        lotes = iter(lambda: list(islice(filas, tamano)), [])
+
+        procesadas, creados, rechazados = saltar, 0, 0
+        inicio = time.perf_counter()
+        with ProcessPoolExecutor(options["procesos"], initializer=_iniciar_proceso) as pool, \
+                open(ruta_rechazados, "a", encoding="utf-8") as archivo_rechazados:
+            # Mientras se inserta un lote, el pool ya hashea el siguiente
+            en_curso = self._preparar(next(lotes, None), procesadas, roles, pool, options["procesos"])
+            while en_curso is not None:
+                siguiente = self._preparar(
+                    next(lotes, None), procesadas + en_curso["total"], roles, pool, options["procesos"]
+                )
+                nuevos, errores = self._insertar(en_curso)
+                procesadas += en_curso["total"]
+                creados += nuevos
+                rechazados += len(errores)
+                for numero, motivo in errores:
+                    archivo_rechazados.write(json.dumps({"fila": numero, "motivo": motivo}, ensure_ascii=False) + "\n")
+                archivo_rechazados.flush()
+                self._guardar_checkpoint(ruta_checkpoint, procesadas)
+
+                segundos = time.perf_counter() - inicio
+                self.stdout.write(
+                    f"{procesadas} filas | {creados} creados | {rechazados} rechazados | "
+                    f"{creados / segundos:.0f} usuarios/s"
+                )
+                en_curso = siguiente
+
+        segundos = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Listo: {creados} usuarios creados y {rechazados} rechazados en {segundos:.1f} s "
+            f"({creados / segundos if segundos else 0:.0f} usuarios/s)"
+        ))
+        if rechazados:
+            self.stdout.write(f"Detalle de los rechazados en {ruta_rechazados}")
+
+    def _preparar(self, lote, primera, roles, pool, procesos):
+        """Valida el lote y manda a hashear sus contraseñas; devuelve lo necesario para insertarlo"""
+        if lote is None:
+            return None
+        validos, errores = [], []
+        for numero, fila in enumerate(lote, start=primera + 1):
+            datos, motivo = _validar(fila, roles)
+            if motivo:
+                errores.append((numero, motivo))
+            else:
+                validos.append((numero, datos))
+
+        # Repartir las contraseñas en partes iguales entre los procesos
+        planos = [datos["password"] for _, datos in validos if not datos["password_hash"]]
+        parte = max(1, -(-len(planos) // procesos))
+        futuros = [pool.submit(_hashear, planos[i:i + parte]) for i in range(0, len(planos), parte)]
+        return {"total": len(lote), "validos": validos, "errores": errores, "hashes": futuros}
+
+    def _insertar(self, preparado):
+        hashes = iter([codificado for futuro in preparado["hashes"] for codificado in futuro.result()])
+        usuarios = []
+        for numero, datos in preparado["validos"]:
+            codificado = datos.pop("password_hash") or next(hashes)
+            datos.pop("password")
+            usuarios.append((numero, Usuario(password=codificado, **datos)))
+
+        errores = list(preparado["errores"])
+        for intento in range(2):
+            nuevos, duplicados = self._sin_duplicados(usuarios)
+            try:
+                with transaction.atomic():
+                    Usuario.objects.bulk_create([usuario for _, usuario in nuevos])
+                    send_usuarios_creados_events([usuario for _, usuario in nuevos])
+                break
+            except IntegrityError:
+                # Alguien registró el mismo correo mientras tanto: recalcular y reintentar una vez
+                if intento == 1:
+                    raise
+        errores += duplicados
+        errores.sort()
+        return len(nuevos), errores
+
+    def _sin_duplicados(self, usuarios):
+        """Separa los que chocan con usuarios existentes o repetidos dentro del lote"""
+        correos = {usuario.correo for _, usuario in usuarios}
+        usernames = {usuario.username for _, usuario in usuarios}
+        ocupados_correo = set(Usuario.objects.filter(correo__in=correos).values_list("correo", flat=True))
+        ocupados_username = set(Usuario.objects.filter(username__in=usernames).values_list("username", flat=True))
+        nuevos, duplicados = [], []
+        for numero, usuario in usuarios:
+            if usuario.correo in ocupados_correo:
+                duplicados.append((numero, "Correo ya registrado"))
+            elif usuario.username in ocupados_username:
+                duplicados.append((numero, "Username ya registrado"))
+            else:
+                ocupados_correo.add(usuario.correo)
+                ocupados_username.add(usuario.username)
+                nuevos.append((numero, usuario))
+        return nuevos, duplicados
+
+    def _guardar_checkpoint(self, ruta, procesadas):
+        # Escribir aparte y renombrar: un corte a mitad no deja el checkpoint corrupto
+        temporal = f"{ruta}.tmp"
+        with open(temporal, "w") as archivo:
+            json.dump({"procesadas": procesadas}, archivo)
+        os.replace(temporal, ruta)
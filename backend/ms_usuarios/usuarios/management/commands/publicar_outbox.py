@@ -0,0 +1,19 @@
+from acaclick_comun.relay import RelayOutboxCommand
+
+from usuarios.kafka_producer import cerrar_producer, get_producer
+from usuarios.outbox import outbox
+
+
+class Command(RelayOutboxCommand):
+    help = (
+        "Relay del outbox: publica en Kafka los eventos pendientes por lotes, en orden, "
+        "y los marca como publicados. Con varios relays corriendo solo uno publica a la vez."
+    )
+    outbox = outbox
+
+    def crear_producer(self):
+        # El producer del proceso, acotado (ProducerAcotado)
+        return get_producer()
+
+    def cerrar_producer(self, producer):
+        cerrar_producer()
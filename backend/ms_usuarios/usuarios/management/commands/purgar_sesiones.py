@@ -0,0 +1,45 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+
+from usuarios.sesiones import purgar
+
+
+class Command(BaseCommand):
+    help = (
+        "Borra las sesiones vencidas o cerradas en lotes pequeños, cada uno en su propia "
+        "transacción y saltando filas bloqueadas, con una pausa entre lotes para no "
+        "competir con los logins. Con --continuo repite cada --intervalo segundos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--lote", type=int, default=1000)
+        parser.add_argument("--pausa", type=float, default=0.1, help="Segundos entre lotes")
+        parser.add_argument("--continuo", action="store_true", help="No salir al terminar")
+        parser.add_argument("--intervalo", type=float, default=300, help="Segundos entre pasadas con --continuo")
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+
+        while not self.detener:
+            total = 0
+            while not self.detener:
+                borradas = purgar(options["lote"])
+                total += borradas
+                # Lote incompleto: no queda nada (o solo filas bloqueadas) por ahora
+                if borradas < options["lote"]:
+                    break
+                time.sleep(options["pausa"])
+            self.stdout.write(f"[SESIONES] {total} sesiones purgadas")
+
+            if not options["continuo"]:
+                break
+            fin = time.monotonic() + options["intervalo"]
+            while not self.detener and time.monotonic() < fin:
+                time.sleep(min(1.0, fin - time.monotonic()))
+
+    def _detener(self, signum, frame):
+        self.detener = True
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoOutbox',
+            fields=[
+                ('id_evento', models.BigAutoField(primary_key=True, serialize=False)),
+                ('topic', models.CharField(max_length=200)),
+                ('clave', models.CharField(max_length=200)),
+                ('payload', models.JSONField()),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('publicado_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('publicado_en__isnull', True)), fields=['id_evento'], name='outbox_pendientes_idx')],
+            },
+        ),
+    ]
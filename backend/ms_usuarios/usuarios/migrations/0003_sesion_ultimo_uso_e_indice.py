@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('usuarios', '0002_eventooutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sesion',
+            name='ultimo_uso',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='sesion',
+            index=models.Index(fields=['activo', 'expira_en'], name='sesiones_activo_expira_idx'),
+        ),
+    ]
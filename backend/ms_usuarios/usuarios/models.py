@@ -3,6 +3,8 @@ from django.contrib.auth.models import AbstractUser
 from django.conf import settings
 import uuid
 
+from acaclick_comun.outbox import EventoOutboxBase
+
 
 class Rol(models.Model):
 
@@ -39,6 +41,10 @@ class Usuario(AbstractUser):
 
 
 class Sesion(models.Model):
+    """
+    Una sesión por login. ``token`` es el ``jti`` del refresh token y
+    ``expira_en`` su caducidad; los tokens llevan ``sid`` = ``id_sesion``.
+    """
     
     id_sesion = models.BigAutoField(primary_key=True)
     usuario = models.ForeignKey(
@@ -50,6 +56,31 @@ class Sesion(models.Model):
     expira_en = models.DateTimeField(blank=True, null=True)
     activo = models.BooleanField(default=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # Se escribe por lotes, no en cada petición (ver sesiones.py)
+    ultimo_uso = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # La purga busca las activas ya vencidas y las cerradas
+            models.Index(fields=["activo", "expira_en"], name="sesiones_activo_expira_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Sesión {self.id_sesion} de {self.usuario.correo}"
+
+
+class EventoOutbox(EventoOutboxBase):
+    """
+    Evento pendiente de publicar en Kafka. Se escribe en la misma transacción
+    que el cambio que lo origina; el relay (``publicar_outbox``) lo envía después.
+    """
+
+    class Meta:
+        indexes = [
+            # El relay solo recorre los pendientes, en orden de id
+            models.Index(
+                fields=["id_evento"],
+                name="outbox_pendientes_idx",
+                condition=models.Q(publicado_en__isnull=True),
+            ),
+        ]
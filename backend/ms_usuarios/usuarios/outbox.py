@@ -0,0 +1,18 @@
+"""
+Outbox de ms_usuarios (``acaclick_comun.outbox``, el mismo que ms_negocios).
+
+La vista escribe el evento en ``EventoOutbox`` dentro de la misma transacción
+que el usuario, así que no hay usuario sin evento ni evento sin usuario;
+``manage.py publicar_outbox`` los manda a Kafka.
+"""
+from acaclick_comun.outbox import Outbox
+
+from .models import EventoOutbox
+
+# Llave del advisory lock del relay (ms_negocios usa otra)
+outbox = Outbox(EventoOutbox, llave_relay=7301001)
+
+encolar = outbox.encolar
+encolar_muchos = outbox.encolar_muchos
+publicar_pendientes = outbox.publicar_pendientes
+purgar_publicados = outbox.purgar_publicados
@@ -0,0 +1,119 @@
+"""
+Cache del usuario autenticado ("principal") para no leer Postgres en cada petición.
+
+- La autenticación (``JWTAuthenticationCacheada``) valida el token como siempre
+  y, en vez de cargar el ``Usuario``, busca en la cache el ``UsuarioReadSerializer``
+  ya serializado (con su ``rol``). ``/me/`` lo devuelve tal cual.
+- La clave lleva el ``user_id`` del token, una versión por usuario y una
+  versión global de roles. Cualquier cambio en un ``Usuario`` o en un ``Rol``
+  (señales ``post_save``/``post_delete``, al confirmar la transacción) sube su
+  versión y las entradas viejas dejan de leerse.
+- Los ``QuerySet.update()`` no disparan señales: quien los use debe llamar a
+  ``invalidar_usuario``/``invalidar_roles``.
+- Con varios procesos la cache debe ser compartida (``USUARIOS_PRINCIPAL["CACHE"]``
+  apuntando a Redis o Memcached); con la cache local de cada proceso, una
+  invalidación solo llega a los demás al vencer el ``TTL``.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from . import sesiones
+from .models import Usuario
+from .serializers import UsuarioReadSerializer
+
+VERSION_ROLES = "usuarios:ver:roles"
+
+
+class Principal:
+    """Usuario autenticado armado desde la cache; ``datos`` es la respuesta de ``/me/``"""
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, datos):
+        self.datos = datos
+        self.id_usuario = datos["id_usuario"]
+        self.pk = self.id_usuario
+
+    def __str__(self):
+        return self.datos["correo"]
+
+
+def _cache():
+    return caches[settings.USUARIOS_PRINCIPAL["CACHE"]]
+
+
+def _version_inicial():
+    # Si un contador se pierde (desalojo, reinicio) no debe volver a un valor
+    # usado antes y resucitar entradas viejas
+    return time.time_ns()
+
+
+def _subir(clave):
+    cache = _cache()
+    cache.add(clave, _version_inicial(), None)
+    try:
+        cache.incr(clave)
+    except ValueError:
+        # Desalojada entre el add y el incr
+        cache.set(clave, _version_inicial(), None)
+
+
+def _clave(id_usuario):
+    """Clave vigente del principal: versión del usuario + versión de roles (una sola ida a la cache)"""
+    cache = _cache()
+    version_usuario = f"usuarios:ver:usuario:{id_usuario}"
+    versiones = cache.get_many([version_usuario, VERSION_ROLES])
+    for nombre in (version_usuario, VERSION_ROLES):
+        if nombre not in versiones:
+            _subir(nombre)
+            versiones[nombre] = cache.get(nombre)
+    return f"usuarios:principal:{id_usuario}:{versiones[version_usuario]}:{versiones[VERSION_ROLES]}"
+
+
+def obtener(id_usuario):
+    """``Principal`` del usuario activo, de la cache o de la base; ``None`` si no existe o está inactivo"""
+    cache = _cache()
+    clave = _clave(id_usuario)
+    datos = cache.get(clave)
+    if datos is None:
+        usuario = Usuario.objects.select_related("rol").filter(id_usuario=id_usuario, is_active=True).first()
+        if usuario is None:
+            return None
+        datos = dict(UsuarioReadSerializer(usuario).data)
+        cache.set(clave, datos, settings.USUARIOS_PRINCIPAL["TTL"])
+    return Principal(datos)
+
+
+def invalidar_usuario(id_usuario):
+    transaction.on_commit(lambda: _subir(f"usuarios:ver:usuario:{id_usuario}"))
+
+
+def invalidar_roles():
+    # Cambiar un rol cambia el /me/ de todos sus usuarios: se invalidan todos
+    transaction.on_commit(lambda: _subir(VERSION_ROLES))
+
+
+class JWTAuthenticationCacheada(JWTAuthentication):
+    """``JWTAuthentication`` que resuelve el usuario con ``obtener`` en vez de leer la tabla"""
+
+    def get_user(self, validated_token):
+        try:
+            id_usuario = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("El token no identifica al usuario")
+
+        principal = obtener(id_usuario)
+        if principal is None:
+            raise AuthenticationFailed("Usuario no encontrado o inactivo", code="user_not_found")
+        sid = validated_token.get("sid")
+        if sid is not None:
+            # Solo en memoria: se escribe por lotes (sesiones.py)
+            sesiones.actividad.marcar(sid)
+        return principal
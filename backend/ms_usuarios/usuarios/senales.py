@@ -0,0 +1,15 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import principal
+from .models import Rol, Usuario
+
+
+@receiver([post_save, post_delete], sender=Usuario)
+def usuario_cambiado(sender, instance, **kwargs):
+    principal.invalidar_usuario(instance.id_usuario)
+
+
+@receiver([post_save, post_delete], sender=Rol)
+def rol_cambiado(sender, instance, **kwargs):
+    principal.invalidar_roles()
@@ -1,4 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import sesiones
 from .models import Usuario, Rol
 
 
@@ -49,7 +54,35 @@ class UsuarioRegisterSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         password = validated_data.pop("password")
+        # La vista de registro ya lo calculó fuera del hilo de la petición (hashing.py)
+        codificado = validated_data.pop("password_codificado", None)
         user = Usuario(**validated_data)
-        user.set_password(password)
+        if codificado is not None:
+            user.password = codificado
+        else:
+            user.set_password(password)
         user.save()
         return user
+
+
+class RefreshConSesionSerializer(TokenRefreshSerializer):
+    """Como el de simplejwt, pero rechaza el refresh de una sesión cerrada o vencida"""
+
+    def validate(self, attrs):
+        sid = self.token_class(attrs["refresh"]).get("sid")
+        # Los tokens emitidos antes de las sesiones no traen ``sid``: valen hasta su exp
+        if sid is not None and not sesiones.vigente(sid):
+            raise InvalidToken("La sesión fue cerrada o expiró")
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        try:
+            token = RefreshToken(attrs["refresh"])
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        attrs["sid"] = token.get("sid")
+        return attrs
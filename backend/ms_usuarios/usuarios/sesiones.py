@@ -0,0 +1,145 @@
+"""
+Sesiones (``Sesion``): alta en el login, actividad por lotes y purga.
+
+- ``abrir`` crea la sesión del login y pone ``sid`` en el refresh token (el
+  access lo hereda). El refresh y el logout la consultan; las peticiones
+  normales no: el access sigue siendo válido hasta que vence.
+- La actividad (``ultimo_uso``) no se escribe en cada petición: ``marcar``
+  solo la anota en memoria y un hilo la vuelca cada
+  ``USUARIOS_SESIONES["INTERVALO_ACTIVIDAD"]`` segundos (o en cuanto se
+  juntan ``MAXIMO_PENDIENTES``) con un único UPDATE para todas; la petición
+  que llena el lote solo despierta al hilo, no escribe.
+- ``purgar`` borra sesiones vencidas o cerradas en lotes pequeños, cada uno en
+  su propia transacción y saltando filas bloqueadas, para no frenar los logins.
+"""
+import atexit
+import logging
+import os
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Sesion
+
+logger = logging.getLogger(__name__)
+
+def abrir(usuario, refresh):
+    """Registra la sesión del ``refresh`` recién emitido y le agrega el claim ``sid``"""
+    sesion = Sesion.objects.create(
+        usuario=usuario,
+        token=refresh["jti"],
+        expira_en=datetime.fromtimestamp(refresh["exp"], tz=dt_timezone.utc),
+    )
+    refresh["sid"] = sesion.id_sesion
+    return sesion
+
+
+def vigente(sid):
+    return Sesion.objects.filter(id_sesion=sid, activo=True, expira_en__gt=timezone.now()).exists()
+
+
+def cerrar(sid):
+    return Sesion.objects.filter(id_sesion=sid, activo=True).update(activo=False)
+
+
+class _Actividad:
+    """``{sid: último uso}`` pendientes de escribir"""
+
+    def __init__(self):
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detenido = threading.Event()
+        self._despertar = threading.Event()
+
+    def marcar(self, sid, momento=None):
+        momento = momento or timezone.now()
+        with self._lock:
+            self._pendientes[sid] = momento
+            lleno = len(self._pendientes) >= settings.USUARIOS_SESIONES["MAXIMO_PENDIENTES"]
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._ciclo, name="actividad-sesiones", daemon=True)
+                self._hilo.start()
+        if lleno:
+            self._despertar.set()
+
+    def vaciar(self):
+        """Escribe lo pendiente con un solo UPDATE; devuelve cuántas sesiones llevaba"""
+        with self._lock:
+            pendientes, self._pendientes = self._pendientes, {}
+        if not pendientes:
+            return 0
+        valores = ", ".join(["(%s::bigint, %s::timestamptz)"] * len(pendientes))
+        parametros = [dato for par in pendientes.items() for dato in par]
+        tabla = Sesion._meta.db_table
+        try:
+            with connection.cursor() as cursor:
+                # Nunca hacia atrás: otro worker pudo escribir un uso más reciente
+                cursor.execute(
+                    f"UPDATE {tabla} AS s SET ultimo_uso = v.momento "
+                    f"FROM (VALUES {valores}) AS v(id_sesion, momento) "
+                    "WHERE s.id_sesion = v.id_sesion AND (s.ultimo_uso IS NULL OR s.ultimo_uso < v.momento)",
+                    parametros,
+                )
+        except Exception:
+            # Devolver el lote para la siguiente vuelta, sin pisar usos más nuevos
+            with self._lock:
+                for sid, momento in pendientes.items():
+                    if sid not in self._pendientes or self._pendientes[sid] < momento:
+                        self._pendientes[sid] = momento
+            raise
+        return len(pendientes)
+
+    def _ciclo(self):
+        while not self._detenido.is_set():
+            # Cada intervalo, o antes si ``marcar`` juntó el máximo
+            self._despertar.wait(settings.USUARIOS_SESIONES["INTERVALO_ACTIVIDAD"])
+            self._despertar.clear()
+            try:
+                self.vaciar()
+            except Exception:
+                logger.exception("No se pudo guardar la actividad de las sesiones")
+            finally:
+                # Este hilo tiene su propia conexión: no dejarla abierta entre vueltas
+                connection.close()
+
+    def _despues_del_fork(self):
+        # El hilo no sobrevive al fork y lo pendiente ya lo escribirá el padre
+        self._pendientes = {}
+        self._lock = threading.Lock()
+        self._hilo = None
+        self._detenido = threading.Event()
+        self._despertar = threading.Event()
+
+
+actividad = _Actividad()
+os.register_at_fork(after_in_child=actividad._despues_del_fork)
+
+
+@atexit.register
+def _al_salir():
+    try:
+        actividad.vaciar()
+    except Exception:
+        logger.exception("No se pudo guardar la actividad de las sesiones al salir")
+
+
+def purgar(lote=1000):
+    """Borra hasta ``lote`` sesiones vencidas o cerradas; devuelve cuántas"""
+    tabla = Sesion._meta.db_table
+    borradas = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Un DELETE por condición, para que cada uno use el índice (activo, expira_en)
+        for condicion in ("activo AND expira_en < now()", "NOT activo"):
+            if borradas >= lote:
+                break
+            cursor.execute(
+                f"DELETE FROM {tabla} WHERE id_sesion IN ("
+                f"SELECT id_sesion FROM {tabla} WHERE {condicion} LIMIT %s FOR UPDATE SKIP LOCKED)",
+                [lote - borradas],
+            )
+            borradas += cursor.rowcount
+    return borradas
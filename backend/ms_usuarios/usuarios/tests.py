@@ -1,3 +1,413 @@
-from django.test import TestCase
+import json
+import logging
+import os
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.hashers import get_hashers_by_algorithm, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from .hashing import Argon2Ajustado
+from .kafka_producer import ProducerAcotado, ProducerSaturado
+from . import sesiones
+from .models import EventoOutbox, Rol, Sesion, Usuario
+from .outbox import encolar, publicar_pendientes
+
+
+class _Futuro:
+    def __init__(self, error=None):
+        self.error = error
+        self.callbacks = []
+
+    def add_both(self, callback):
+        self.callbacks.append(callback)
+
+    def confirmar(self):
+        for callback in self.callbacks:
+            callback(None)
+
+    def get(self, timeout=None):
+        if self.error is not None:
+            raise self.error
+
+
+class ProducerEnMemoria:
+    """Producer de prueba: guarda lo enviado en vez de hablar con Kafka"""
+
+    def __init__(self, error=None):
+        self.enviados = []
+        self.futuros = []
+        self.error = error
+
+    def send(self, topic, key=None, value=None, headers=None):
+        self.enviados.append((topic, key, value))
+        futuro = _Futuro(self.error)
+        self.futuros.append(futuro)
+        return futuro
+
+    def flush(self, timeout=None):
+        pass
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre_rol="cliente")
+
+    def registrar(self, correo):
+        return self.client.post(
+            reverse("register"),
+            {
+                "username": correo.split("@")[0], "correo": correo, "nombre": "Ana",
+                "apellido_paterno": "López", "password": "secreto123", "id_rol": self.rol.id_rol,
+            },
+            content_type="application/json",
+        )
+
+    def test_registro_encola_el_evento(self):
+        respuesta = self.registrar("ana@example.com")
+        self.assertEqual(respuesta.status_code, 201)
+        evento = EventoOutbox.objects.get()
+        self.assertEqual(evento.topic, "usuarios.creados")
+        self.assertEqual(evento.clave, str(respuesta.json()["id_usuario"]))
+        self.assertEqual(evento.payload["correo"], "ana@example.com")
+        self.assertIn("producido_en", evento.payload)
+        self.assertIsNone(evento.publicado_en)
+
+    def test_relay_publica_en_orden_y_marca(self):
+        for i in range(5):
+            encolar("usuarios.creados", i, {"i": i})
+        producer = ProducerEnMemoria()
+        self.assertEqual(publicar_pendientes(producer, lote=3), 3)
+        self.assertEqual(publicar_pendientes(producer, lote=3), 2)
+        self.assertEqual(publicar_pendientes(producer, lote=3), 0)
+        self.assertEqual([valor["i"] for _, _, valor in producer.enviados], [0, 1, 2, 3, 4])
+        self.assertFalse(EventoOutbox.objects.filter(publicado_en__isnull=True).exists())
+
+    def test_fallo_del_broker_deja_el_lote_pendiente(self):
+        encolar("usuarios.creados", 1, {"i": 1})
+        with self.assertRaises(RuntimeError):
+            publicar_pendientes(ProducerEnMemoria(error=RuntimeError("broker caído")))
+        self.assertTrue(EventoOutbox.objects.filter(publicado_en__isnull=True).exists())
+
+
+class ProducerAcotadoTests(TestCase):
+    def test_frena_al_llegar_al_maximo_de_pendientes(self):
+        interno = ProducerEnMemoria()
+        producer = ProducerAcotado(interno, max_pendientes=2, max_bloqueo_ms=10)
+        producer.send("t", value=1)
+        producer.send("t", value=2)
+        with self.assertRaises(ProducerSaturado):
+            producer.send("t", value=3)
+
+        # Al confirmarse un envío se libera cupo
+        interno.futuros[0].confirmar()
+        producer.send("t", value=3)
+        self.assertEqual(len(interno.enviados), 3)
+
+
+class PrincipalCacheadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.rol = Rol.objects.create(nombre_rol="propietario")
+        self.usuario = Usuario.objects.create_user(
+            username="ana", correo="ana@example.com", password="secreto123",
+            nombre="Ana", apellido_paterno="López", rol=self.rol,
+        )
+        self.token = str(AccessToken.for_user(self.usuario))
+
+    def me(self):
+        return self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {self.token}")
+
+    def test_me_sin_consultas_con_cache_caliente(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.me().json()["rol"]["nombre_rol"], "propietario")
+        with self.assertNumQueries(0):
+            respuesta = self.me()
+        self.assertEqual(respuesta.json()["correo"], "ana@example.com")
+
+    def test_cambios_de_usuario_y_rol_invalidan(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.nombre = "Ana María"
+            self.usuario.save()
+        self.assertEqual(self.me().json()["nombre"], "Ana María")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.rol.nombre_rol = "admin"
+            self.rol.save()
+        self.assertEqual(self.me().json()["rol"]["nombre_rol"], "admin")
+
+    def test_usuario_desactivado(self):
+        self.me()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.usuario.is_active = False
+            self.usuario.save()
+        self.assertEqual(self.me().status_code, 401)
+
+
+class LoginAsyncTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre_rol="cliente")
+        self.usuario = Usuario.objects.create_user(
+            username="ana", correo="ana@example.com", password="secreto123",
+            nombre="Ana", apellido_paterno="López", rol=self.rol,
+        )
+
+    def login(self, correo="ana@example.com", password="secreto123"):
+        return self.client.post(
+            reverse("token_obtain_pair"), {"correo": correo, "password": password},
+            content_type="application/json",
+        )
+
+    def test_login_devuelve_tokens(self):
+        respuesta = self.login()
+        self.assertEqual(respuesta.status_code, 200, respuesta.content)
+        access = respuesta.json()["access"]
+        me = self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {access}")
+        self.assertEqual(me.json()["correo"], "ana@example.com")
+
+    def test_credenciales_invalidas(self):
+        self.assertEqual(self.login(password="otra").status_code, 401)
+        self.assertEqual(self.login(correo="nadie@example.com").status_code, 401)
+        self.assertEqual(self.login(password="").status_code, 400)
+
+    def test_login_fallido_envia_la_senal(self):
+        recibidas = []
+
+        def receptor(sender, credentials, request, **kwargs):
+            recibidas.append((credentials, request.path))
+
+        user_login_failed.connect(receptor)
+        self.addCleanup(user_login_failed.disconnect, receptor)
+        self.login()
+        self.assertEqual(recibidas, [])
+        self.login(password="otra")
+        self.login(correo="nadie@example.com")
+        ruta = reverse("token_obtain_pair")
+        self.assertEqual(recibidas, [
+            ({"correo": "ana@example.com"}, ruta), ({"correo": "nadie@example.com"}, ruta),
+        ])
+
+    def test_argon2_ajustado_no_lo_reemplaza_el_de_django(self):
+        self.assertIsInstance(get_hashers_by_algorithm()["argon2"], Argon2Ajustado)
+
+    def test_rehash_al_iniciar_sesion(self):
+        self.usuario.password = make_password("secreto123", hasher="pbkdf2_sha256")
+        self.usuario.save()
+        self.assertEqual(self.login().status_code, 200)
+        self.usuario.refresh_from_db()
+        self.assertTrue(self.usuario.password.startswith("argon2$"))
+        self.assertTrue(self.usuario.check_password("secreto123"))
+
+    def test_pool_saturado(self):
+        with mock.patch("usuarios.hashing._obtener_pool", return_value=(None, threading.Semaphore(0))):
+            respuesta = self.login()
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta["Retry-After"], "1")
+
+
+class AsgiTests(TestCase):
+    """Registro y login por el handler ASGI, como corren con uvicorn"""
+
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre_rol="cliente")
+
+    @override_settings(DEBUG=True)  # Django solo registra las adaptaciones con DEBUG
+    async def test_cadena_async_sin_adaptar(self):
+        with self.assertLogs("django.request", "DEBUG") as registros:
+            cliente = AsyncClient()
+            registro = await cliente.post(
+                reverse("register"),
+                {
+                    "username": "ana", "correo": "ana@example.com", "password": "secreto123",
+                    "nombre": "Ana", "apellido_paterno": "López", "id_rol": self.rol.pk,
+                },
+                content_type="application/json",
+            )
+            login = await cliente.post(
+                reverse("token_obtain_pair"), {"correo": "ana@example.com", "password": "secreto123"},
+                content_type="application/json",
+            )
+            # assertLogs exige al menos un mensaje
+            logging.getLogger("django.request").debug("fin")
+
+        self.assertEqual(registro.status_code, 201, registro.content)
+        self.assertEqual(login.status_code, 200, login.content)
+        self.assertIn("access", json.loads(login.content))
+        # Ningún middleware (compresión incluida) obliga a pasar la vista async por un hilo
+        adaptados = [mensaje for mensaje in registros.output if "adapted" in mensaje]
+        self.assertEqual(adaptados, [])
+
+    async def test_compresion_bajo_asgi(self):
+        respuesta = await AsyncClient().post(
+            reverse("register"), {"correo": "x" * 5000}, content_type="application/json",
+            HTTP_ACCEPT_ENCODING="gzip",
+        )
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("Accept-Encoding", respuesta["Vary"])
+
+
+class ImportarUsuariosTests(TestCase):
+    def setUp(self):
+        Rol.objects.create(nombre_rol="cliente")
+        Usuario.objects.create_user(
+            username="ya", correo="ya@example.com", password="secreto123",
+            nombre="Ya", apellido_paterno="Existe", rol=Rol.objects.get(),
+        )
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        self.archivo = os.path.join(self.directorio.name, "usuarios.csv")
+        with open(self.archivo, "w", encoding="utf-8") as archivo:
+            archivo.write("correo,nombre,apellido_paterno,rol,password,password_hash\n")
+            for i in range(5):
+                archivo.write(f"u{i}@example.com,Usuario,Importado,cliente,clave{i},\n")
+            archivo.write("ya@example.com,Ya,Existe,cliente,clave,\n")
+            archivo.write("otro@example.com,Otro,Rol,admin,clave,\n")
+            archivo.write("u0@example.com,Repetido,En archivo,cliente,clave,\n")
+            archivo.write(f"legado@example.com,Legado,Hash,cliente,,{make_password('vieja', hasher='pbkdf2_sha256')}\n")
+
+    def importar(self):
+        call_command("importar_usuarios", self.archivo, lote=4, procesos=2, stdout=open(os.devnull, "w"))
+
+    def test_importa_por_lotes_con_eventos_y_rechazos(self):
+        self.importar()
+        importados = Usuario.objects.exclude(correo="ya@example.com")
+        self.assertEqual(importados.count(), 6)
+        self.assertTrue(Usuario.objects.get(correo="u3@example.com").check_password("clave3"))
+        self.assertTrue(Usuario.objects.get(correo="legado@example.com").check_password("vieja"))
+        self.assertEqual(
+            sorted(e.payload["correo"] for e in EventoOutbox.objects.all()),
+            sorted(importados.values_list("correo", flat=True)),
+        )
+        with open(f"{self.archivo}.rechazados.ndjson", encoding="utf-8") as archivo:
+            rechazos = [json.loads(linea) for linea in archivo]
+        self.assertEqual([r["fila"] for r in rechazos], [6, 7, 8])
+
+    def test_reanuda_desde_el_checkpoint(self):
+        with open(f"{self.archivo}.checkpoint", "w") as archivo:
+            json.dump({"procesadas": 4}, archivo)
+        self.importar()
+        self.assertFalse(Usuario.objects.filter(correo="u1@example.com").exists())
+        self.assertTrue(Usuario.objects.filter(correo="u4@example.com").exists())
+        with open(f"{self.archivo}.checkpoint") as archivo:
+            self.assertEqual(json.load(archivo)["procesadas"], 9)
+
+
+class SesionesTests(TestCase):
+    def setUp(self):
+        self.rol = Rol.objects.create(nombre_rol="cliente")
+        self.usuario = Usuario.objects.create_user(
+            username="ana", correo="ana@example.com", password="secreto123",
+            nombre="Ana", apellido_paterno="López", rol=self.rol,
+        )
+        sesiones.actividad.vaciar()
+
+    def login(self):
+        respuesta = self.client.post(
+            reverse("token_obtain_pair"), {"correo": "ana@example.com", "password": "secreto123"},
+            content_type="application/json",
+        )
+        return respuesta.json()
+
+    def refrescar(self, refresh):
+        return self.client.post(reverse("token_refresh"), {"refresh": refresh}, content_type="application/json")
+
+    def test_login_abre_sesion(self):
+        tokens = self.login()
+        sesion = Sesion.objects.get()
+        self.assertEqual(sesion.usuario, self.usuario)
+        self.assertEqual(RefreshToken(tokens["refresh"])["jti"], sesion.token)
+        self.assertEqual(AccessToken(tokens["access"])["sid"], sesion.id_sesion)
+        self.assertGreater(sesion.expira_en, timezone.now())
+
+    def test_actividad_se_escribe_por_lotes(self):
+        otras = Sesion.objects.bulk_create([
+            Sesion(usuario=self.usuario, token=f"t{i}", expira_en=timezone.now() + timedelta(days=1))
+            for i in range(3)
+        ])
+        for sesion in otras:
+            sesiones.actividad.marcar(sesion.id_sesion)
+        self.assertFalse(Sesion.objects.filter(ultimo_uso__isnull=False).exists())
+        with self.assertNumQueries(1):
+            self.assertEqual(sesiones.actividad.vaciar(), 3)
+        self.assertEqual(Sesion.objects.filter(ultimo_uso__isnull=False).count(), 3)
+
+        # Un uso anterior al ya guardado no lo pisa
+        guardado = Sesion.objects.get(pk=otras[0].pk).ultimo_uso
+        sesiones.actividad.marcar(otras[0].id_sesion, guardado - timedelta(minutes=5))
+        sesiones.actividad.vaciar()
+        self.assertEqual(Sesion.objects.get(pk=otras[0].pk).ultimo_uso, guardado)
+
+    def test_update_fallido_no_pierde_la_actividad(self):
+        sesion = Sesion.objects.create(
+            usuario=self.usuario, token="t", expira_en=timezone.now() + timedelta(days=1),
+        )
+        antes = timezone.now() - timedelta(minutes=5)
+        sesiones.actividad.marcar(sesion.id_sesion, antes)
+        with mock.patch.object(sesiones.connection, "cursor", side_effect=RuntimeError("base caída")):
+            with self.assertRaises(RuntimeError):
+                sesiones.actividad.vaciar()
+        # Lo marcado mientras fallaba es más nuevo y se queda
+        despues = timezone.now()
+        sesiones.actividad.marcar(sesion.id_sesion, despues)
+        self.assertEqual(sesiones.actividad.vaciar(), 1)
+        self.assertEqual(Sesion.objects.get(pk=sesion.pk).ultimo_uso, despues)
+
+    @override_settings(USUARIOS_SESIONES={**settings.USUARIOS_SESIONES, "MAXIMO_PENDIENTES": 2})
+    def test_lote_lleno_lo_vuelca_el_hilo(self):
+        actividad = sesiones._Actividad()
+        volcado = threading.Event()
+        hilos = []
+
+        def vaciar():
+            hilos.append(threading.current_thread().name)
+            volcado.set()
+            return 0
+
+        with mock.patch.object(actividad, "vaciar", side_effect=vaciar), \
+                mock.patch.object(sesiones, "connection"):
+            with self.assertNumQueries(0):
+                actividad.marcar(1)
+                actividad.marcar(2)
+            self.assertTrue(volcado.wait(5))
+            actividad._detenido.set()
+            actividad._despertar.set()
+            actividad._hilo.join(5)
+        self.assertEqual(hilos[0], "actividad-sesiones")
+
+    def test_peticion_autenticada_no_escribe(self):
+        access = self.login()["access"]
+        self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {access}")
+        with self.assertNumQueries(0):
+            self.client.get(reverse("me"), HTTP_AUTHORIZATION=f"Bearer {access}")
+        sesiones.actividad.vaciar()
+        self.assertIsNotNone(Sesion.objects.get().ultimo_uso)
+
+    def test_logout_invalida_el_refresh(self):
+        refresh = self.login()["refresh"]
+        self.assertEqual(self.refrescar(refresh).status_code, 200)
+        respuesta = self.client.post(reverse("logout"), {"refresh": refresh}, content_type="application/json")
+        self.assertEqual(respuesta.status_code, 204)
+        self.assertFalse(Sesion.objects.get().activo)
+        self.assertEqual(self.refrescar(refresh).status_code, 401)
+
+    def test_purga_por_lotes(self):
+        ahora = timezone.now()
+        Sesion.objects.bulk_create(
+            [Sesion(usuario=self.usuario, token=f"vencida{i}", expira_en=ahora - timedelta(hours=1)) for i in range(5)]
+            + [Sesion(usuario=self.usuario, token=f"cerrada{i}", expira_en=ahora + timedelta(days=1), activo=False)
+               for i in range(2)]
+            + [Sesion(usuario=self.usuario, token="vigente", expira_en=ahora + timedelta(days=1))]
+        )
+        self.assertEqual(sesiones.purgar(lote=2), 2)
+        call_command("purgar_sesiones", lote=2, pausa=0, stdout=open(os.devnull, "w"))
+        self.assertEqual(list(Sesion.objects.values_list("token", flat=True)), ["vigente"])
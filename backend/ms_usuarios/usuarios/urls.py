@@ -1,14 +1,11 @@
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 
-from .views import RegisterView, MeView
+from .views import LogoutView, MeView, RefreshView, obtener_token, registrar
 
 urlpatterns = [
-    path("register/", RegisterView.as_view(), name="register"),
-    path("token/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
-    path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
+    path("register/", registrar, name="register"),
+    path("token/", obtener_token, name="token_obtain_pair"),
+    path("token/refresh/", RefreshView.as_view(), name="token_refresh"),
+    path("logout/", LogoutView.as_view(), name="logout"),
     path("me/", MeView.as_view(), name="me"),
 ]
@@ -1,40 +1,163 @@
 # ms_usuarios/ms_usuarios/usuarios/views.py
 
+from acaclick_comun.renderers import ORJSONRenderer
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.views import TokenRefreshView
 from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_login_failed
+from django.db import transaction
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+import orjson
 
 
 
-from .serializers import UsuarioRegisterSerializer, UsuarioReadSerializer
+from . import hashing, sesiones
+from .serializers import (
+    LogoutSerializer,
+    RefreshConSesionSerializer,
+    UsuarioRegisterSerializer,
+    UsuarioReadSerializer,
+)
 
 from .kafka_producer import send_usuario_creado_event
+from .principal import Principal
 
 Usuario = get_user_model()
 
+_renderer = ORJSONRenderer()
 
-class RegisterView(APIView):
-    permission_classes = [AllowAny]
 
-    def post(self, request):
-        serializer = UsuarioRegisterSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+# Registro y login son vistas async de Django (no de DRF): el hash de la
+# contraseña corre en el pool de hashing.py y el worker sigue atendiendo
+# otras peticiones mientras tanto. Se sirven con el entry point ASGI.
+
+def _respuesta(datos, estado=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        _renderer.render(datos), status=estado, content_type="application/json", headers=headers
+    )
+
 
-        # Guardamos el usuario
-        user = serializer.save()
+def _saturado():
+    return _respuesta(
+        {"detail": "Demasiadas solicitudes de autenticación, intenta de nuevo"},
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"},
+    )
 
-        # 🔹 Enviar evento a Kafka con el usuario recién creado
+
+def _cuerpo(request):
+    try:
+        datos = orjson.loads(request.body or b"{}")
+    except orjson.JSONDecodeError:
+        return None
+    return datos if isinstance(datos, dict) else None
+
+
+def _crear_usuario(serializer, codificado):
+    # Guardamos el usuario y su evento en la misma transacción (outbox):
+    # el relay `publicar_outbox` lo manda a Kafka fuera de la petición
+    with transaction.atomic():
+        user = serializer.save(password_codificado=codificado)
         send_usuario_creado_event(user)
+    return user
+
+
+@csrf_exempt
+@require_POST
+async def registrar(request):
+    datos = _cuerpo(request)
+    if datos is None:
+        return _respuesta({"detail": "JSON inválido"}, status.HTTP_400_BAD_REQUEST)
+
+    serializer = UsuarioRegisterSerializer(data=datos)
+    if not await sync_to_async(serializer.is_valid)():
+        return _respuesta(serializer.errors, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        codificado = await hashing.hacer_hash(serializer.validated_data["password"])
+    except hashing.HashingSaturado:
+        return _saturado()
+    user = await sync_to_async(_crear_usuario)(serializer, codificado)
 
-        # Devolvemos la representación de lectura
-        read_serializer = UsuarioReadSerializer(user)
-        return Response(read_serializer.data, status=status.HTTP_201_CREATED)
+    # Devolvemos la representación de lectura (el rol ya viene cargado del serializer)
+    return _respuesta(UsuarioReadSerializer(user).data, status.HTTP_201_CREATED)
+
+
+@csrf_exempt
+@require_POST
+async def obtener_token(request):
+    """Login: ``{correo, password}`` -> ``{refresh, access}`` (mismo formato que simplejwt)"""
+    datos = _cuerpo(request)
+    if datos is None:
+        return _respuesta({"detail": "JSON inválido"}, status.HTTP_400_BAD_REQUEST)
+    errores = {
+        campo: ["Este campo es requerido."]
+        for campo in ("correo", "password")
+        if not isinstance(datos.get(campo), str) or not datos[campo]
+    }
+    if errores:
+        return _respuesta(errores, status.HTTP_400_BAD_REQUEST)
+
+    try:
+        usuario = await Usuario.objects.filter(correo=datos["correo"]).afirst()
+        if usuario is None:
+            # Mismo costo que con un correo existente, para no delatar cuáles existen
+            await hashing.hacer_hash(datos["password"])
+            valida, nuevo = False, None
+        else:
+            valida, nuevo = await hashing.verificar(datos["password"], usuario.password)
+    except hashing.HashingSaturado:
+        return _saturado()
+
+    if not valida or not usuario.is_active:
+        # Lo que enviaría authenticate(): auditoría, bloqueo por intentos...
+        await user_login_failed.asend(
+            sender=__name__, credentials={"correo": datos["correo"]}, request=request,
+        )
+        return _respuesta(
+            {"detail": "No hay una cuenta activa con esas credenciales"},
+            status.HTTP_401_UNAUTHORIZED,
+        )
+    if nuevo is not None:
+        # Rehash transparente: algoritmo o parámetros nuevos
+        await Usuario.objects.filter(pk=usuario.pk).aupdate(password=nuevo)
+
+    refresh = RefreshToken.for_user(usuario)
+    # Antes de derivar el access, para que también lleve el ``sid``
+    await sync_to_async(sesiones.abrir)(usuario, refresh)
+    return _respuesta({"refresh": str(refresh), "access": str(refresh.access_token)})
 
 
 class MeView(APIView):
     def get(self, request):
         user = request.user
+        if isinstance(user, Principal):
+            # Ya viene serializado de la cache (principal.py): no toca la base
+            return Response(user.datos)
         serializer = UsuarioReadSerializer(user)
         return Response(serializer.data)
+
+
+class RefreshView(TokenRefreshView):
+    serializer_class = RefreshConSesionSerializer
+
+
+class LogoutView(APIView):
+    """``{refresh}``: cierra su sesión; ese refresh ya no renueva el access"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def post(self, request):
+        serializer = LogoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        sid = serializer.validated_data["sid"]
+        if sid is not None:
+            sesiones.cerrar(sid)
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,7 +1,7 @@
 // src/pages/NuevoNegocioPage.jsx
 import React, { useState, useEffect, useRef } from "react";
 import { useNavigate } from "react-router-dom";
-import { getCurrentUser } from "../services/api";
+import { getCurrentUser, headersConToken } from "../services/api";
 
 
 export default function NuevoNegocioPage() {
@@ -374,7 +374,7 @@ export default function NuevoNegocioPage() {
       description: formData.description || null,
       location: selectedLocation || null,
       logo: logoPreview || null,
-      id_usuario: idUsuario,          // 👈 CLAVE
+      // El propietario no va en el cuerpo: ms_negocios lo toma del token
     };
 
     const API_URL =
@@ -383,9 +383,7 @@ export default function NuevoNegocioPage() {
 
     const response = await fetch(`${API_URL}/crear/`, {
       method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
+      headers: headersConToken(),
       body: JSON.stringify(submitData),
     });
 
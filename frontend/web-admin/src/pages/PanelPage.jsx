@@ -1,7 +1,7 @@
 // src/pages/PanelPage.jsx
 import React, { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
-import { getCurrentUser, listarNegociosUsuario } from "../services/api";
+import { getCurrentUser, listarMisNegocios, logoutUser } from "../services/api";
 
 export default function PanelPage() {
   const navigate = useNavigate();
@@ -53,7 +53,7 @@ export default function PanelPage() {
     async function cargarNegocios() {
       try {
         setLoadingNegocios(true);
-        const data = await listarNegociosUsuario(usuario.id_usuario);
+        const data = await listarMisNegocios();
         setNegocios(data || []);
       } catch (err) {
         console.error("Error obteniendo negocios del usuario:", err);
@@ -67,6 +67,11 @@ export default function PanelPage() {
   }, [usuario]);
 
   function handleLogout() {
+    const refresh = localStorage.getItem("refreshToken");
+    if (refresh) {
+      // Sin esperar: la salida local no depende de que el servidor responda
+      logoutUser(refresh).catch(() => {});
+    }
     localStorage.removeItem("accessToken");
     localStorage.removeItem("refreshToken");
     navigate("/login");
@@ -1,6 +1,7 @@
 // src/pages/PersonalizarTiendaPage.jsx
 import React, { useState, useEffect, useRef } from "react";
 import { useNavigate, useParams } from "react-router-dom";
+import { headersConToken } from "../services/api";
 
 export default function PersonalizarTiendaPage() {
   const navigate = useNavigate();
@@ -8,6 +9,8 @@ export default function PersonalizarTiendaPage() {
   const mapRef = useRef(null);
   const mapInstanceRef = useRef(null);
   const markerRef = useRef(null);
+  // Personalización tal como está guardada; solo se envía lo que cambió
+  const guardadoRef = useRef({});
 
   const [activeTab, setActiveTab] = useState("branding");
   const [negocio, setNegocio] = useState(null);
@@ -73,6 +76,7 @@ export default function PersonalizarTiendaPage() {
       if (response.ok) {
         const data = await response.json();
         setNegocio(data);
+        guardadoRef.current = data.personalizacion || {};
         // Cargar datos de personalización si existen
         if (data.personalizacion) {
           setCustomization({ ...customization, ...data.personalizacion });
@@ -164,14 +168,23 @@ export default function PersonalizarTiendaPage() {
       const API_URL = import.meta.env.VITE_API_NEGOCIOS_URL || "http://127.0.0.1:8002/api/negocios";
       
       if (idNegocio) {
-        // Actualizar personalización existente
+        // Merge patch solo con los campos que cambiaron desde el último guardado
+        const cambios = Object.fromEntries(
+          Object.entries(customization).filter(([campo, valor]) => guardadoRef.current[campo] !== valor)
+        );
+        if (Object.keys(cambios).length === 0) {
+          showNotification("No hay cambios por guardar", "info");
+          return;
+        }
         const response = await fetch(`${API_URL}/${idNegocio}/personalizar/`, {
-          method: "POST",
-          headers: { "Content-Type": "application/json" },
-          body: JSON.stringify(customization),
+          method: "PATCH",
+          headers: headersConToken({ "Content-Type": "application/merge-patch+json" }),
+          body: JSON.stringify(cambios),
         });
 
         if (response.ok) {
+          const data = await response.json();
+          guardadoRef.current = { ...guardadoRef.current, ...data.personalizacion };
           showNotification("¡Cambios guardados exitosamente!", "success");
         } else {
           showNotification("Error al guardar los cambios", "error");
@@ -40,15 +40,43 @@ export async function getCurrentUser(accessToken) {
   return data; // aquí viene id_usuario, correo, nombre, rol, etc.
 }
 
+// 🚪 Cerrar la sesión: el refresh deja de servir para renovar el access
+export async function logoutUser(refreshToken) {
+  const response = await fetch(`${API_URL}/auth/logout/`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+    },
+    body: JSON.stringify({ refresh: refreshToken }),
+  });
+
+  if (!response.ok) {
+    const data = await response.json().catch(() => ({}));
+    throw { status: response.status, data };
+  }
+}
+
 // ================== NEGOCIOS ==================
 
 const API_NEGOCIOS_URL =
   import.meta.env.VITE_API_NEGOCIOS_URL ||
   "http://127.0.0.1:8002/api/negocios";
 
-// 📌 (opcional) Listar TODOS los negocios
-export async function listarNegocios() {
-  const response = await fetch(`${API_NEGOCIOS_URL}/`, {
+// 🔐 Headers con el token de ms_usuarios; ms_negocios lo verifica por su cuenta
+// y toma de ahí al propietario (crear, editar, personalizar y borrar lo piden)
+export function headersConToken(headers = {}) {
+  const token = localStorage.getItem("accessToken");
+  return {
+    "Content-Type": "application/json",
+    ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    ...headers,
+  };
+}
+
+// 📌 (opcional) Listar TODOS los negocios, una página a la vez
+// Devuelve { next, results }; para la siguiente página pasar `next` como url
+export async function listarNegocios(url = `${API_NEGOCIOS_URL}/`) {
+  const response = await fetch(url, {
     method: "GET",
     headers: {
       "Content-Type": "application/json",
@@ -66,22 +94,54 @@ export async function listarNegocios() {
 }
 
 // 🏪 Listar negocios de un usuario específico
+// El backend pagina por cursor: se siguen los enlaces `next` hasta juntar todos
 export async function listarNegociosUsuario(idUsuario) {
-  const response = await fetch(`${API_NEGOCIOS_URL}/usuario/${idUsuario}/`, {
-    method: "GET",
-    headers: {
-      "Content-Type": "application/json",
-      // si luego quieres protegerlo:
-      // Authorization: `Bearer ${localStorage.getItem("accessToken")}`,
-    },
-  });
+  let url = `${API_NEGOCIOS_URL}/usuario/${idUsuario}/`;
+  const negocios = [];
+
+  while (url) {
+    const response = await fetch(url, {
+      method: "GET",
+      headers: {
+        "Content-Type": "application/json",
+      },
+    });
+
+    const data = await response.json();
+
+    if (!response.ok) {
+      console.error("Error listando negocios del usuario:", data);
+      throw data;
+    }
+
+    negocios.push(...data.results);
+    url = data.next;
+  }
 
-  const data = await response.json();
+  return negocios; // array de negocios
+}
 
-  if (!response.ok) {
-    console.error("Error listando negocios del usuario:", data);
-    throw data;
+// 🏪 Negocios del usuario logueado (el backend lo saca del token)
+export async function listarMisNegocios() {
+  let url = `${API_NEGOCIOS_URL}/mios/`;
+  const negocios = [];
+
+  while (url) {
+    const response = await fetch(url, {
+      method: "GET",
+      headers: headersConToken(),
+    });
+
+    const data = await response.json();
+
+    if (!response.ok) {
+      console.error("Error listando mis negocios:", data);
+      throw data;
+    }
+
+    negocios.push(...data.results);
+    url = data.next;
   }
 
-  return data; // array de negocios
+  return negocios;
 }